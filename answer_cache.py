@@ -0,0 +1,186 @@
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    index_version TEXT NOT NULL,
+    chunk_set TEXT NOT NULL,
+    history TEXT NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB,
+    answer TEXT NOT NULL,
+    sources BLOB NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_scope ON answers(index_version, chunk_set, history);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used);
+"""
+
+
+class AnswerCache:
+    """Persistent two-tier cache of generated answers
+
+    The exact tier matches the normalized question, the set of context chunk
+    ids and the conversation memory sent with it. The semantic tier reuses an
+    answer to a differently worded question when its embedding is within the
+    cosine threshold and chunks and memory are the same. Entries are scoped
+    to an index version, so answers from an older corpus are never served,
+    and are evicted by TTL and least-recent use.
+    """
+    
+    def __init__(self, db_path: str, max_entries: int, ttl: float, similarity: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = {'exact': 0, 'semantic': 0}
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._version = None
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+    
+    @staticmethod
+    def chunk_set(sources: List[Tuple[Dict, float]]) -> str:
+        """Order-independent fingerprint of the chunks an answer was generated from"""
+        ids = sorted(
+            int(doc_id)
+            for doc, _ in sources
+            for doc_id in doc.get('ids', [doc.get('id')])
+            if doc_id is not None
+        )
+        return hashlib.sha1(','.join(map(str, ids)).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def history_hash(history: List[Dict]) -> str:
+        """Fingerprint of the conversation memory sent with a question"""
+        digest = hashlib.sha1()
+        for item in history:
+            digest.update(item['query'].encode('utf-8') + b'\0' + item['answer'].encode('utf-8') + b'\0')
+        return digest.hexdigest()
+    
+    def _key(self, query: str, chunk_set: str, history: str, version: str) -> str:
+        return hashlib.sha1(
+            '\0'.join((self.normalize(query), chunk_set, history, version)).encode('utf-8')
+        ).hexdigest()
+    
+    def set_version(self, version: str):
+        """Drop answers computed against any other index version"""
+        with self._lock:
+            if version == self._version:
+                return
+            self._conn.execute("DELETE FROM answers WHERE index_version != ?", (version,))
+            self._conn.commit()
+            self._version = version
+    
+    def get(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray],
+        chunk_set: str,
+        history: str,
+        version: str
+    ) -> Optional[Tuple[Dict, str]]:
+        """Return ({'answer', 'sources'}, tier) for a cached answer, or None"""
+        self.set_version(version)
+        now = time.time()
+        with self._lock:
+            key = self._key(query, chunk_set, history, version)
+            row = self._conn.execute(
+                "SELECT key, answer, sources FROM answers WHERE key = ? AND created > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            tier = 'exact'
+            
+            if row is None and query_embedding is not None:
+                rows = self._conn.execute(
+                    "SELECT key, answer, sources, embedding FROM answers "
+                    "WHERE index_version = ? AND chunk_set = ? AND history = ? AND created > ? "
+                    "AND embedding IS NOT NULL",
+                    (version, chunk_set, history, now - self.ttl)
+                ).fetchall()
+                if rows:
+                    embeddings = np.vstack([np.frombuffer(r[3], dtype='float32') for r in rows])
+                    # Query embeddings are normalized, so the dot product is the cosine
+                    sims = embeddings @ np.asarray(query_embedding, dtype='float32')
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.similarity:
+                        row = rows[best][:3]
+                        tier = 'semantic'
+            
+            if row is None:
+                self.misses += 1
+                return None
+            
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            self.hits[tier] += 1
+            return {'answer': row[1], 'sources': pickle.loads(row[2])}, tier
+    
+    def put(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray],
+        chunk_set: str,
+        history: str,
+        version: str,
+        answer: str,
+        sources: List[Tuple[Dict, float]]
+    ):
+        """Store an answer, then apply TTL and size limits"""
+        if self.max_entries <= 0:
+            return
+        self.set_version(version)
+        now = time.time()
+        embedding = None
+        if query_embedding is not None:
+            embedding = np.asarray(query_embedding, dtype='float32').tobytes()
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, index_version, chunk_set, history, query, embedding, answer, sources, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(query, chunk_set, history, version), version, chunk_set, history,
+                    self.normalize(query), embedding, answer, pickle.dumps(sources), now, now
+                )
+            )
+            self._conn.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        total = sum(self.hits.values()) + self.misses
+        return {
+            'size': size,
+            'max_size': self.max_entries,
+            'exact_hits': self.hits['exact'],
+            'semantic_hits': self.hits['semantic'],
+            'misses': self.misses,
+            'hit_rate': sum(self.hits.values()) / total if total else 0.0
+        }
\ No newline at end of file
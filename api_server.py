@@ -0,0 +1,182 @@
+import os
+import json
+import asyncio
+import argparse
+from typing import Dict, List, Tuple
+from aiohttp import web
+from rag_service import EmptyIndexError, RAGService, serialize_sources
+from llm_client import LLMAPIError
+from telemetry import telemetry
+from config import config
+
+
+def _bad_request(message: str) -> web.HTTPBadRequest:
+    return web.HTTPBadRequest(text=json.dumps({'error': message}), content_type='application/json')
+
+
+async def _read_json(request: web.Request) -> Dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise _bad_request('body must be a JSON object')
+    return body
+
+
+def _in_upload_dir(path: str) -> bool:
+    """Whether a server-side path resolves to a file inside UPLOAD_DIR"""
+    upload_dir = os.path.realpath(config.UPLOAD_DIR)
+    return os.path.commonpath([upload_dir, os.path.realpath(path)]) == upload_dir
+
+
+async def _read_question(request: web.Request) -> Tuple[str, List[Dict]]:
+    body = await _read_json(request)
+    query = body.get('query')
+    if not isinstance(query, str) or not query.strip():
+        raise _bad_request("'query' must be a non-empty string")
+    # Memory is client-held: previous {"query", "answer"} turns, oldest first
+    history = body.get('history')
+    if history is None:
+        history = []
+    if not isinstance(history, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('query'), str) and isinstance(item.get('answer'), str)
+        for item in history
+    ):
+        raise _bad_request("'history' must be a list of {\"query\", \"answer\"} string pairs")
+    return query.strip(), [{'query': item['query'], 'answer': item['answer']} for item in history]
+
+
+async def ingest(request: web.Request) -> web.Response:
+    """Index files uploaded as multipart form data, or given as JSON paths inside UPLOAD_DIR"""
+    service = request.app['service']
+    if request.content_type.startswith('multipart/'):
+        paths = []
+        reader = await request.multipart()
+        async for part in reader:
+            if not part.filename:
+                continue
+            file_path = os.path.join(config.UPLOAD_DIR, os.path.basename(part.filename))
+            with open(file_path, 'wb') as f:
+                while True:
+                    data = await part.read_chunk()
+                    if not data:
+                        break
+                    f.write(data)
+            paths.append(file_path)
+    else:
+        body = await _read_json(request)
+        paths = body.get('paths') or []
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            return web.json_response({'error': "'paths' must be a list of strings"}, status=400)
+        # Anything indexed can be read back through /query, so only uploads are allowed
+        outside = [path for path in paths if not _in_upload_dir(path)]
+        if outside:
+            return web.json_response(
+                {'error': 'paths must be inside the upload directory', 'paths': outside}, status=403
+            )
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            return web.json_response({'error': 'files not found', 'paths': missing}, status=400)
+    
+    result = await service.aingest(paths)
+    return web.json_response(result)
+
+
+async def query(request: web.Request) -> web.Response:
+    """Answer a question and return the whole answer at once"""
+    service = request.app['service']
+    question, history = await _read_question(request)
+    async with request.app['limit']:
+        try:
+            result = await service.aanswer(question, history)
+        except EmptyIndexError as e:
+            return web.json_response({'error': str(e)}, status=409)
+        except LLMAPIError as e:
+            return web.json_response({'error': str(e)}, status=502)
+    return web.json_response({
+        'answer': result['answer'],
+        'sources': serialize_sources(result['sources']),
+        'metrics': result['metrics']
+    })
+
+
+async def stream(request: web.Request) -> web.StreamResponse:
+    """Answer a question as server-sent events
+
+    Each token arrives as a "data: {"token": ...}" event; a final "done"
+    event carries the sources and metrics, or an "error" event the failure.
+    Asking before anything is indexed gives status 409 and only the error event.
+    """
+    service = request.app['service']
+    question, history = await _read_question(request)
+    async with request.app['limit']:
+        with telemetry.trace('answer_stream') as trace:
+            answer_stream, error, status = None, None, 200
+            try:
+                answer_stream = await service.astream_answer(question, history)
+            except EmptyIndexError as e:
+                error, status = e, 409
+            response = web.StreamResponse(status=status, headers={
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache'
+            })
+            await response.prepare(request)
+            if answer_stream is not None:
+                try:
+                    async for token in service.aiter_tokens(answer_stream):
+                        await response.write(f"data: {json.dumps({'token': token})}\n\n".encode('utf-8'))
+                except LLMAPIError as e:
+                    error = e
+            if error is not None:
+                if trace is not None:
+                    trace.error = str(error)
+                event = f"event: error\ndata: {json.dumps({'error': str(error)})}\n\n"
+            else:
+                done = {
+                    'sources': serialize_sources(answer_stream.sources),
+                    'metrics': answer_stream.metrics
+                }
+                event = f"event: done\ndata: {json.dumps(done)}\n\n"
+            await response.write(event.encode('utf-8'))
+            await response.write_eof()
+    return response
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus text exposition of stage latencies, cache, token and error counters"""
+    return web.Response(
+        text=telemetry.render_prometheus(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+
+async def stats(request: web.Request) -> web.Response:
+    """Index size and cache counters"""
+    return web.json_response(request.app['service'].stats())
+
+
+def create_app(service: RAGService = None) -> web.Application:
+    app = web.Application(client_max_size=config.API_MAX_UPLOAD_MB * 1024 * 1024)
+    app['service'] = service or RAGService()
+    app['limit'] = asyncio.Semaphore(config.API_MAX_CONCURRENCY)
+    app.router.add_post('/ingest', ingest)
+    app.router.add_post('/query', query)
+    app.router.add_post('/stream', stream)
+    app.router.add_get('/stats', stats)
+    app.router.add_get('/metrics', metrics)
+    
+    async def close_service(app: web.Application):
+        app['service'].close()
+    
+    app.on_cleanup.append(close_service)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP API for the RAG pipeline")
+    parser.add_argument('--host', default=config.API_HOST)
+    parser.add_argument('--port', type=int, default=config.API_PORT)
+    args = parser.parse_args()
+    
+    web.run_app(create_app(), host=args.host, port=args.port)
\ No newline at end of file
@@ -1,14 +1,11 @@
 import streamlit as st
 import os
 import time
-from document_processor import DocumentProcessor
-from embedding_manager import EmbeddingManager
-from vector_store import VectorStore
-from retriever import HybridRetriever
-from reranker import Reranker
-from llm_handler import LLMHandler
+from rag_service import RAGService
+from llm_client import LLMAPIError
+from telemetry import telemetry
 from config import config
-from utils import format_sources
+from utils import format_sources, count_tokens
 
 
 # Page config
@@ -80,33 +77,37 @@ st.markdown("""
 # Initialize session state
 if 'initialized' not in st.session_state:
     st.session_state.initialized = False
+    st.session_state.service = None
     st. session_state.vector_store = None
     st. session_state.retriever = None
     st.session_state. reranker = None
     st.session_state.llm = None
+    st.session_state.answer_cache = None
     st.session_state.embedding_manager = None
     st. session_state. doc_processor = None
     st. session_state.chat_history = []
 
 
+@st.cache_resource(show_spinner=False)
+def get_service() -> RAGService:
+    """One pipeline per process: every session shares the models and the index"""
+    return RAGService()
+
+
 def initialize_system():
     """Initialize all components"""
     if not st.session_state.initialized:
         with st.spinner("🚀 Initializing AI system..."):
             try:
-                st.session_state.embedding_manager = EmbeddingManager()
-                st.session_state.vector_store = VectorStore()
-                st.session_state. doc_processor = DocumentProcessor()
-                st.session_state.reranker = Reranker()
-                st.session_state. llm = LLMHandler()
-                
-                # Try to load existing index
-                st.session_state.vector_store.load()
-                
-                st.session_state.retriever = HybridRetriever(
-                    st.session_state.embedding_manager,
-                    st.session_state.vector_store
-                )
+                service = get_service()
+                st.session_state.service = service
+                st.session_state.embedding_manager = service.embedding_manager
+                st.session_state.vector_store = service.vector_store
+                st.session_state. doc_processor = service.doc_processor
+                st.session_state.reranker = service.reranker
+                st.session_state. llm = service.llm
+                st.session_state.answer_cache = service.answer_cache
+                st.session_state.retriever = service.retriever
                 
                 st.session_state.initialized = True
                 st.success("✅ System initialized successfully!")
@@ -116,71 +117,70 @@ def initialize_system():
 
 
 def process_uploaded_files(files):
-    """Process uploaded files and create vector index"""
-    all_chunks = []
-    
+    """Index uploaded files incrementally, re-embedding only new or changed files"""
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for idx, uploaded_file in enumerate(files):
-        status_text.text(f"Processing {uploaded_file.name}...")
-        
-        # Save uploaded file
+    # Save uploaded files; the service skips those whose content is already indexed
+    file_paths = []
+    for uploaded_file in files:
         file_path = os.path.join(config.UPLOAD_DIR, uploaded_file.name)
         with open(file_path, 'wb') as f:
             f.write(uploaded_file. getbuffer())
-        
-        # Process document
-        try:
-            chunks = st.session_state. doc_processor.process_file(file_path)
-            all_chunks.extend(chunks)
-        except Exception as e:
-            st.error(f"Error processing {uploaded_file.name}:  {str(e)}")
-        
-        progress_bar.progress((idx + 1) / len(files))
+        file_paths.append(file_path)
     
-    status_text.text("Creating embeddings...")
+    done = []
     
-    # Generate embeddings
-    texts = [chunk['content'] for chunk in all_chunks]
-    embeddings = st.session_state. embedding_manager.embed_documents(texts)
+    def on_file(file_path, file_chunks, error):
+        if error is not None:
+            st.error(f"Error processing {os.path.basename(file_path)}:  {str(error)}")
+        done.append(file_path)
+        progress_bar.progress(len(done) / len(file_paths))
     
-    # Create vector store
-    st.session_state.vector_store.create_index(embeddings, all_chunks)
-    st.session_state.vector_store.save()
-    
-    # Reinitialize retriever
-    st. session_state.retriever = HybridRetriever(
-        st.session_state.embedding_manager,
-        st.session_state.vector_store
-    )
+    status_text.text(f"Processing {len(file_paths)} file(s)...")
+    result = st.session_state.service.ingest(file_paths, on_file=on_file)
     
     progress_bar.progress(100)
     status_text.text("✅ Processing complete!")
     
-    return len(all_chunks)
+    return result['chunks']
+
+
+def remove_indexed_file(source: str):
+    """Remove a single document from the index"""
+    st.session_state.service.remove_file(source)
 
 
 def answer_question(query:  str):
     """Answer question using RAG pipeline with memory"""
     
-    with st.spinner("🔍 Searching documents..."):
-        # Retrieve
-        retrieved_docs = st.session_state.retriever.retrieve(query)
-    
-    with st.spinner("🎯 Reranking results..."):
-        # Rerank
-        reranked_docs = st.session_state.reranker.rerank(query, retrieved_docs)
-    
-    with st.spinner("🤖 Generating answer with memory..."):
-        # Generate answer with chat history
-        result = st.session_state.llm.generate_answer(
-            query,
-            reranked_docs,
-            chat_history=st.session_state.chat_history
-        )
+    with telemetry.trace('answer_stream') as trace:
+        with st.spinner("🔍 Searching and reranking documents..."):
+            # Retrieve, rerank and check the answer cache
+            stream = st.session_state.service.stream_answer(
+                query,
+                chat_history=st.session_state.chat_history
+            )
+        
+        # Render tokens as they arrive (a cached answer arrives at once)
+        st.markdown(f"**🙋 {query}**")
+        try:
+            st.write_stream(stream)
+        except LLMAPIError as e:
+            if trace is not None:
+                trace.error = str(e)
+            st.error(f"❌ Error calling LLM API: {str(e)}")
+            return None
     
-    return result
+    metrics = dict(stream.metrics)
+    if trace is not None:
+        # Per-stage milliseconds for the history caption
+        metrics['stages'] = {name: seconds * 1000 for name, seconds in trace.stage_totals().items()}
+    return {
+        'answer': stream.answer,
+        'sources': stream.sources,
+        'metrics': metrics
+    }
 
 
 # Main UI
@@ -209,21 +209,26 @@ def main():
         if uploaded_files:
             if st.button("🚀 Process Documents"):
                 num_chunks = process_uploaded_files(uploaded_files)
-                st.success(f"✅ Processed {len(uploaded_files)} files into {num_chunks} chunks")
+                st.success(f"✅ Processed {len(uploaded_files)} files into {num_chunks} new chunks")
         
         st.divider()
         
         # Stats
-        if st.session_state.vector_store and st.session_state.vector_store.documents:
-            st.metric("Total Chunks", len(st.session_state.vector_store.documents))
-            
-            unique_files = set(
-                doc['metadata']['filename']
-                for doc in st.session_state.vector_store.documents
-            )
-            st.metric("Documents Indexed", len(unique_files))
+        if st.session_state.vector_store and st.session_state.vector_store.num_documents():
+            st.metric("Total Chunks", st.session_state.vector_store.num_documents())
+            st.metric("Documents Indexed", len(st.session_state.vector_store.indexed_files()))
             st.metric("💭 Conversations", len(st. session_state.chat_history))
             st.metric("🧠 Memory Window", f"{config.MEMORY_WINDOW} turns")
+            
+            # Remove a single document without rebuilding the index
+            to_remove = st.selectbox(
+                "Indexed Documents",
+                st.session_state.vector_store.indexed_files(),
+                format_func=os.path.basename
+            )
+            if st.button("🗑️ Remove Document") and to_remove:
+                remove_indexed_file(to_remove)
+                st.rerun()
         
         st.divider()
         
@@ -235,7 +240,7 @@ def main():
                 st.rerun()
         with col2:
             if st. button("🗑️ Clear Index"):
-                st.session_state.vector_store.clear()
+                st.session_state.service.clear()
                 st.session_state.chat_history = []
                 st. rerun()
         
@@ -246,11 +251,17 @@ def main():
             config.TOP_K_RETRIEVAL = st.slider("Initial Retrieval", 5, 50, 20)
             config.TOP_K_RERANK = st.slider("Final Results", 3, 10, 5)
             config.BM25_WEIGHT = st.slider("BM25 Weight", 0.0, 1.0, 0.3)
+            config.FUSION_METHOD = st.selectbox("Score Fusion", ["weighted", "rrf"])
             config.LLM_TEMPERATURE = st. slider("Temperature", 0.0, 1.0, 0.1)
             config.MEMORY_WINDOW = st.slider("Memory Window", 1, 10, 5)
+        
+        if st.session_state.retriever:
+            with st.expander("📈 Cache Stats"):
+                stats = st.session_state.service.stats()
+                st.json({**stats['caches'], 'micro_batching': stats['micro_batching']})
     
     # Main area
-    if not st.session_state.vector_store or not st.session_state.vector_store.documents:
+    if not st.session_state.vector_store or not st.session_state.vector_store.num_documents():
         st.info("👈 Please upload and process documents to get started")
         
         st.markdown("""
@@ -285,12 +296,16 @@ def main():
         if ask_button and query:
             # Answer question with memory
             result = answer_question(query)
+            if result is None:
+                st.stop()
             
             # Add to history
             st.session_state.chat_history.append({
                 'query': query,
                 'answer': result['answer'],
-                'sources': result['sources']
+                'sources': result['sources'],
+                'metrics': result['metrics'],
+                'tokens': count_tokens(query + result['answer'])  # Counted once, reused by memory truncation
             })
             
             # Clear input
@@ -318,6 +333,17 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
                 
+                metrics = chat.get('metrics')
+                if metrics and metrics.get('cached'):
+                    st.caption(f"⚡ Served from answer cache ({metrics['cached']} match)")
+                elif metrics and metrics['ttft'] is not None:
+                    st.caption(
+                        f"⏱️ First token {metrics['ttft']:.2f}s · Total {metrics['total']:.2f}s"
+                    )
+                if metrics and metrics.get('stages'):
+                    slowest = sorted(metrics['stages'].items(), key=lambda item: item[1], reverse=True)
+                    st.caption(' · '.join(f"{name} {ms:.0f}ms" for name, ms in slowest[:6]))
+                
                 # Sources
                 with st.expander(f"📚 View Sources for Question #{turn_num}"):
                     for j, (doc, score) in enumerate(chat['sources'], 1):
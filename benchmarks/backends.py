@@ -0,0 +1,143 @@
+"""Compare throughput and output quality of the inference backends
+
+Runs the embedding model and the cross-encoder on PyTorch, ONNX and
+int8-quantized ONNX over the same corpus, reports texts/s and pairs/s, and
+checks each ONNX variant against the PyTorch outputs using the tolerances in
+inference_backend. Exits non-zero when a tolerance is exceeded.
+
+    python benchmarks/backends.py --corpus docs.txt --texts 512
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from utils import split_text_by_tokens
+from inference_backend import (
+    EMBEDDING_MIN_COSINE,
+    RERANKER_MAX_SCORE_DIFF,
+    load_embedding_model,
+    load_cross_encoder
+)
+
+
+VARIANTS = (('torch', False), ('onnx', False), ('onnx', True))
+
+
+def load_corpus(path: str, count: int, chunk_size: int) -> list:
+    """Chunk a text file, or generate filler passages when no file is given"""
+    if path:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            chunks = split_text_by_tokens(f.read(), chunk_size, 0)
+    else:
+        rng = random.Random(0)
+        words = "the index query model token vector search document page answer retrieval score".split()
+        chunks = [
+            ' '.join(rng.choice(words) for _ in range(chunk_size // 2)).capitalize() + '.'
+            for _ in range(count)
+        ]
+    return [chunk for chunk in chunks if chunk.strip()][:count]
+
+
+def timed(fn, repeat: int):
+    """Run fn repeat times after one warm-up call; return the last result and the best time"""
+    result = fn()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench_embeddings(texts: list, batch_size: int, repeat: int) -> bool:
+    print(f"\nEmbedding model: {config.EMBEDDING_MODEL} ({len(texts)} texts)")
+    print(f"{'backend':<12}{'texts/s':>10}{'speedup':>10}{'min cos':>10}{'mean cos':>10}{'recall@10':>11}")
+    
+    baseline, base_time, ok = None, None, True
+    for backend, quantize in VARIANTS:
+        model, used = load_embedding_model(config.EMBEDDING_MODEL, backend, quantize)
+        if used == 'torch' and baseline is not None:
+            print(f"{backend + ('-qint8' if quantize else ''):<12}  unavailable")
+            continue
+        embeddings, elapsed = timed(
+            lambda: model.encode(texts, batch_size=batch_size, normalize_embeddings=True),
+            repeat
+        )
+        embeddings = np.asarray(embeddings, dtype='float32')
+        
+        if baseline is None:
+            baseline, base_time = embeddings, elapsed
+            print(f"{used:<12}{len(texts) / elapsed:>10.1f}{1.0:>10.2f}{'-':>10}{'-':>10}{'-':>11}")
+            continue
+        
+        cosines = np.sum(baseline * embeddings, axis=1)
+        # Nearest neighbours of the first texts, used as queries
+        queries = min(32, len(texts))
+        base_top = np.argsort(-(baseline[:queries] @ baseline.T), axis=1)[:, 1:11]
+        top = np.argsort(-(embeddings[:queries] @ embeddings.T), axis=1)[:, 1:11]
+        recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(base_top, top)])
+        passed = cosines.min() >= EMBEDDING_MIN_COSINE[used]
+        ok &= passed
+        print(
+            f"{used:<12}{len(texts) / elapsed:>10.1f}{base_time / elapsed:>10.2f}"
+            f"{cosines.min():>10.5f}{cosines.mean():>10.5f}{recall:>11.3f}"
+            f"{'' if passed else '  FAIL'}"
+        )
+    return ok
+
+
+def bench_reranker(texts: list, batch_size: int, repeat: int) -> bool:
+    queries = [' '.join(text.split()[:8]) for text in texts[:8]]
+    pairs = [[query, text] for query in queries for text in texts[:64]]
+    print(f"\nReranker model: {config.RERANKER_MODEL} ({len(pairs)} pairs)")
+    print(f"{'backend':<12}{'pairs/s':>10}{'speedup':>10}{'max diff':>10}{'top-5':>10}")
+    
+    baseline, base_time, ok = None, None, True
+    for backend, quantize in VARIANTS:
+        model, used = load_cross_encoder(config.RERANKER_MODEL, config.RERANK_MAX_LENGTH, backend, quantize)
+        if used == 'torch' and baseline is not None:
+            print(f"{backend + ('-qint8' if quantize else ''):<12}  unavailable")
+            continue
+        scores, elapsed = timed(
+            lambda: model.predict(pairs, batch_size=batch_size, show_progress_bar=False),
+            repeat
+        )
+        scores = np.asarray(scores, dtype='float32').reshape(len(queries), -1)
+        
+        if baseline is None:
+            baseline, base_time = scores, elapsed
+            print(f"{used:<12}{len(pairs) / elapsed:>10.1f}{1.0:>10.2f}{'-':>10}{'-':>10}")
+            continue
+        
+        max_diff = float(np.abs(baseline - scores).max())
+        base_top = np.argsort(-baseline, axis=1)[:, :5]
+        top = np.argsort(-scores, axis=1)[:, :5]
+        overlap = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(base_top, top)])
+        passed = max_diff <= RERANKER_MAX_SCORE_DIFF[used]
+        ok &= passed
+        print(
+            f"{used:<12}{len(pairs) / elapsed:>10.1f}{base_time / elapsed:>10.2f}"
+            f"{max_diff:>10.4f}{overlap:>10.3f}{'' if passed else '  FAIL'}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PyTorch vs ONNX Runtime inference")
+    parser.add_argument('--corpus', help="Text file to chunk (default: generated passages)")
+    parser.add_argument('--texts', type=int, default=256, help="Number of chunks to embed")
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE, help="Tokens per chunk")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per backend (best is kept)")
+    args = parser.parse_args()
+    
+    texts = load_corpus(args.corpus, args.texts, args.chunk_size)
+    ok = bench_embeddings(texts, args.batch_size, args.repeat)
+    ok &= bench_reranker(texts, args.batch_size, args.repeat)
+    sys.exit(0 if ok else 1)
\ No newline at end of file
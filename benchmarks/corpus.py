@@ -0,0 +1,151 @@
+"""Synthetic TXT/DOCX/PDF corpora for benchmarks
+
+Text is drawn from a seeded Zipf-distributed vocabulary of made-up words,
+so the same arguments always produce the same files and term statistics
+resemble natural language. PDFs are written directly (one Helvetica text
+object per page), so no PDF library is needed to generate them.
+"""
+import os
+import random
+from typing import Dict, List
+
+
+SYLLABLES = "ka lo mi ne ru sa ti vo pe da zu ri ko ma te lu fa ni so be".split()
+FORMATS = ('txt', 'docx', 'pdf')
+
+
+class CorpusGenerator:
+    """Seeded generator of words, sentences, pages and documents"""
+    
+    def __init__(self, seed: int = 0, vocabulary: int = 5000):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add(''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(1, 4))))
+        self.words = sorted(words)
+        self.rng.shuffle(self.words)
+        # Zipf weights: the i-th word is 1/i as frequent as the first
+        self.weights = [1 / (i + 1) for i in range(len(self.words))]
+    
+    def sentence(self) -> str:
+        words = self.rng.choices(self.words, weights=self.weights, k=self.rng.randint(6, 24))
+        return ' '.join(words).capitalize() + '.'
+    
+    def page(self, words_per_page: int) -> str:
+        paragraphs, paragraph, count = [], [], 0
+        while count < words_per_page:
+            sentence = self.sentence()
+            paragraph.append(sentence)
+            count += sentence.count(' ') + 1
+            if len(paragraph) >= self.rng.randint(3, 7):
+                paragraphs.append(' '.join(paragraph))
+                paragraph = []
+        if paragraph:
+            paragraphs.append(' '.join(paragraph))
+        return '\n\n'.join(paragraphs)
+    
+    def queries(self, texts: List[str], count: int) -> List[str]:
+        """Questions built from words of random corpus sentences, so each has relevant chunks"""
+        queries = []
+        for _ in range(count):
+            words = self.rng.choice(texts).replace('.', '').lower().split()
+            size = min(len(words), self.rng.randint(2, 6))
+            start = self.rng.randint(0, len(words) - size)
+            queries.append(' '.join(words[start:start + size]))
+        return queries
+
+
+def generate_corpus(
+    out_dir: str,
+    num_docs: int,
+    pages_per_doc: int,
+    words_per_page: int = 400,
+    formats: List[str] = FORMATS,
+    seed: int = 0
+) -> Dict[str, List[str]]:
+    """Write num_docs documents cycling through formats; return {path: page texts}"""
+    os.makedirs(out_dir, exist_ok=True)
+    generator = CorpusGenerator(seed)
+    corpus = {}
+    for i in range(num_docs):
+        ext = formats[i % len(formats)]
+        pages = [generator.page(words_per_page) for _ in range(pages_per_doc)]
+        path = os.path.join(out_dir, f"doc_{i:04d}.{ext}")
+        WRITERS[ext](path, pages)
+        corpus[path] = pages
+    return corpus
+
+
+def write_txt(path: str, pages: List[str]):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(pages))
+
+
+def write_docx(path: str, pages: List[str]):
+    from docx import Document
+    
+    document = Document()
+    for page in pages:
+        for paragraph in page.split('\n\n'):
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_pdf(path: str, pages: List[str], line_chars: int = 95, lines_per_page: int = 64):
+    """Minimal PDF 1.4 writer: one Helvetica text stream per page
+
+    Text that does not fit on a page is truncated; keep words_per_page below
+    about 900 for the default layout.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_ids = []
+    for text in pages:
+        lines = _wrap(text, line_chars)[:lines_per_page]
+        body = ''.join(f"({_escape(line)}) Tj T*\n" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td\n{body}ET".encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{i} 0 R" for i in page_ids).encode('ascii')
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines = []
+    for paragraph in text.split('\n\n'):
+        line = ''
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.extend([line, ''])
+    return lines
+
+
+def _escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf}
\ No newline at end of file
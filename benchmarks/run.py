@@ -0,0 +1,295 @@
+"""Reproducible benchmark suite for ingestion, retrieval and reranking
+
+Generates a seeded synthetic corpus (TXT/DOCX/PDF), then measures:
+
+- chunks/s through DocumentProcessor (extract + chunk), EmbeddingManager
+  and VectorStore indexing
+- p50/p95/p99 latency of dense, sparse, fused and reranked retrieval
+- recall@k of the approximate paths (ANN index, reranker cascade) against
+  their exact counterparts
+
+Results are written as JSON; pass --baseline to compare against an earlier
+run and exit non-zero when a metric regresses by more than --tolerance.
+Runs offline with stub encoders by default (--models stub); --models local
+uses the configured, or given, locally cached models.
+
+    python benchmarks/run.py --docs 24 --pages 8 --output baseline.json
+    python benchmarks/run.py --docs 24 --pages 8 --baseline baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import numpy as np
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nothing here calls the LLM API, but config refuses to load without a token
+os.environ.setdefault('GITHUB_TOKEN', 'offline-benchmark')
+
+from config import config
+from utils import compute_file_hash
+from benchmarks.corpus import FORMATS, CorpusGenerator, generate_corpus
+
+
+LEGS = ('dense', 'sparse', 'fused', 'reranked')
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'p50': float(np.percentile(samples_ms, 50)),
+        'p95': float(np.percentile(samples_ms, 95)),
+        'p99': float(np.percentile(samples_ms, 99)),
+        'mean': float(samples_ms.mean())
+    }
+
+
+def configure(work_dir: str, args):
+    """Point every store at the work directory and switch off caches that would hide the work"""
+    config.VECTOR_STORE_PATH = os.path.join(work_dir, 'vector_store')
+    config.UPLOAD_DIR = os.path.join(work_dir, 'corpus')
+    os.makedirs(config.VECTOR_STORE_PATH, exist_ok=True)
+    config.EMBEDDING_CACHE_ENABLED = False
+    config.QUERY_CACHE_SIZE = 0
+    config.RERANK_CACHE_SIZE = 0
+    config.RERANK_CASCADE = False
+    config.TOP_K_RETRIEVAL = args.k
+    if args.index_type:
+        config.FAISS_INDEX_TYPE = args.index_type
+
+
+def load_models(args):
+    from embedding_manager import EmbeddingManager
+    from reranker import Reranker
+    
+    if args.models == 'stub':
+        from benchmarks.stubs import HashingEncoder, OverlapCrossEncoder
+        return EmbeddingManager(HashingEncoder()), Reranker(OverlapCrossEncoder())
+    
+    if args.embedding_model:
+        config.EMBEDDING_MODEL = args.embedding_model
+    if args.reranker_model:
+        config.RERANKER_MODEL = args.reranker_model
+    return EmbeddingManager(), Reranker()
+
+
+def bench_ingestion(paths: List[str], embedding_manager, vector_store, workers: int) -> Tuple[Dict, List[str]]:
+    """Time extraction + chunking, embedding and indexing as separate stages"""
+    from document_processor import DocumentProcessor
+    
+    start = time.perf_counter()
+    files = []
+    for path, chunks, error in DocumentProcessor().process_files(paths, workers):
+        if error is not None:
+            raise RuntimeError(f"Failed to process {path}: {error}")
+        files.append((path, chunks))
+    extract_time = time.perf_counter() - start
+    
+    texts = [chunk['content'] for _, chunks in files for chunk in chunks]
+    start = time.perf_counter()
+    embeddings = embedding_manager.embed_documents(texts)
+    embed_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    row = 0
+    for path, chunks in files:
+        file_hash = compute_file_hash(path)
+        vector_store.begin_file(path, os.path.basename(path), file_hash)
+        vector_store.append_chunks(path, embeddings[row:row + len(chunks)], chunks)
+        vector_store.finish_file(path, file_hash)
+        row += len(chunks)
+    vector_store.save()
+    index_time = time.perf_counter() - start
+    
+    total = len(texts)
+    return {
+        'chunks': total,
+        'extract_chunks_per_s': total / extract_time,
+        'embed_chunks_per_s': total / embed_time,
+        'index_chunks_per_s': total / index_time,
+        'total_chunks_per_s': total / (extract_time + embed_time + index_time)
+    }, texts
+
+
+def bench_retrieval(queries: List[str], embedding_manager, vector_store, retriever, reranker, k: int) -> Dict:
+    """Per-query latency of each retrieval leg"""
+    timings = {leg: [] for leg in LEGS}
+    warmup = 3
+    for i, query in enumerate(queries[:warmup] + queries):
+        start = time.perf_counter()
+        embedding = embedding_manager.embed_query(query)
+        vector_store.search(embedding, k=k)
+        dense = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        ids, _ = vector_store.sparse_index.search(query, k=k)
+        vector_store.get_documents(ids.tolist())
+        sparse = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        docs = retriever.retrieve(query, top_k=k)
+        fused = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        reranker.rerank(query, docs)
+        reranked = fused + time.perf_counter() - start
+        
+        if i >= warmup:
+            for leg, elapsed in zip(LEGS, (dense, sparse, fused, reranked)):
+                timings[leg].append(elapsed)
+    return {leg: percentiles(samples) for leg, samples in timings.items()}
+
+
+def bench_recall(queries: List[str], vector_store, retriever, reranker, k: int) -> Dict:
+    """Recall@k of approximate paths against exact ones"""
+    ann = vector_store.recall_report(k=k, num_queries=len(queries), sweep=[None])[0]
+    
+    overlaps = []
+    for query in queries:
+        docs = retriever.retrieve(query, top_k=k)
+        config.RERANK_CASCADE = False
+        exact = {doc['id'] for doc, _ in reranker.rerank(query, docs)}
+        config.RERANK_CASCADE = True
+        cascade = {doc['id'] for doc, _ in reranker.rerank(query, docs)}
+        config.RERANK_CASCADE = False
+        if exact:
+            overlaps.append(len(exact & cascade) / len(exact))
+    
+    return {
+        f"dense_ann_at_{k}": ann['recall'],
+        f"rerank_cascade_at_{config.TOP_K_RERANK}": float(np.mean(overlaps)) if overlaps else 1.0
+    }
+
+
+def run(args) -> Dict:
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='rag-bench-')
+    configure(work_dir, args)
+    try:
+        corpus = generate_corpus(
+            config.UPLOAD_DIR, args.docs, args.pages, args.words_per_page, args.formats, args.seed
+        )
+        embedding_manager, reranker = load_models(args)
+        
+        from vector_store import VectorStore
+        from retriever import HybridRetriever
+        vector_store = VectorStore()
+        vector_store.clear()
+        
+        ingestion, texts = bench_ingestion(list(corpus), embedding_manager, vector_store, args.workers)
+        retriever = HybridRetriever(embedding_manager, vector_store)
+        queries = CorpusGenerator(args.seed + 1).queries(texts, args.queries)
+        
+        return {
+            'meta': {
+                'docs': args.docs,
+                'pages': args.pages,
+                'words_per_page': args.words_per_page,
+                'formats': list(args.formats),
+                'queries': args.queries,
+                'k': args.k,
+                'seed': args.seed,
+                'models': args.models if args.models == 'stub' else f"{config.EMBEDDING_MODEL} + {config.RERANKER_MODEL}",
+                'index_type': vector_store.built_type,
+                'chunk_size': config.CHUNK_SIZE,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+            },
+            'ingestion': ingestion,
+            'latency_ms': bench_retrieval(queries, embedding_manager, vector_store, retriever, reranker, args.k),
+            'recall': bench_recall(queries, vector_store, retriever, reranker, args.k)
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print metric changes against a baseline and return the regressions"""
+    setup = ('docs', 'pages', 'words_per_page', 'formats', 'queries', 'k', 'seed', 'models', 'index_type', 'chunk_size')
+    differs = [key for key in setup if results['meta'].get(key) != baseline.get('meta', {}).get(key)]
+    if differs:
+        print(f"⚠️ Baseline differs in {', '.join(differs)}; changes may not be comparable")
+    
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<40}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, value in current.items():
+        if name.startswith('meta.') or name == 'ingestion.chunks' or name not in previous:
+            continue
+        old = previous[name]
+        change = (value - old) / old if old else 0.0
+        # Latency should go down; throughput and recall up
+        worse = change > tolerance if name.startswith('latency_ms.') else change < -tolerance
+        if worse:
+            regressions.append(name)
+        print(f"{name:<40}{old:>12.3f}{value:>12.3f}{change:>+9.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def print_summary(results: Dict):
+    ingestion = results['ingestion']
+    print(f"\nIngestion ({ingestion['chunks']} chunks)")
+    for stage in ('extract', 'embed', 'index', 'total'):
+        print(f"  {stage:<10}{ingestion[f'{stage}_chunks_per_s']:>12.1f} chunks/s")
+    print(f"\nRetrieval latency (ms, k={results['meta']['k']})")
+    print(f"  {'leg':<10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for leg, summary in results['latency_ms'].items():
+        print(f"  {leg:<10}{summary['p50']:>10.2f}{summary['p95']:>10.2f}{summary['p99']:>10.2f}")
+    print("\nRecall")
+    for name, value in results['recall'].items():
+        print(f"  {name:<30}{value:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and reranking")
+    parser.add_argument('--docs', type=int, default=24, help="Documents in the synthetic corpus")
+    parser.add_argument('--pages', type=int, default=8, help="Pages per document")
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--formats', type=lambda s: s.split(','), default=list(FORMATS), help="Comma-separated: txt,docx,pdf")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=config.TOP_K_RETRIEVAL, help="Candidates per retrieval leg")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--models', choices=('stub', 'local'), default='stub', help="Stub encoders or real local models")
+    parser.add_argument('--embedding-model', help="With --models local, e.g. sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument('--reranker-model', help="With --models local, e.g. cross-encoder/ms-marco-TinyBERT-L-2-v2")
+    parser.add_argument('--index-type', choices=('flat', 'hnsw', 'ivf_flat', 'ivf_pq'))
+    parser.add_argument('--workers', type=int, default=config.INGEST_WORKERS, help="Extraction processes")
+    parser.add_argument('--work-dir', help="Directory for the corpus and index (default: a temp dir)")
+    parser.add_argument('--keep', action='store_true', help="Keep the work directory")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--baseline', help="Compare against a results JSON")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+    
+    results = run(args)
+    print_summary(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Deterministic stand-ins for the embedding model and cross-encoder
+
+They implement the parts of the SentenceTransformer / CrossEncoder
+interface this project calls, need no weights or network, and cost roughly
+linear time in input length, so benchmarks of the surrounding pipeline run
+offline. Their scores carry lexical signal only; quality numbers measured
+with them compare code paths, not models.
+"""
+import zlib
+import numpy as np
+from typing import Dict, List, Union
+from sparse_index import tokenize
+
+
+def _token_ids(text: str, dim: int) -> np.ndarray:
+    return np.array([zlib.crc32(token.encode('utf-8')) % dim for token in tokenize(text)], dtype='int64')
+
+
+class HashingEncoder:
+    """Feature-hashed bag of words, L2-normalized"""
+    
+    max_seq_length = 512
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+    
+    def tokenizer(self, texts: List[str], add_special_tokens: bool = True, truncation: bool = True, max_length: int = None) -> Dict:
+        max_length = max_length or self.max_seq_length
+        extra = 2 if add_special_tokens else 0
+        return {'input_ids': [[0] * min(len(text.split()) + extra, max_length) for text in texts]}
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = True
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        embeddings = np.zeros((len(sentences), self.dim), dtype='float32')
+        for row, text in enumerate(sentences):
+            ids = _token_ids(text, self.dim)[:self.max_seq_length]
+            np.add.at(embeddings[row], ids, 1.0)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+class OverlapCrossEncoder:
+    """Scores a pair by query-term overlap, damped by passage length"""
+    
+    def predict(self, pairs: List[List[str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        scores = np.empty(len(pairs), dtype='float32')
+        for i, (query, passage) in enumerate(pairs):
+            passage_tokens = tokenize(passage)
+            counts = {}
+            for token in passage_tokens:
+                counts[token] = counts.get(token, 0) + 1
+            overlap = sum(counts.get(token, 0) for token in set(tokenize(query)))
+            scores[i] = overlap / np.sqrt(len(passage_tokens) + 1)
+        return scores
\ No newline at end of file
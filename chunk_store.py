@@ -0,0 +1,275 @@
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    filename TEXT NOT NULL,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    page INTEGER NOT NULL,
+    chunk_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_file ON chunks(file_id);
+CREATE TABLE IF NOT EXISTS chunk_text (
+    id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunk_vectors (
+    id INTEGER PRIMARY KEY,
+    embedding BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Stores before integer chunk ids kept a "<page>_<index>" chunk_id string per chunk.
+# executescript() runs in autocommit mode, so the swap needs its own transaction
+MIGRATE_CHUNK_INDEX = """
+BEGIN;
+CREATE TABLE chunks_v2 (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    page INTEGER NOT NULL,
+    chunk_index INTEGER NOT NULL
+);
+INSERT INTO chunks_v2 (id, file_id, page, chunk_index)
+    SELECT id, file_id, page, CAST(substr(chunk_id, instr(chunk_id, '_') + 1) AS INTEGER) FROM chunks;
+DROP TABLE chunks;
+ALTER TABLE chunks_v2 RENAME TO chunks;
+CREATE INDEX IF NOT EXISTS chunks_file ON chunks(file_id);
+COMMIT;
+"""
+
+# SQLite caps the number of bound parameters per statement
+BATCH_SIZE = 500
+
+
+class ChunkStore:
+    """SQLite chunk store with metadata, text and vectors kept in separate tables
+
+    Per-file metadata (filename, source) is stored once and shared by every
+    chunk of that file. Rows are fetched by id on demand, so opening a store
+    costs the same regardless of corpus size. Writes are transactional and
+    only become durable on commit().
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        # Streamlit reruns scripts on different threads; access is serialized by the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+        if 'chunk_index' not in columns:
+            try:
+                self._conn.executescript(MIGRATE_CHUNK_INDEX)
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+        self._conn.commit()
+        self._files = {}  # file_id -> (filename, source), shared by all chunk dicts
+    
+    # Files
+    
+    def file_hash(self, source: str) -> Optional[str]:
+        """Content hash recorded for a source, or None if it is not indexed"""
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM files WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+    
+    def has_file(self, source: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM files WHERE source = ?", (source,)).fetchone()
+        return row is not None
+    
+    def max_page(self, source: str) -> Optional[int]:
+        """Highest page with stored chunks for a source"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(c.page) FROM chunks c JOIN files f ON f.id = c.file_id WHERE f.source = ?",
+                (source,)
+            ).fetchone()
+        return row[0]
+    
+    def sources(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT source FROM files ORDER BY source").fetchall()
+        return [row[0] for row in rows]
+    
+    def add_file(self, source: str, filename: str, file_hash: Optional[str]) -> int:
+        """Register a file and return its id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO files (source, filename, hash) VALUES (?, ?, ?)",
+                (source, filename, file_hash)
+            )
+            return cursor.lastrowid
+    
+    def file_id(self, source: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM files WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+    
+    def set_file_hash(self, source: str, file_hash: Optional[str]):
+        with self._lock:
+            self._conn.execute("UPDATE files SET hash = ? WHERE source = ?", (file_hash, source))
+    
+    def remove_file(self, source: str) -> List[int]:
+        """Delete a file and its chunks, returning the removed chunk ids"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM files WHERE source = ?", (source,)).fetchone()
+            if row is None:
+                return []
+            file_id = row[0]
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM chunks WHERE file_id = ? ORDER BY id", (file_id,)
+            )]
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                marks = ','.join('?' * len(batch))
+                self._conn.execute(f"DELETE FROM chunk_text WHERE id IN ({marks})", batch)
+                self._conn.execute(f"DELETE FROM chunk_vectors WHERE id IN ({marks})", batch)
+            self._conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self._files.pop(file_id, None)
+            return ids
+    
+    # Chunks
+    
+    def add_chunks(
+        self,
+        file_id: int,
+        ids: List[int],
+        documents: List[Dict],
+        embeddings: np.ndarray
+    ):
+        """Insert chunks of one file with their embeddings"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (id, file_id, page, chunk_index) VALUES (?, ?, ?, ?)",
+                [
+                    (doc_id, file_id, doc['metadata']['page'], doc['metadata']['chunk_index'])
+                    for doc_id, doc in zip(ids, documents)
+                ]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunk_text (id, content) VALUES (?, ?)",
+                [(doc_id, doc['content']) for doc_id, doc in zip(ids, documents)]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunk_vectors (id, embedding) VALUES (?, ?)",
+                [
+                    (doc_id, np.asarray(vector, dtype='float32').tobytes())
+                    for doc_id, vector in zip(ids, embeddings)
+                ]
+            )
+    
+    def get(self, ids: List[int]) -> List[Optional[Dict]]:
+        """Fetch chunks by id in the requested order (None for unknown ids)"""
+        ids = [int(doc_id) for doc_id in ids]
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                marks = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT c.id, c.file_id, c.page, c.chunk_index, t.content "
+                    f"FROM chunks c JOIN chunk_text t ON t.id = c.id WHERE c.id IN ({marks})",
+                    batch
+                )
+                for doc_id, file_id, page, chunk_index, content in rows:
+                    filename, source = self._file_info(file_id)
+                    found[doc_id] = {
+                        'id': doc_id,
+                        'content': content,
+                        'metadata': {
+                            'filename': filename,
+                            'page': page,
+                            'chunk_id': doc_id,
+                            'chunk_index': chunk_index,
+                            'source': source
+                        }
+                    }
+        return [found.get(doc_id) for doc_id in ids]
+    
+    def _file_info(self, file_id: int) -> Tuple[str, str]:
+        """Interned (filename, source) for a file id"""
+        info = self._files.get(file_id)
+        if info is None:
+            info = self._conn.execute(
+                "SELECT filename, source FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+            self._files[file_id] = info
+        return info
+    
+    def ids(self) -> np.ndarray:
+        """All chunk ids in ascending order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks ORDER BY id").fetchall()
+        return np.array([row[0] for row in rows], dtype='int64')
+    
+    def iter_documents(self, batch_size: int = BATCH_SIZE) -> Iterator[Dict]:
+        """Stream every chunk in id order without holding the corpus in memory"""
+        ids = self.ids()
+        for start in range(0, len(ids), batch_size):
+            yield from self.get(ids[start:start + batch_size])
+    
+    def vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All (ids, embeddings) in id order, for index training and rebuilds"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, embedding FROM chunk_vectors ORDER BY id").fetchall()
+        if not rows:
+            return np.zeros(0, dtype='int64'), None
+        ids = np.array([row[0] for row in rows], dtype='int64')
+        embeddings = np.vstack([np.frombuffer(row[1], dtype='float32') for row in rows])
+        return ids, embeddings
+    
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    # Store-level state
+    
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+            )
+    
+    def delete_meta(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+    
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+    
+    def rollback(self):
+        with self._lock:
+            self._conn.rollback()
+            self._files.clear()
+    
+    def clear(self):
+        """Delete every file, chunk and meta entry"""
+        with self._lock:
+            for table in ('chunk_vectors', 'chunk_text', 'chunks', 'files', 'meta'):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.commit()
+            self._files.clear()
\ No newline at end of file
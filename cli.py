@@ -0,0 +1,114 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Optional, Tuple
+from rag_service import RAGService, serialize_sources
+
+
+def read_questions(questions_path: str) -> List[Tuple[Dict, Optional[str]]]:
+    """(question, error) per non-blank JSONL line; a malformed line gets an error instead of failing the file"""
+    questions = []
+    with open(questions_path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                questions.append(({}, f"line {line_number}: invalid JSON: {e}"))
+                continue
+            if not isinstance(item, dict):
+                questions.append(({}, f"line {line_number}: expected a JSON object"))
+            elif not isinstance(item.get('query'), str) or not item['query'].strip():
+                questions.append((item, f"line {line_number}: 'query' must be a non-empty string"))
+            else:
+                questions.append((item, None))
+    return questions
+
+
+async def answer_file(service: RAGService, questions_path: str, output, concurrency: int) -> int:
+    """Answer a JSONL file of {"query", "id"?, "history"?} lines; return the number of failures
+
+    Results are written as JSONL in input order, one per non-blank line;
+    malformed lines and failed questions get an "error" record.
+    """
+    questions = read_questions(questions_path)
+    limit = asyncio.Semaphore(concurrency)
+    
+    async def answer_one(index: int, item: Dict, error: Optional[str]) -> Dict:
+        record = {'id': item.get('id', index), 'query': item.get('query')}
+        if error is not None:
+            return {**record, 'error': error}
+        async with limit:
+            try:
+                result = await service.aanswer(item['query'], item.get('history'))
+            except Exception as e:
+                # One failed question must not lose the rest of the batch
+                return {**record, 'error': f"{type(e).__name__}: {e}"}
+        return {
+            **record,
+            'answer': result['answer'],
+            'sources': serialize_sources(result['sources']),
+            'metrics': result['metrics']
+        }
+    
+    start = time.perf_counter()
+    results = await asyncio.gather(*(answer_one(i, item, error) for i, (item, error) in enumerate(questions)))
+    elapsed = time.perf_counter() - start
+    
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+    failures = sum('error' in result for result in results)
+    print(
+        f"✅ Answered {len(results) - failures}/{len(results)} questions in {elapsed:.1f}s "
+        f"({len(results) / elapsed if elapsed else 0:.2f}/s)",
+        file=sys.stderr
+    )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch command line for the RAG pipeline")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    ingest = commands.add_parser('ingest', help="Index PDF/DOCX/TXT files")
+    ingest.add_argument('files', nargs='+')
+    
+    ask = commands.add_parser('ask', help="Answer a JSONL file of questions")
+    ask.add_argument('questions', help='JSONL with one {"query": ...} per line')
+    ask.add_argument('-o', '--output', help="JSONL answers (default: stdout)")
+    ask.add_argument('-c', '--concurrency', type=int, default=8, help="Questions in flight at once")
+    
+    commands.add_parser('stats', help="Print index statistics")
+    
+    args = parser.parse_args()
+    service = RAGService()
+    try:
+        if args.command == 'ingest':
+            result = service.ingest(
+                args.files,
+                on_file=lambda path, n, error: print(
+                    f"{'❌' if error else '✅'} {path}: {error or f'{n} chunks'}", file=sys.stderr
+                )
+            )
+            print(json.dumps(result, indent=2))
+            return 1 if result['errors'] else 0
+        
+        if args.command == 'ask':
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as output:
+                    failures = asyncio.run(answer_file(service, args.questions, output, args.concurrency))
+            else:
+                failures = asyncio.run(answer_file(service, args.questions, sys.stdout, args.concurrency))
+            return 1 if failures else 0
+        
+        print(json.dumps(service.stats(), indent=2))
+        return 0
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
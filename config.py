@@ -13,19 +13,57 @@ class Config:
     
     # GitHub Models API
     GITHUB_TOKEN:  str = os.getenv("GITHUB_TOKEN", "")
-    GITHUB_API_BASE: str = "https://models.github.ai/inference"
+    GITHUB_API_BASE: str = os.getenv("GITHUB_API_BASE", "https://models.github.ai/inference")
     MODEL_NAME: str = "gpt-4o"
     
     # Embedding Model
     EMBEDDING_MODEL: str = "BAAI/bge-base-en-v1.5"
     EMBEDDING_DIM: int = 768
     
+    # Embedding Cache (on-disk, keyed by model + chunk text)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache"
+    EMBEDDING_CACHE_SIZE: int = 200000  # Max cached chunk embeddings
+    
+    # Inference Backend ("torch", or "onnx" via ONNX Runtime; falls back to torch when unavailable)
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+    ONNX_QUANTIZE: bool = False  # int8 dynamic quantization of the ONNX models
+    ONNX_QUANTIZATION_CONFIG: str = "avx2"  # "arm64", "avx2", "avx512" or "avx512_vnni"
+    ONNX_MODEL_DIR: str = "./onnx_models"  # Exported and quantized models
+    
+    # Vector Index ("flat" exact scan, or approximate "hnsw", "ivf_flat", "ivf_pq")
+    FAISS_INDEX_TYPE: str = "flat"
+    FAISS_METRIC: str = "ip"  # "ip" = cosine on normalized embeddings, "l2" = Euclidean
+    FAISS_NLIST: int = 1024  # IVF clusters
+    FAISS_NPROBE: int = 16  # IVF clusters scanned per query
+    FAISS_HNSW_M: int = 32  # HNSW neighbours per node
+    FAISS_EF_CONSTRUCTION: int = 200  # HNSW build-time search depth
+    FAISS_EF_SEARCH: int = 64  # HNSW query-time search depth
+    FAISS_PQ_M: int = 64  # PQ sub-quantizers (must divide EMBEDDING_DIM)
+    FAISS_PQ_NBITS: int = 8  # Bits per PQ code
+    FAISS_TRAIN_SAMPLE: int = 100000  # Max vectors used to train IVF/PQ
+    
     # Reranker Model
     RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_BATCH_SIZE: int = 32  # Pairs per cross-encoder forward pass
+    RERANK_MAX_LENGTH: int = 512  # Query + chunk tokens; longer pairs are truncated
+    RERANK_CACHE_SIZE: int = 4096  # Cached (query, chunk) scores
+    RERANK_CASCADE: bool = False  # Stop scoring once the top-k looks stable (approximate, may change results)
+    RERANK_CASCADE_MARGIN: float = 2.0  # Logit lead over the latest batch that counts as stable
+    
+    # Shared Model Runtime (one copy of each model per process)
+    MODEL_BATCH_WINDOW_MS: float = 5.0  # Wait for concurrent sessions' queries to batch together (0 = off)
+    MODEL_MAX_BATCH: int = 64  # Inputs that close a micro-batch early
     
     # Document Processing
     CHUNK_SIZE: int = 500  # tokens
     CHUNK_OVERLAP:  int = 50
+    CHUNK_SNAP: Optional[str] = None  # "sentence" ends chunks on a sentence boundary when possible
+    INGEST_WORKERS: int = os.cpu_count() or 1  # Processes used to extract and chunk uploads
+    PAGES_PER_TASK: int = 50  # Large files are split into page ranges of this size
+    EMBED_BATCH_SIZE: int = 256  # Chunks embedded and indexed per micro-batch while ingesting
+    EMBED_TOKEN_BUDGET: int = 16384  # Padded tokens per embedding forward pass (length-bucketed)
+    INGEST_QUEUE_SIZE: int = 4  # Extracted page-range batches buffered ahead of embedding
     
     # Retrieval
     TOP_K_RETRIEVAL: int = 20  # Initial retrieval
@@ -33,14 +71,60 @@ class Config:
     
     # BM25 Weight (0.0 = only semantic, 1.0 = only BM25)
     BM25_WEIGHT: float = 0.3
+    BM25_K1: float = 1.5  # Term frequency saturation
+    BM25_B: float = 0.75  # Document length normalization
+    FUSION_METHOD: str = "weighted"  # "weighted" (min-max scores) or "rrf" (reciprocal rank fusion)
+    RRF_K: int = 60  # Rank offset for reciprocal rank fusion
+    PARALLEL_RETRIEVAL: bool = True  # Run the dense and BM25 legs concurrently
+    
+    # Query Cache (query embeddings and fused retrieval results)
+    QUERY_CACHE_SIZE: int = 256  # Entries per cache
+    QUERY_CACHE_TTL: float = 3600.0  # Seconds
+    
+    # Answer Cache (persistent; exact and semantic matches against the same chunks and memory)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_PATH: str = "./answer_cache.sqlite"
+    ANSWER_CACHE_SIZE: int = 1000  # Max cached answers
+    ANSWER_CACHE_TTL: float = 86400.0  # Seconds
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Min query cosine similarity for a semantic hit
     
     # LLM Parameters
     LLM_TEMPERATURE: float = 0.1
     LLM_MAX_TOKENS: int = 1024
     
+    # LLM HTTP Client
+    LLM_CONNECT_TIMEOUT: float = 5.0  # Seconds to establish a connection
+    LLM_TIMEOUT: float = 60.0  # Seconds to wait for a response
+    LLM_MAX_RETRIES: int = 3  # Retries on 429/5xx, timeouts and connection errors
+    LLM_BACKOFF_BASE: float = 0.5  # Seconds; doubles per retry, with full jitter
+    LLM_BACKOFF_MAX: float = 20.0  # Cap on a single backoff (Retry-After is honoured as given)
+    LLM_POOL_SIZE: int = 10  # Pooled connections kept open to the API
+    
     # Memory Configuration
     MEMORY_WINDOW: int = 5  # Number of previous Q&A pairs to remember
     MAX_MEMORY_TOKENS: int = 2000  # Max tokens for memory context
+    MAX_PROMPT_TOKENS: int = 12000  # Budget for memory, question and documents together
+    CONTEXT_MAX_TOKENS: int = 6000  # Budget for retrieved passages within the prompt
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # Word-trigram Jaccard above which a passage is a duplicate
+    
+    # Service (HTTP API and batch CLI)
+    API_HOST: str = os.getenv("API_HOST", "127.0.0.1")
+    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    API_MAX_CONCURRENCY: int = 32  # Questions answered at once; further requests wait
+    API_MAX_UPLOAD_MB: int = 200  # Largest accepted request body
+    RETRIEVE_WORKERS: int = 4  # Threads for search, reranking and cache lookups
+    GENERATE_WORKERS: int = 10  # Threads waiting on the LLM API (one per pooled connection)
+    
+    # Telemetry (per-stage spans and metrics for the question-answering path)
+    TELEMETRY_ENABLED: bool = True
+    TELEMETRY_EXPORTERS: str = os.getenv("TELEMETRY_EXPORTERS", "log")  # Comma-separated: "log", "json", "prometheus"
+    TELEMETRY_LOG_MIN_MS: float = 0.0  # Only log requests at least this slow
+    TELEMETRY_JSON_PATH: str = "./telemetry.jsonl"  # One trace per line
+    TELEMETRY_PROMETHEUS_PATH: str = "./rag_metrics.prom"  # Textfile for node_exporter
+    TELEMETRY_PROFILE: str = os.getenv("TELEMETRY_PROFILE", "off")  # "off", "cprofile" or "sample"
+    TELEMETRY_SLOW_MS: float = 5000.0  # Requests slower than this keep their profile
+    TELEMETRY_SAMPLE_INTERVAL_MS: float = 5.0  # Stack sampling interval
+    TELEMETRY_PROFILE_DIR: str = "./profiles"
     
     # Storage
     VECTOR_STORE_PATH: str = "./vector_store"
@@ -0,0 +1,132 @@
+from typing import Dict, List, Set, Tuple
+from config import config
+from utils import count_tokens
+
+
+# Tokens added per passage by the "[Document N] (Relevance: ...)" header and source line
+PASSAGE_OVERHEAD_TOKENS = 25
+
+# Characters of the next chunk searched for in the previous one to find their overlap
+OVERLAP_PROBE_CHARS = 8
+
+
+def pack_context(
+    docs: List[Tuple[Dict, float]],
+    max_tokens: int,
+    dedup_threshold: float = None
+) -> Tuple[List[Tuple[Dict, float]], int]:
+    """Pack reranked chunks into as few prompt tokens as possible
+
+    Adjacent chunks of the same file and page are merged into one passage
+    (dropping the overlap they share), near-duplicate passages are dropped,
+    and the token budget is filled in rerank-score order. Passages come back
+    best first, so [Document N] numbering follows relevance and matches the
+    returned sources. Merged passages list their chunk ids under 'ids'.
+    Returns the passages and the tokens they take up in the prompt.
+    """
+    if dedup_threshold is None:
+        dedup_threshold = config.CONTEXT_DEDUP_THRESHOLD
+    
+    passages = _merge_adjacent(docs)
+    passages.sort(key=lambda item: item[1], reverse=True)
+    
+    packed = []
+    kept_shingles = []
+    total_tokens = 0
+    for doc, score in passages:
+        shingles = _shingles(doc['content'])
+        if any(_jaccard(shingles, other) >= dedup_threshold for other in kept_shingles):
+            continue
+        
+        doc_tokens = count_tokens(doc['content']) + PASSAGE_OVERHEAD_TOKENS
+        if total_tokens + doc_tokens > max_tokens:
+            # A smaller, lower-ranked passage may still fit
+            continue
+        packed.append((doc, score))
+        kept_shingles.append(shingles)
+        total_tokens += doc_tokens
+    
+    return packed, total_tokens
+
+
+def _merge_adjacent(docs: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+    """Merge runs of consecutive chunks from the same file and page
+
+    Chunk ids are allocated in reading order, so neighbours on a page have
+    consecutive ids.
+    """
+    passages = [(doc, score) for doc, score in docs if doc.get('id') is None]
+    ordered = sorted(
+        ((doc, score) for doc, score in docs if doc.get('id') is not None),
+        key=lambda item: item[0]['id']
+    )
+    
+    run = []
+    for doc, score in ordered:
+        if run and not _adjacent(run[-1][0], doc):
+            passages.append(_join(run))
+            run = []
+        run.append((doc, score))
+    if run:
+        passages.append(_join(run))
+    return passages
+
+
+def _adjacent(prev: Dict, doc: Dict) -> bool:
+    return (
+        doc['id'] == prev['id'] + 1
+        and doc['metadata']['page'] == prev['metadata']['page']
+        and doc['metadata']['source'] == prev['metadata']['source']
+    )
+
+
+def _join(run: List[Tuple[Dict, float]]) -> Tuple[Dict, float]:
+    """Combine consecutive chunks into one passage scored by its best chunk"""
+    if len(run) == 1:
+        return run[0]
+    
+    first = run[0][0]
+    content = first['content']
+    for doc, _ in run[1:]:
+        content = _join_overlapping(content, doc['content'])
+    
+    # New dict: chunk dicts may be shared with the retrieval caches
+    merged = {
+        'id': first.get('id'),
+        'ids': [doc.get('id') for doc, _ in run],
+        'content': content,
+        'metadata': dict(first['metadata'])
+    }
+    return merged, max(score for _, score in run)
+
+
+def _join_overlapping(left: str, right: str) -> str:
+    """Concatenate two texts, dropping the longest suffix of left that prefixes right
+
+    Overlaps shorter than the probe are treated as none, so a coincidental
+    one- or two-character match does not eat text.
+    """
+    probe = right[:OVERLAP_PROBE_CHARS]
+    if len(probe) < OVERLAP_PROBE_CHARS:
+        return f"{left} {right}" if right else left
+    # Earliest match is the longest overlap
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return left[:pos] + right
+        pos = left.find(probe, pos + 1)
+    return f"{left} {right}"
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    """Word n-grams used for near-duplicate detection"""
+    words = text.lower().split()
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
\ No newline at end of file
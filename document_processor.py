@@ -1,12 +1,22 @@
 import os
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 import PyPDF2
 import pdfplumber
 from docx import Document
-from utils import clean_text, split_text_by_tokens
+from utils import clean_text, split_texts_by_tokens
 from config import config
 
 
+# DOCX/TXT have no pages; their text is split into pseudo-pages of this many words
+WORDS_PER_PAGE = 500
+
+# DOCX/TXT files smaller than a task's worth of words at this size are not split
+SPLIT_BYTES_PER_WORD = 6
+
+
 class DocumentProcessor:
     """Extract and process text from various document formats"""
     
@@ -15,100 +25,258 @@ class DocumentProcessor:
     
     def process_file(self, file_path: str) -> List[Dict[str, any]]:
         """Process a single file and return chunks with metadata"""
-        ext = os.path.splitext(file_path)[1].lower()
+        return self._chunk_pages(file_path, self._extract_pages(file_path))
+    
+    def process_files(
+        self,
+        file_paths: List[str],
+        workers: int = None
+    ) -> Iterator[Tuple[str, List[Dict[str, any]], Optional[Exception]]]:
+        """Process files across a process pool, yielding (file_path, chunks, error)
+
+        Results come back in input order as soon as each file is complete, so
+        callers can index and report progress per file. Large files are split
+        into page ranges that are processed in parallel and merged in page
+        order. A failing file yields its exception instead of chunks.
+        """
+        # Tasks come back in submission order, so each file's parts are contiguous
+        current, parts, error = None, [], None
+        files = [(file_path, 1) for file_path in file_paths]
+        for file_path, chunks, task_error in self.iter_chunks(files, workers):
+            if file_path != current:
+                if current is not None:
+                    yield current, ([] if error else [c for part in parts for c in part]), error
+                current, parts, error = file_path, [], None
+            parts.append(chunks)
+            error = error or task_error
+        if current is not None:
+            yield current, ([] if error else [c for part in parts for c in part]), error
+    
+    def iter_chunks(
+        self,
+        files: List[Tuple[str, int]],
+        workers: int = None
+    ) -> Iterator[Tuple[str, List[Dict[str, any]], Optional[Exception]]]:
+        """Stream (file_path, chunks, error) page-range batches for (file_path, start_page) pairs
+
+        Page ranges of every file share one bounded pool, so many small files
+        are extracted in parallel while only a fixed number of ranges is held
+        ahead of the consumer, however large the documents are. Batches come
+        back in file and page order; pages before a file's `start_page` are
+        skipped, which lets an interrupted ingestion resume.
+        """
+        tasks = (
+            (file_path, first, last)
+            for file_path, start_page in files
+            for first, last in self._page_ranges(file_path, start_page)
+        )
+        for (file_path, _, _), chunks, error in self._run_tasks(tasks, workers):
+            yield file_path, chunks, error
+    
+    @staticmethod
+    def _run_tasks(
+        tasks: Iterable[Tuple[str, int, Optional[int]]],
+        workers: int = None
+    ) -> Iterator[Tuple[Tuple[str, int, Optional[int]], List[Dict[str, any]], Optional[Exception]]]:
+        """Run (file_path, first_page, last_page) tasks, yielding results in task order"""
+        workers = workers or config.INGEST_WORKERS
+        task_iter = iter(tasks)
+        first_tasks = list(islice(task_iter, 2))
+        task_iter = chain(first_tasks, task_iter)
+        if workers <= 1 or len(first_tasks) <= 1:
+            # Not worth starting worker processes for a single task
+            for task in task_iter:
+                try:
+                    yield task, _process_task(*task), None
+                except Exception as e:
+                    yield task, [], e
+            return
         
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded number of tasks in flight so results of finished
+            # tasks do not pile up behind a slow one
+            pending = deque()
+            for task in task_iter:
+                pending.append((task, pool.submit(_process_task, *task)))
+                if len(pending) >= 2 * workers:
+                    break
+            
+            while pending:
+                task, future = pending.popleft()
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = [], e
+                
+                next_task = next(task_iter, None)
+                if next_task is not None:
+                    pending.append((next_task, pool.submit(_process_task, *next_task)))
+                yield task, result, error
+    
+    def _page_ranges(self, file_path: str, start_page: int = 1) -> List[Tuple[int, Optional[int]]]:
+        """Split large files into page ranges; small files are a single task"""
+        step = config.PAGES_PER_TASK
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext == '.pdf':
+                num_pages = self._pdf_page_count(file_path)
+            elif os.path.getsize(file_path) <= step * WORDS_PER_PAGE * SPLIT_BYTES_PER_WORD:
+                # Too small to be worth counting pseudo-pages
+                return [(start_page, None)]
+            else:
+                num_pages = -(-self._word_count(file_path) // WORDS_PER_PAGE)
+        except Exception:
+            # Let the worker surface the error for this file
+            return [(start_page, None)]
+        if num_pages - start_page + 1 <= step:
+            return [(start_page, None)]
+        return [
+            (first, min(first + step - 1, num_pages))
+            for first in range(start_page, num_pages + 1, step)
+        ]
+    
+    def _word_count(self, file_path: str) -> int:
+        """Number of words in a TXT or DOCX file, which fixes its pseudo-pages"""
+        if os.path.splitext(file_path)[1].lower() == '.docx':
+            return len(self._docx_words(file_path))
+        return sum(len(words) for words in _iter_txt_words(file_path))
+    
+    @staticmethod
+    def _pdf_page_count(file_path: str) -> int:
+        """Number of pages in a PDF, read from the page tree without extracting text"""
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    
+    def _extract_pages(self, file_path: str, first_page: int = 1, last_page: int = None) -> Dict[int, str]:
+        """Extract a 1-based inclusive page range (pseudo-pages for DOCX/TXT)"""
+        ext = os.path.splitext(file_path)[1].lower()
         if ext == '.pdf':
-            text_by_page = self._extract_pdf(file_path)
-        elif ext == '.docx':
-            text_by_page = self._extract_docx(file_path)
-        elif ext == '.txt': 
-            text_by_page = self._extract_txt(file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {ext}")
+            return self._extract_pdf(file_path, first_page, last_page)
+        if ext == '.docx':
+            return self._extract_docx(file_path, first_page, last_page)
+        if ext == '.txt':
+            return self._extract_txt(file_path, first_page, last_page)
+        raise ValueError(f"Unsupported file format: {ext}")
+    
+    def _chunk_pages(self, file_path: str, text_by_page: Dict[int, str]) -> List[Dict[str, any]]:
+        """Clean and chunk extracted pages"""
+        pages = []
+        for page_num, text in text_by_page. items():
+            cleaned = clean_text(text)
+            if cleaned:
+                pages.append((page_num, cleaned))
+        
+        # Tokenize all pages in one batch
+        chunks_by_page = split_texts_by_tokens(
+            [text for _, text in pages],
+            chunk_size=config. CHUNK_SIZE,
+            overlap=config.CHUNK_OVERLAP,
+            snap=config.CHUNK_SNAP
+        )
         
         # Create chunks with metadata
         chunks = []
-        for page_num, text in text_by_page. items():
-            cleaned = clean_text(text)
-            if not cleaned:
-                continue
-                
-            page_chunks = split_text_by_tokens(
-                cleaned,
-                chunk_size=config. CHUNK_SIZE,
-                overlap=config.CHUNK_OVERLAP
-            )
-            
+        for (page_num, _), page_chunks in zip(pages, chunks_by_page):
             for chunk_idx, chunk in enumerate(page_chunks):
                 chunks.append({
                     'content': chunk,
                     'metadata': {
                         'filename': os.path.basename(file_path),
                         'page': page_num,
-                        'chunk_id': f"{page_num}_{chunk_idx}",
+                        'chunk_index': chunk_idx,  # Position on the page; chunk_id is assigned when indexed
                         'source': file_path
                     }
                 })
         
         return chunks
     
-    def _extract_pdf(self, file_path: str) -> Dict[int, str]:
-        """Extract text from PDF"""
+    def _extract_pdf(self, file_path: str, first_page: int = 1, last_page: int = None) -> Dict[int, str]:
+        """Extract text from PDF, optionally limited to a 1-based inclusive page range"""
         text_by_page = {}
         
         try:
             # Try pdfplumber first (better for complex PDFs)
             with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages, 1):
+                pages = pdf.pages[first_page - 1:last_page]
+                for i, page in enumerate(pages, first_page):
                     text = page.extract_text()
+                    # Parsed layout objects are cached per page; free them as we go
+                    page.flush_cache()
                     if text:
                         text_by_page[i] = text
         except Exception: 
             # Fallback to PyPDF2
+            text_by_page = {}
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for i, page in enumerate(pdf_reader.pages, 1):
+                pages = pdf_reader.pages[first_page - 1:last_page]
+                for i, page in enumerate(pages, first_page):
                     text = page.extract_text()
                     if text: 
                         text_by_page[i] = text
         
         return text_by_page
     
-    def _extract_docx(self, file_path: str) -> Dict[int, str]:
-        """Extract text from DOCX"""
+    def _docx_words(self, file_path: str) -> List[str]:
+        """Words of all non-empty DOCX paragraphs"""
         doc = Document(file_path)
-        text_by_page = {}
-        
         full_text = []
         for para in doc.paragraphs:
             if para.text. strip():
                 full_text. append(para.text)
-        
+        return '\n'.join(full_text).split()
+    
+    def _extract_docx(self, file_path: str, first_page: int = 1, last_page: int = None) -> Dict[int, str]:
+        """Extract text from DOCX"""
         # DOCX doesn't have pages, so we simulate pages (every 500 words)
-        all_text = '\n'.join(full_text)
-        words = all_text.split()
-        
-        words_per_page = 500
-        for i in range(0, len(words), words_per_page):
-            page_num = (i // words_per_page) + 1
-            page_text = ' '.join(words[i:i + words_per_page])
-            text_by_page[page_num] = page_text
-        
-        return text_by_page
+        words = self._docx_words(file_path)
+        start = (first_page - 1) * WORDS_PER_PAGE
+        end = None if last_page is None else last_page * WORDS_PER_PAGE
+        return _pseudo_pages(words[start:end], first_page)
     
-    def _extract_txt(self, file_path:  str) -> Dict[int, str]:
-        """Extract text from TXT"""
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            text = f.read()
-        
-        # Split into pseudo-pages
-        words = text.split()
-        text_by_page = {}
-        words_per_page = 500
-        
-        for i in range(0, len(words), words_per_page):
-            page_num = (i // words_per_page) + 1
-            page_text = ' '.join(words[i:i + words_per_page])
-            text_by_page[page_num] = page_text
-        
-        return text_by_page
\ No newline at end of file
+    def _extract_txt(self, file_path: str, first_page: int = 1, last_page: int = None) -> Dict[int, str]:
+        """Extract text from TXT, reading only as far as the requested pseudo-pages"""
+        start = (first_page - 1) * WORDS_PER_PAGE
+        end = None if last_page is None else last_page * WORDS_PER_PAGE
+        selected = []
+        seen = 0
+        for words in _iter_txt_words(file_path):
+            lo = max(start - seen, 0)
+            hi = len(words) if end is None else min(end - seen, len(words))
+            if lo < hi:
+                selected.extend(words[lo:hi])
+            seen += len(words)
+            if end is not None and seen >= end:
+                break
+        return _pseudo_pages(selected, first_page)
+
+
+def _pseudo_pages(words: List[str], first_page: int) -> Dict[int, str]:
+    """Group words into pseudo-pages numbered from first_page"""
+    return {
+        first_page + i // WORDS_PER_PAGE: ' '.join(words[i:i + WORDS_PER_PAGE])
+        for i in range(0, len(words), WORDS_PER_PAGE)
+    }
+
+
+def _iter_txt_words(file_path: str, block_size: int = 1 << 20) -> Iterator[List[str]]:
+    """Words of a text file, a block at a time"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        tail = ''
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            block = tail + block
+            words = block.split()
+            # A word cut off at the end of the block continues in the next one
+            tail = '' if block[-1].isspace() or not words else words.pop()
+            yield words
+        if tail:
+            yield [tail]
+
+
+def _process_task(file_path: str, first_page: int, last_page: Optional[int]) -> List[Dict[str, any]]:
+    """Pool worker: chunk one page range of a file"""
+    processor = DocumentProcessor()
+    return processor._chunk_pages(file_path, processor._extract_pages(file_path, first_page, last_page))
\ No newline at end of file
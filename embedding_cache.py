@@ -0,0 +1,133 @@
+import os
+import pickle
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple
+
+
+DIGEST_SIZE = 20  # sha1 of key and vector, per slot
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of chunk embeddings
+
+    Each slot also stores a digest of its key and vector. The key index is
+    only written on flush(), while memmapped vectors can reach disk at any
+    time, so after a crash a slot may hold a newer vector than the index
+    says; lookups verify the digest and treat a mismatch as a miss.
+    """
+    
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_entries: int):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        
+        # One vector file per model so switching models never mixes embeddings
+        os.makedirs(cache_dir, exist_ok=True)
+        tag = hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:16]
+        self.vectors_path = os.path.join(cache_dir, f"{tag}.f32")
+        self.index_path = os.path.join(cache_dir, f"{tag}.idx")
+        self.digests_path = os.path.join(cache_dir, f"{tag}.sha1")
+        
+        self._slots = OrderedDict()  # key -> slot, least recently used first
+        self._free = []
+        self._load()
+    
+    def _load(self):
+        """Open the vector file and restore the key index"""
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            with open(self.index_path, 'rb') as f:
+                state = pickle.load(f)
+            if state['dim'] == self.dim:
+                self._slots = OrderedDict(
+                    (key, slot) for key, slot in state['slots'] if slot < self.max_entries
+                )
+        
+        # Size the file for the configured capacity (sparse on most filesystems)
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(self.max_entries * self.dim * 4)
+        self._vectors = np.memmap(
+            self.vectors_path,
+            dtype='float32',
+            mode='r+',
+            shape=(self.max_entries, self.dim)
+        )
+        with open(self.digests_path, 'ab') as f:
+            f.truncate(self.max_entries * DIGEST_SIZE)
+        self._digests = np.memmap(
+            self.digests_path,
+            dtype='uint8',
+            mode='r+',
+            shape=(self.max_entries, DIGEST_SIZE)
+        )
+        
+        used = set(self._slots.values())
+        self._free = [slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used]
+    
+    def key(self, text: str) -> str:
+        """Cache key for a chunk: model name plus whitespace-normalized text"""
+        normalized = ' '.join(text.split())
+        return hashlib.sha1(f"{self.model_name}\0{normalized}".encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _digest(key: str, vector: np.ndarray) -> bytes:
+        return hashlib.sha1(key.encode('utf-8') + np.asarray(vector, dtype='float32').tobytes()).digest()
+    
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """Return cached embeddings and the positions of texts that missed"""
+        embeddings = np.zeros((len(texts), self.dim), dtype='float32')
+        missing = []
+        
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    missing.append(i)
+                    continue
+                vector = np.array(self._vectors[slot])
+                if self._digests[slot].tobytes() != self._digest(key, vector):
+                    # Slot was reused (or torn) after the index was last flushed
+                    del self._slots[key]
+                    self._free.append(slot)
+                    missing.append(i)
+                    continue
+                self._slots.move_to_end(key)
+                embeddings[i] = vector
+        
+        return embeddings, missing
+    
+    def store(self, texts: List[str], embeddings: np.ndarray):
+        """Add embeddings, evicting least recently used entries when full"""
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self._vectors[slot] = embedding
+                self._digests[slot] = np.frombuffer(self._digest(key, embedding), dtype='uint8')
+    
+    def flush(self):
+        """Persist vectors and the key index"""
+        with self._lock:
+            self._vectors.flush()
+            self._digests.flush()
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    'dim': self.dim,
+                    'slots': list(self._slots.items())
+                }, f)
+            os.replace(tmp_path, self.index_path)
+    
+    def __len__(self) -> int:
+        return len(self._slots)
\ No newline at end of file
@@ -1,33 +1,145 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import Callable, List, Optional
 from config import config
+from embedding_cache import EmbeddingCache
+from inference_backend import load_embedding_model
 
 
 class EmbeddingManager:
     """Generate embeddings using local transformer models"""
     
-    def __init__(self):
-        print(f"Loading embedding model: {config.EMBEDDING_MODEL}")
-        self.model = SentenceTransformer(config.EMBEDDING_MODEL)
-        print("✅ Embedding model loaded")
+    def __init__(self, model=None):
+        if model is None:
+            print(f"Loading embedding model: {config.EMBEDDING_MODEL}")
+            self.model, self.backend = load_embedding_model(config.EMBEDDING_MODEL)
+            print(f"✅ Embedding model loaded ({self.backend})")
+        else:
+            # Preloaded or stub encoder (benchmarks)
+            self.model, self.backend = model, 'custom'
+        
+        # Set by ModelRuntime to batch queries across sessions
+        self.query_batcher = None
+        
+        self.cache = None
+        if config.EMBEDDING_CACHE_ENABLED:
+            # fp32 ONNX matches PyTorch within tolerance; other vectors get their own cache
+            cache_name = config.EMBEDDING_MODEL
+            if self.backend not in ('torch', 'onnx'):
+                cache_name = f"{config.EMBEDDING_MODEL}@{self.backend}"
+            self.cache = EmbeddingCache(
+                config.EMBEDDING_CACHE_PATH,
+                cache_name,
+                self.model.get_sentence_embedding_dimension(),
+                config.EMBEDDING_CACHE_SIZE
+            )
     
-    def embed_documents(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for documents"""
-        embeddings = self.model.encode(
+    def embed_documents(
+        self,
+        texts: List[str],
+        flush: bool = True,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """Generate embeddings for documents, encoding only cache misses
+
+        Pass flush=False when embedding many small batches and call
+        flush_cache() once at the end. progress(done, total) is called after
+        every forward pass with the number of texts encoded so far.
+        """
+        if self.cache is None:
+            return self._encode(texts, progress)
+        
+        embeddings, missing = self.cache.lookup(texts)
+        if missing:
+            missed_texts = [texts[i] for i in missing]
+            fresh = self._encode(missed_texts, progress)
+            embeddings[missing] = fresh
+            self.cache.store(missed_texts, fresh)
+            if flush:
+                self.cache.flush()
+        
+        print(f"✅ Embedded {len(texts)} chunks ({len(texts) - len(missing)} from cache)")
+        return embeddings
+    
+    def flush_cache(self):
+        """Persist the embedding cache"""
+        if self.cache is not None:
+            self.cache.flush()
+    
+    def _encode(
+        self,
+        texts: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """Run the transformer over texts in length-bucketed batches
+
+        Texts are sorted by token length and grouped so each batch pads to
+        at most EMBED_TOKEN_BUDGET tokens: short chunks share large batches
+        instead of being padded to a long neighbour. Embeddings come back in
+        the original order.
+        """
+        embeddings = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype='float32')
+        if not texts:
+            return embeddings
+        
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+        
+        done = 0
+        for batch in self._token_batches(order, lengths):
+            embeddings[batch] = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                normalize_embeddings=True  # For cosine similarity
+            )
+            done += len(batch)
+            if progress is not None:
+                progress(done, len(texts))
+        return embeddings
+    
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Model token counts, capped at the sequence length the model truncates to"""
+        max_length = self.model.max_seq_length
+        encoded = self.model.tokenizer(
             texts,
-            batch_size=32,
-            show_progress_bar=True,
-            normalize_embeddings=True  # For cosine similarity
+            add_special_tokens=True,
+            truncation=True,
+            max_length=max_length
         )
-        return embeddings
+        return [len(ids) for ids in encoded['input_ids']]
+    
+    @staticmethod
+    def _token_batches(order: List[int], lengths: List[int]) -> List[List[int]]:
+        """Split longest-first indices into batches within the padded-token budget"""
+        batches = []
+        batch = []
+        for i in order:
+            # The first text of a batch is its longest, so it sets the padded width
+            if batch and (len(batch) + 1) * lengths[batch[0]] > config.EMBED_TOKEN_BUDGET:
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
     
     def embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for a query"""
+        if self.query_batcher is not None:
+            return self.query_batcher.submit([query])[0]
+        return self.embed_queries([query])[0]
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Generate embeddings for several queries in one forward pass"""
         # Add instruction for better retrieval (BGE models)
-        instructed_query = f"Represent this sentence for searching relevant passages: {query}"
-        embedding = self.model.encode(
-            instructed_query,
+        instructed_queries = [
+            f"Represent this sentence for searching relevant passages: {query}"
+            for query in queries
+        ]
+        embeddings = self.model.encode(
+            instructed_queries,
+            batch_size=max(len(instructed_queries), 1),
+            show_progress_bar=False,
             normalize_embeddings=True
         )
-        return embedding
\ No newline at end of file
+        return embeddings
\ No newline at end of file
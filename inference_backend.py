@@ -0,0 +1,88 @@
+import os
+import importlib.util
+from typing import Tuple
+from sentence_transformers import SentenceTransformer, CrossEncoder
+from config import config
+
+
+BACKENDS = ('torch', 'onnx')
+
+# Agreement with the PyTorch models, checked by benchmarks/backends.py:
+# minimum cosine similarity between normalized embeddings, and maximum absolute
+# difference between cross-encoder logits
+EMBEDDING_MIN_COSINE = {'onnx': 0.9999, 'onnx-qint8': 0.99}
+RERANKER_MAX_SCORE_DIFF = {'onnx': 1e-3, 'onnx-qint8': 0.5}
+
+
+def onnx_available() -> bool:
+    """Whether ONNX Runtime and the optimum exporter are installed"""
+    return all(importlib.util.find_spec(name) is not None for name in ('onnxruntime', 'optimum'))
+
+
+def load_embedding_model(
+    model_name: str,
+    backend: str = None,
+    quantize: bool = None
+) -> Tuple[SentenceTransformer, str]:
+    """Load a SentenceTransformer on the configured backend
+
+    Returns the model and the backend actually used: "torch", "onnx" or
+    "onnx-qint8".
+    """
+    return _load(SentenceTransformer, model_name, backend, quantize)
+
+
+def load_cross_encoder(
+    model_name: str,
+    max_length: int = None,
+    backend: str = None,
+    quantize: bool = None
+) -> Tuple[CrossEncoder, str]:
+    """Load a CrossEncoder on the configured backend"""
+    return _load(CrossEncoder, model_name, backend, quantize, max_length=max_length)
+
+
+def _load(model_cls, model_name: str, backend: str, quantize: bool, **kwargs):
+    backend = config.INFERENCE_BACKEND if backend is None else backend
+    quantize = config.ONNX_QUANTIZE if quantize is None else quantize
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+    
+    if backend == 'onnx':
+        if not onnx_available():
+            print("⚠️ onnxruntime/optimum not installed, using the PyTorch backend")
+        else:
+            try:
+                return _load_onnx(model_cls, model_name, quantize, **kwargs)
+            except Exception as e:
+                print(f"⚠️ ONNX backend unavailable for {model_name} ({e}), using the PyTorch backend")
+    
+    return model_cls(model_name, **kwargs), 'torch'
+
+
+def _load_onnx(model_cls, model_name: str, quantize: bool, **kwargs):
+    """Export (once) and load an ONNX model, optionally int8-quantized
+
+    Exports live under ONNX_MODEL_DIR, one directory per model, so the
+    conversion and quantization only run on first use.
+    """
+    export_dir = os.path.join(config.ONNX_MODEL_DIR, model_name.replace('/', '__'))
+    if not os.path.exists(os.path.join(export_dir, 'onnx', 'model.onnx')):
+        print(f"Exporting {model_name} to ONNX")
+        model_cls(model_name, backend='onnx', **kwargs).save(export_dir)
+    
+    file_name = os.path.join('onnx', 'model.onnx')
+    tag = 'onnx'
+    if quantize:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        
+        quantization = config.ONNX_QUANTIZATION_CONFIG
+        file_name = os.path.join('onnx', f"model_qint8_{quantization}.onnx")
+        tag = 'onnx-qint8'
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            print(f"Quantizing {model_name} to int8 ({quantization})")
+            model = model_cls(export_dir, backend='onnx', **kwargs)
+            export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+    
+    model = model_cls(export_dir, backend='onnx', model_kwargs={'file_name': file_name}, **kwargs)
+    return model, tag
\ No newline at end of file
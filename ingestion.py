@@ -0,0 +1,159 @@
+import os
+import queue
+import threading
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from document_processor import DocumentProcessor
+from embedding_manager import EmbeddingManager
+from vector_store import VectorStore
+from config import config
+
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Streaming ingestion: extract -> clean -> chunk -> embed -> index
+
+    Page ranges of all files are extracted by one process pool, fed from a
+    background thread into a bounded queue, so extraction stalls when
+    embedding falls behind and at most a fixed number of pages are held in
+    memory regardless of document size. Chunks
+    are embedded and appended to the index in micro-batches, and every batch
+    is committed to the chunk store so an interrupted ingestion resumes
+    after the last committed page.
+    """
+    
+    def __init__(
+        self,
+        doc_processor: DocumentProcessor,
+        embedding_manager: EmbeddingManager,
+        vector_store: VectorStore,
+        batch_size: int = None,
+        queue_size: int = None
+    ):
+        self.doc_processor = doc_processor
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.batch_size = batch_size or config.EMBED_BATCH_SIZE
+        self.queue_size = queue_size or config.INGEST_QUEUE_SIZE
+    
+    def ingest_files(self, files: Dict[str, str]) -> Iterator[Tuple[str, int, Optional[Exception]]]:
+        """Ingest {file_path: content hash}, yielding (file_path, num_chunks, error) per file
+
+        Page ranges of all files are extracted by one shared worker pool while
+        earlier files are still being embedded and indexed. A failed file
+        reports the chunks committed before the error; they stay in place, so
+        ingesting it again resumes after them.
+        """
+        start_pages = {
+            file_path: self._begin(file_path, file_hash)
+            for file_path, file_hash in files.items()
+        }
+        
+        # Batches arrive in file order, so each file's batches are one contiguous group
+        batches = self._extract(list(start_pages.items()))
+        for file_path, group in groupby(batches, key=lambda item: item[0]):
+            num_chunks, error = self._ingest_batches(file_path, files[file_path], start_pages[file_path], group)
+            yield file_path, num_chunks, error
+        self.embedding_manager.flush_cache()
+    
+    def ingest_file(self, file_path: str, file_hash: str) -> int:
+        """Stream one file into the index and return the number of chunks added"""
+        for _, num_chunks, error in self.ingest_files({file_path: file_hash}):
+            if error is not None:
+                raise error
+            return num_chunks
+    
+    def _begin(self, file_path: str, file_hash: str) -> int:
+        """Register a file for ingestion and return the page to start from"""
+        start_page = self.vector_store.resume_page(file_path, file_hash)
+        if start_page is None:
+            start_page = 1
+            self.vector_store.remove_file(file_path)
+            self.vector_store.begin_file(file_path, os.path.basename(file_path), file_hash)
+            self.vector_store.checkpoint()
+        else:
+            print(f"↩️ Resuming {os.path.basename(file_path)} from page {start_page}")
+        return start_page
+    
+    def _ingest_batches(
+        self,
+        file_path: str,
+        file_hash: str,
+        start_page: int,
+        batches: Iterable[Tuple[str, List[Dict], Optional[Exception]]]
+    ) -> Tuple[int, Optional[Exception]]:
+        """Embed and index one file's extracted batches
+
+        Returns the number of chunks committed and the error that stopped the
+        file, if any.
+        """
+        num_chunks = 0
+        batch = []
+        try:
+            for _, chunks, error in batches:
+                if error is not None:
+                    raise error
+                for chunk in chunks:
+                    # Only cut batches between pages so the checkpoint never splits a page
+                    if len(batch) >= self.batch_size and chunk['metadata']['page'] != batch[-1]['metadata']['page']:
+                        num_chunks += self._index_batch(file_path, batch)
+                        batch = []
+                    batch.append(chunk)
+            if batch:
+                num_chunks += self._index_batch(file_path, batch)
+            
+            if start_page == 1 and num_chunks == 0:
+                # Nothing to search in this file
+                self.vector_store.remove_file(file_path)
+            else:
+                self.vector_store.finish_file(file_path, file_hash)
+            self.vector_store.checkpoint()
+        except Exception as e:
+            return num_chunks, e
+        return num_chunks, None
+    
+    def _index_batch(self, file_path: str, batch: List[Dict]) -> int:
+        """Embed a micro-batch, append it to the index and commit it"""
+        texts = [chunk['content'] for chunk in batch]
+        embeddings = self.embedding_manager.embed_documents(texts, flush=False)
+        self.vector_store.append_chunks(file_path, embeddings, batch)
+        self.vector_store.checkpoint()
+        return len(batch)
+    
+    def _extract(self, files: List[Tuple[str, int]]) -> Iterator[Tuple[str, List[Dict], Optional[Exception]]]:
+        """Run extraction on a producer thread behind a bounded queue"""
+        batches = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        
+        def produce():
+            try:
+                for item in self.doc_processor.iter_chunks(files):
+                    if stop.is_set():
+                        return
+                    batches.put(item)
+            except Exception as e:
+                batches.put(e)
+            finally:
+                batches.put(_DONE)
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Unblock and wait for the producer if the consumer stopped early
+            stop.set()
+            while producer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
\ No newline at end of file
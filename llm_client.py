@@ -0,0 +1,144 @@
+import json
+import time
+import random
+import requests
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional
+from requests.adapters import HTTPAdapter
+from config import config
+
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LLMAPIError(Exception):
+    """Chat-completions request failed after all retries"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMClient:
+    """Chat-completions client with a persistent connection pool and retries
+
+    One requests.Session is shared by all calls (and threads), so answers
+    reuse open TCP/TLS connections. 429 and 5xx responses, timeouts and
+    connection errors are retried with jittered exponential backoff; a
+    Retry-After header from the server takes precedence over the backoff.
+    """
+    
+    def __init__(
+        self,
+        api_base: str = None,
+        token: str = None,
+        timeout: float = None,
+        connect_timeout: float = None,
+        max_retries: int = None,
+        pool_size: int = None
+    ):
+        self.api_base = (api_base or config.GITHUB_API_BASE).rstrip('/')
+        self.timeout = (
+            connect_timeout or config.LLM_CONNECT_TIMEOUT,
+            timeout or config.LLM_TIMEOUT
+        )
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        
+        pool_size = pool_size or config.LLM_POOL_SIZE
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({
+            "Authorization": f"Bearer {token or config.GITHUB_TOKEN}",
+            "Content-Type": "application/json"
+        })
+    
+    def chat(self, payload: Dict, stream: bool = False) -> requests.Response:
+        """POST to /chat/completions, retrying transient failures"""
+        url = f"{self.api_base}/chat/completions"
+        
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise LLMAPIError(f"LLM API unreachable: {e}") from e
+            else:
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise LLMAPIError(
+                        f"LLM API returned {response.status_code}: {response.text[:200]}",
+                        status_code=response.status_code
+                    )
+                retry_after = self._retry_after(response)
+                response.close()
+            
+            time.sleep(self._backoff(attempt, retry_after))
+        
+        raise LLMAPIError("LLM API retries exhausted")
+    
+    def complete(self, payload: Dict) -> str:
+        """Run a non-streaming completion and return the message text"""
+        response = self.chat(payload)
+        try:
+            result = response.json()
+            return result['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMAPIError(f"Malformed LLM API response: {e}") from e
+    
+    def stream(self, payload: Dict) -> Iterator[str]:
+        """Run a streaming completion, yielding content deltas as they arrive
+
+        Retries only cover establishing the stream; a connection dropped
+        mid-answer raises LLMAPIError.
+        """
+        response = self.chat({**payload, 'stream': True}, stream=True)
+        try:
+            # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError as e:
+                    raise LLMAPIError(f"Malformed LLM API stream event: {e}") from e
+                for choice in event.get('choices', []):
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        yield content
+        except requests.RequestException as e:
+            raise LLMAPIError(f"LLM API stream interrupted: {e}") from e
+        finally:
+            response.close()
+    
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the next attempt"""
+        if retry_after is not None:
+            return retry_after
+        # Full jitter keeps concurrent clients from retrying in lockstep
+        return random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+    
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+    
+    def close(self):
+        self.session.close()
\ No newline at end of file
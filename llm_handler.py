@@ -1,7 +1,56 @@
-import requests
-from typing import List, Dict
+import time
+import asyncio
+from functools import partial
+from typing import List, Dict, Iterator, Tuple
 from config import config
-from utils import count_tokens, truncate_memory
+from llm_client import LLMClient
+from context_packer import pack_context
+from telemetry import telemetry, TOKEN_BUCKETS
+from utils import count_tokens, memory_item_tokens, truncate_memory
+
+
+class AnswerStream:
+    """Iterable of answer tokens that records the full text and timings
+
+    metrics holds time to first token, total generation time and the number
+    of streamed deltas (seconds, from the moment the request is sent); they
+    are filled in as the stream is consumed. Answers replayed from the
+    answer cache also name the cache tier under 'cached'.
+    """
+    
+    def __init__(self, tokens: Iterator[str], sources: List[Dict], cached: str = None):
+        self._tokens = tokens
+        self.sources = sources
+        self.answer = ""
+        self.metrics = {'ttft': None, 'total': None, 'tokens': 0}
+        if cached:
+            self.metrics['cached'] = cached
+        self.on_complete = None  # Called with the stream once every token has been read
+    
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        parts = []
+        try:
+            for token in self._tokens:
+                if self.metrics['ttft'] is None:
+                    self.metrics['ttft'] = time.perf_counter() - start
+                parts.append(token)
+                self.metrics['tokens'] += 1
+                yield token
+        except Exception:
+            if 'cached' not in self.metrics:
+                telemetry.count('errors_total', stage='llm_stream')
+            raise
+        finally:
+            self.answer = ''.join(parts)
+            self.metrics['total'] = time.perf_counter() - start
+            if 'cached' not in self.metrics:
+                telemetry.record('llm_ttft', self.metrics['ttft'])
+                telemetry.record('llm_stream', self.metrics['total'], deltas=self.metrics['tokens'])
+        if 'cached' not in self.metrics:
+            telemetry.count('llm_completion_tokens_total', count_tokens(self.answer))
+        if self.on_complete is not None:
+            self.on_complete(self)
 
 
 class LLMHandler:
@@ -10,10 +59,12 @@ class LLMHandler:
     def __init__(self):
         self.api_base = config. GITHUB_API_BASE
         self.model = config.MODEL_NAME
-        self.headers = {
-            "Authorization": f"Bearer {config.GITHUB_TOKEN}",
-            "Content-Type": "application/json"
-        }
+        self.client = LLMClient(self.api_base, config.GITHUB_TOKEN)
+        
+        # System prompt and question template, the part of every prompt that never changes
+        self.template_tokens = sum(
+            count_tokens(message['content']) for message in self._create_messages_with_memory('', '', [])
+        )
     
     def generate_answer(
         self,
@@ -22,31 +73,85 @@ class LLMHandler:
         chat_history: List[Dict] = None
     ) -> Dict[str, any]:
         """Generate answer using RAG with conversational memory"""
-        
-        # Prepare context from documents
-        context = self._format_context(context_docs)
-        
-        # Prepare chat history
-        if chat_history is None:
-            chat_history = []
-        
-        # Truncate history to fit token limit
-        truncated_history = truncate_memory(
-            chat_history[-config.MEMORY_WINDOW: ],
-            config.MAX_MEMORY_TOKENS
-        )
-        
-        # Create prompt with memory
-        messages = self._create_messages_with_memory(query, context, truncated_history)
+        messages, context_docs = self._prepare_messages(query, context_docs, chat_history)
         
         # Call API
-        response = self._call_api(messages)
+        start = time.perf_counter()
+        with telemetry.span('llm_generate'):
+            response = self._call_api(messages)
+        elapsed = time.perf_counter() - start
+        telemetry.count('llm_completion_tokens_total', count_tokens(response))
         
         return {
             'answer': response,
-            'sources': context_docs
+            'sources': context_docs,
+            'metrics': {'ttft': elapsed, 'total': elapsed}
         }
     
+    def stream_answer(
+        self,
+        query: str,
+        context_docs: List[Dict],
+        chat_history: List[Dict] = None
+    ) -> AnswerStream:
+        """Stream the answer token by token
+
+        Iterate the returned AnswerStream to receive tokens; afterwards its
+        answer, sources and metrics hold the full result.
+        """
+        messages, context_docs = self._prepare_messages(query, context_docs, chat_history)
+        return AnswerStream(self.client.stream(self._payload(messages)), context_docs)
+    
+    def _prepare_messages(
+        self,
+        query: str,
+        context_docs: List[Dict],
+        chat_history: List[Dict] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Build the prompt messages and return them with the documents that fit"""
+        with telemetry.span('build_prompt') as span:
+            truncated_history = self.truncate_history(chat_history)
+            
+            # Documents get whatever the prompt budget leaves after memory and the question
+            memory_tokens = sum(memory_item_tokens(item) for item in truncated_history)
+            query_tokens = count_tokens(query)
+            context_docs, context_tokens = pack_context(
+                context_docs,
+                min(
+                    config.CONTEXT_MAX_TOKENS,
+                    config.MAX_PROMPT_TOKENS - memory_tokens - query_tokens
+                )
+            )
+            context = self._format_context(context_docs)
+            
+            # Create prompt with memory
+            messages = self._create_messages_with_memory(query, context, truncated_history)
+            
+            # Summed from counts already taken above rather than tokenizing the prompt again
+            prompt_tokens = self.template_tokens + memory_tokens + query_tokens + context_tokens
+            if span is not None:
+                span.attrs.update(tokens=prompt_tokens, passages=len(context_docs))
+        telemetry.count('llm_prompt_tokens_total', prompt_tokens)
+        telemetry.observe('llm_prompt_tokens', prompt_tokens, TOKEN_BUCKETS)
+        return messages, context_docs
+    
+    async def agenerate_answer(
+        self,
+        query: str,
+        context_docs: List[Dict],
+        chat_history: List[Dict] = None
+    ) -> Dict[str, any]:
+        """Async generate_answer for concurrent callers
+
+        Requests run on the event loop's thread pool and share the client's
+        connection pool, so many questions can be in flight at once.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            partial(self.generate_answer, query, context_docs, chat_history)
+        )
+    
     def _format_context(self, docs: List[Dict]) -> str:
         """Format retrieved documents as context"""
         context_parts = []
@@ -58,6 +163,16 @@ class LLMHandler:
             )
         return "\n". join(context_parts)
     
+    @staticmethod
+    def truncate_history(chat_history: List[Dict] = None) -> List[Dict]:
+        """Memory sent with a question: the last turns that fit the token limit"""
+        if chat_history is None:
+            chat_history = []
+        return truncate_memory(
+            chat_history[-config.MEMORY_WINDOW: ],
+            config.MAX_MEMORY_TOKENS
+        )
+    
     def _create_messages_with_memory(
         self,
         query: str,
@@ -107,21 +222,15 @@ Answer:"""
         
         return messages
     
-    def _call_api(self, messages:  List[Dict]) -> str:
-        """Call GitHub Models API"""
-        url = f"{self.api_base}/chat/completions"
-        
-        payload = {
+    def _payload(self, messages: List[Dict]) -> Dict:
+        """Chat-completions request body"""
+        return {
             "model": self.model,
             "messages":  messages,
             "temperature": config.LLM_TEMPERATURE,
             "max_tokens": config.LLM_MAX_TOKENS
         }
-        
-        try:
-            response = requests.post(url, json=payload, headers=self.headers, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        except Exception as e:
-            return f"Error calling LLM API: {str(e)}"
\ No newline at end of file
+    
+    def _call_api(self, messages:  List[Dict]) -> str:
+        """Call GitHub Models API (raises LLMAPIError once retries are exhausted)"""
+        return self.client.complete(self._payload(messages))
\ No newline at end of file
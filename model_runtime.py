@@ -0,0 +1,125 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Sequence
+from embedding_manager import EmbeddingManager
+from reranker import Reranker
+from config import config
+
+
+class MicroBatcher:
+    """Coalesce concurrent model calls into shared forward passes
+
+    Callers submit a list of inputs and block until their outputs are ready.
+    A worker thread takes the first waiting request, keeps collecting more
+    for up to `window` seconds or until `max_batch` inputs are queued, runs
+    `fn` once over all of them and hands each caller its slice of the
+    results in order.
+    """
+    
+    def __init__(self, fn: Callable[[List], Sequence], max_batch: int, window: float, name: str = None):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+    
+    def submit(self, items: List) -> List:
+        """Run fn over items as part of the next batch and return their outputs"""
+        if not items:
+            return []
+        future = Future()
+        self._queue.put((items, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0][0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+            
+            items = [item for batch, _ in requests for item in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.items += len(items)
+            start = 0
+            for batch, future in requests:
+                future.set_result(list(results[start:start + len(batch)]))
+                start += len(batch)
+    
+    def stats(self) -> Dict[str, float]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch': self.items / self.batches if self.batches else 0.0
+        }
+
+
+class ModelRuntime:
+    """Embedding model and reranker loaded once and shared by every session
+
+    Query embeddings and reranker pair scores from concurrent sessions go
+    through micro-batchers, so simultaneous questions share forward passes
+    instead of contending for the CPU one at a time.
+    """
+    
+    def __init__(self):
+        self.embedding_manager = EmbeddingManager()
+        self.reranker = Reranker()
+        
+        if config.MODEL_BATCH_WINDOW_MS > 0:
+            window = config.MODEL_BATCH_WINDOW_MS / 1000
+            self.embedding_manager.query_batcher = MicroBatcher(
+                self.embedding_manager.embed_queries,
+                config.MODEL_MAX_BATCH,
+                window,
+                name="query-embedding-batcher"
+            )
+            self.reranker.pair_batcher = MicroBatcher(
+                self.reranker.predict,
+                config.MODEL_MAX_BATCH,
+                window,
+                name="rerank-batcher"
+            )
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Micro-batching counters per model"""
+        stats = {}
+        if self.embedding_manager.query_batcher is not None:
+            stats['query_embedding'] = self.embedding_manager.query_batcher.stats()
+        if self.reranker.pair_batcher is not None:
+            stats['rerank'] = self.reranker.pair_batcher.stats()
+        return stats
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> ModelRuntime:
+    """The process-wide model runtime, loaded on first use"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = ModelRuntime()
+        return _runtime
\ No newline at end of file
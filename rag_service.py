@@ -0,0 +1,310 @@
+import asyncio
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from document_processor import DocumentProcessor
+from ingestion import IngestionPipeline
+from model_runtime import get_runtime
+from vector_store import VectorStore
+from retriever import HybridRetriever
+from llm_handler import LLMHandler, AnswerStream
+from answer_cache import AnswerCache
+from telemetry import telemetry
+from config import config
+from utils import compute_file_hash
+
+
+class EmptyIndexError(Exception):
+    """Raised when a question is asked before any document is indexed"""
+
+
+def serialize_sources(sources: List[Tuple[Dict, float]]) -> List[Dict]:
+    """JSON form of (chunk, score) pairs"""
+    return [
+        {
+            'id': doc.get('id'),
+            'ids': doc.get('ids', [doc.get('id')]),
+            'content': doc['content'],
+            'metadata': doc['metadata'],
+            'score': float(score)
+        }
+        for doc, score in sources
+    ]
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer, with waiting writers taking priority"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+    
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+def _attached(fn: Callable, *args):
+    """Run a pool task as part of the caller's trace, so its profile covers this thread"""
+    with telemetry.attach():
+        return fn(*args)
+
+
+class RAGService:
+    """Headless RAG pipeline: ingest, retrieve, rerank and answer
+
+    The Streamlit app, the HTTP API and the batch CLI are all clients of
+    this class. The synchronous methods are thread-safe: searches share the
+    index under a read lock while ingestion and removals take it exclusively.
+    The async methods run each stage on its own bounded thread pool, so slow
+    LLM calls never hold up retrieval for other requests and only one
+    ingestion writes to the index at a time.
+    """
+    
+    def __init__(self):
+        # Models are loaded once per process and shared by every service
+        runtime = get_runtime()
+        self.embedding_manager = runtime.embedding_manager
+        self.reranker = runtime.reranker
+        self.doc_processor = DocumentProcessor()
+        self.vector_store = VectorStore()
+        self.llm = LLMHandler()
+        self.answer_cache = None
+        if config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                config.ANSWER_CACHE_PATH,
+                config.ANSWER_CACHE_SIZE,
+                config.ANSWER_CACHE_TTL,
+                config.ANSWER_CACHE_SIMILARITY
+            )
+        
+        # Try to load existing index
+        self.vector_store.load()
+        self.retriever = HybridRetriever(self.embedding_manager, self.vector_store)
+        
+        self._index_lock = ReadWriteLock()
+        self._pools = {
+            'ingest': ThreadPoolExecutor(1, thread_name_prefix='ingest'),
+            'retrieve': ThreadPoolExecutor(config.RETRIEVE_WORKERS, thread_name_prefix='retrieve'),
+            'generate': ThreadPoolExecutor(config.GENERATE_WORKERS, thread_name_prefix='generate')
+        }
+    
+    # Index management
+    
+    def ingest(
+        self,
+        file_paths: Iterable[str],
+        on_file: Callable[[str, int, Optional[Exception]], None] = None
+    ) -> Dict:
+        """Index files incrementally, re-embedding only new or changed ones
+
+        on_file(path, num_chunks, error) is called as each pending file
+        finishes. Returns counts and per-file error messages.
+        """
+        pending = {}  # file path -> content hash
+        for file_path in file_paths:
+            file_hash = compute_file_hash(file_path)
+            if not self.vector_store.is_indexed(file_path, file_hash):
+                pending[file_path] = file_hash
+        
+        result = {'files': len(pending), 'chunks': 0, 'errors': {}}
+        if not pending:
+            return result
+        
+        pipeline = IngestionPipeline(self.doc_processor, self.embedding_manager, self.vector_store)
+        self._index_lock.acquire_write()
+        try:
+            for file_path, num_chunks, error in pipeline.ingest_files(pending):
+                if error is not None:
+                    result['errors'][file_path] = str(error)
+                result['chunks'] += num_chunks
+                if on_file is not None:
+                    on_file(file_path, num_chunks, error)
+            self.vector_store.save()
+            
+            # Cached retrieval results refer to the old index
+            self.retriever.refresh()
+        finally:
+            self._index_lock.release_write()
+        return result
+    
+    def remove_file(self, source: str):
+        """Remove a single document from the index"""
+        self._index_lock.acquire_write()
+        try:
+            self.vector_store.remove_file(source)
+            self.vector_store.save()
+            self.retriever.refresh()
+        finally:
+            self._index_lock.release_write()
+    
+    def clear(self):
+        """Drop every indexed document"""
+        self._index_lock.acquire_write()
+        try:
+            self.vector_store.clear()
+            self.retriever.refresh()
+        finally:
+            self._index_lock.release_write()
+    
+    def stats(self) -> Dict:
+        """Index size and cache counters"""
+        stats = {
+            'chunks': self.vector_store.num_documents(),
+            'documents': len(self.vector_store.indexed_files()),
+            'index_version': self.vector_store.version,
+            'caches': self.retriever.cache_stats(),
+            'micro_batching': get_runtime().stats()
+        }
+        stats['caches']['rerank_scores'] = self.reranker.cache_stats()
+        if self.answer_cache is not None:
+            stats['caches']['answers'] = self.answer_cache.stats()
+        return stats
+    
+    # Question answering
+    
+    def search(self, query: str) -> List[Tuple[Dict, float]]:
+        """Hybrid retrieval followed by cross-encoder reranking"""
+        with telemetry.span('index_lock_wait'):
+            self._index_lock.acquire_read()
+        try:
+            index = self.vector_store.index
+            if index is None or index.ntotal == 0:
+                raise EmptyIndexError("No documents indexed yet; ingest files first")
+            with telemetry.span('retrieve'):
+                retrieved_docs = self.retriever.retrieve(query)
+            return self.reranker.rerank(query, retrieved_docs)
+        finally:
+            self._index_lock.release_read()
+    
+    def answer(self, query: str, chat_history: List[Dict] = None) -> Dict:
+        """Answer a question and return answer, sources and metrics"""
+        with telemetry.trace('answer'):
+            docs = self.search(query)
+            cache_args, cached = self._cached_answer(query, docs, chat_history)
+            if cached is not None:
+                return cached
+            
+            result = self.llm.generate_answer(query, docs, chat_history)
+            self._store_answer(cache_args, result['answer'], result['sources'])
+            return result
+    
+    def stream_answer(self, query: str, chat_history: List[Dict] = None) -> AnswerStream:
+        """Answer a question as an AnswerStream of tokens
+
+        Cached answers come back as a single-token stream whose metrics name
+        the cache tier. Fresh answers are cached once fully streamed. Callers
+        open the telemetry trace, since the stream outlives this call.
+        """
+        docs = self.search(query)
+        cache_args, cached = self._cached_answer(query, docs, chat_history)
+        if cached is not None:
+            return AnswerStream(iter([cached['answer']]), cached['sources'], cached=cached['metrics']['cached'])
+        
+        stream = self.llm.stream_answer(query, docs, chat_history)
+        stream.on_complete = lambda s: self._store_answer(cache_args, s.answer, s.sources)
+        return stream
+    
+    def _cached_answer(
+        self,
+        query: str,
+        docs: List[Tuple[Dict, float]],
+        chat_history: List[Dict] = None
+    ) -> Tuple[Optional[tuple], Optional[Dict]]:
+        """Look up repeated questions over the same chunks and memory"""
+        if self.answer_cache is None:
+            return None, None
+        history = self.llm.truncate_history(chat_history)
+        cache_args = (
+            query,
+            self.retriever.embed_query(query),
+            self.answer_cache.chunk_set(docs),
+            self.answer_cache.history_hash(history),
+            self.vector_store.version
+        )
+        with telemetry.span('answer_cache'):
+            cached = self.answer_cache.get(*cache_args)
+        if cached is None:
+            telemetry.count('cache_requests_total', cache='answers', result='miss')
+            return cache_args, None
+        result, tier = cached
+        telemetry.count('cache_requests_total', cache='answers', result=tier)
+        return cache_args, {**result, 'metrics': {'ttft': 0.0, 'total': 0.0, 'cached': tier}}
+    
+    def _store_answer(self, cache_args: Optional[tuple], answer: str, sources: List[Tuple[Dict, float]]):
+        if cache_args is not None and answer:
+            self.answer_cache.put(*cache_args, answer, sources)
+    
+    # Async API, one bounded pool per stage
+    
+    async def _run(self, stage: str, fn, *args):
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context so spans land in the request's trace
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._pools[stage], partial(context.run, _attached, fn, *args))
+    
+    async def aingest(self, file_paths: Iterable[str]) -> Dict:
+        return await self._run('ingest', self.ingest, list(file_paths))
+    
+    async def aremove_file(self, source: str):
+        return await self._run('ingest', self.remove_file, source)
+    
+    async def asearch(self, query: str) -> List[Tuple[Dict, float]]:
+        return await self._run('retrieve', self.search, query)
+    
+    async def aanswer(self, query: str, chat_history: List[Dict] = None) -> Dict:
+        with telemetry.trace('answer'):
+            docs = await self.asearch(query)
+            cache_args, cached = await self._run('retrieve', self._cached_answer, query, docs, chat_history)
+            if cached is not None:
+                return cached
+            
+            result = await self._run('generate', self.llm.generate_answer, query, docs, chat_history)
+            self._store_answer(cache_args, result['answer'], result['sources'])
+            return result
+    
+    async def astream_answer(self, query: str, chat_history: List[Dict] = None) -> AnswerStream:
+        """Search and prepare an AnswerStream; read its tokens with aiter_tokens()"""
+        return await self._run('retrieve', self.stream_answer, query, chat_history)
+    
+    async def aiter_tokens(self, stream: AnswerStream) -> AsyncIterator[str]:
+        """Consume an AnswerStream on the generation pool without blocking the event loop"""
+        tokens = iter(stream)
+        done = object()
+        while True:
+            token = await self._run('generate', next, tokens, done)
+            if token is done:
+                break
+            yield token
+    
+    def close(self):
+        """Stop the worker pools and release the LLM connections"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+        self.retriever.close()
+        self.llm.client.close()
\ No newline at end of file
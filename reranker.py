@@ -1,15 +1,31 @@
+import hashlib
 from typing import List, Tuple, Dict
-from sentence_transformers import CrossEncoder
+from cache import LRUCache
 from config import config
+from inference_backend import load_cross_encoder
+from telemetry import telemetry
 
 
 class Reranker:
     """Cross-encoder reranking for improved relevance"""
     
-    def __init__(self):
-        print(f"Loading reranker model: {config.RERANKER_MODEL}")
-        self.model = CrossEncoder(config. RERANKER_MODEL)
-        print("✅ Reranker model loaded")
+    def __init__(self, model=None):
+        if model is None:
+            print(f"Loading reranker model: {config.RERANKER_MODEL}")
+            self.model, self.backend = load_cross_encoder(
+                config.RERANKER_MODEL,
+                max_length=config.RERANK_MAX_LENGTH
+            )
+            print(f"✅ Reranker model loaded ({self.backend})")
+        else:
+            # Preloaded or stub cross-encoder (benchmarks)
+            self.model, self.backend = model, 'custom'
+        
+        # (query hash, chunk id) -> score; chunk ids are never reused, so entries cannot go stale
+        self.score_cache = LRUCache(config.RERANK_CACHE_SIZE)
+        
+        # Set by ModelRuntime to batch pairs across sessions
+        self.pair_batcher = None
     
     def rerank(
         self,
@@ -24,19 +40,98 @@ class Reranker:
         if not documents:
             return []
         
-        # Prepare pairs for cross-encoder
-        pairs = [[query, doc['content']] for doc, _ in documents]
+        with telemetry.span('rerank', candidates=len(documents)):
+            return self._rerank(query, documents, top_k)
+    
+    def _rerank(
+        self,
+        query: str,
+        documents: List[Tuple[Dict, float]],
+        top_k: int
+    ) -> List[Tuple[Dict, float]]:
+        query_key = hashlib.sha1(' '.join(query.lower().split()).encode('utf-8')).hexdigest()
+        scores = [
+            self.score_cache.get((query_key, doc['id'])) if doc.get('id') is not None else None
+            for doc, _ in documents
+        ]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        telemetry.count('cache_requests_total', len(documents) - len(missing), cache='rerank_scores', result='hit')
+        telemetry.count('cache_requests_total', len(missing), cache='rerank_scores', result='miss')
         
-        # Get reranking scores
-        scores = self.model.predict(pairs)
+        if config.RERANK_CASCADE:
+            # Candidates arrive in fusion order, so score them best first in batches.
+            # Approximate: stopping early can drop a true top-k candidate (see _stable)
+            scored = [score for score in scores if score is not None]
+            for start in range(0, len(missing), config.RERANK_BATCH_SIZE):
+                batch = missing[start:start + config.RERANK_BATCH_SIZE]
+                batch_scores = self._score(query, query_key, documents, batch)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = score
+                scored.extend(batch_scores)
+                if self._stable(scored, batch_scores, top_k):
+                    break
+        elif missing:
+            for i, score in zip(missing, self._score(query, query_key, documents, missing)):
+                scores[i] = score
         
-        # Combine documents with new scores
+        # Combine documents with new scores (candidates skipped by the cascade drop out)
         reranked = [
             (doc, float(score))
             for (doc, _), score in zip(documents, scores)
+            if score is not None
         ]
         
         # Sort by reranking score
         reranked.sort(key=lambda x: x[1], reverse=True)
         
-        return reranked[:top_k]
\ No newline at end of file
+        return reranked[:top_k]
+    
+    def _score(
+        self,
+        query: str,
+        query_key: str,
+        documents: List[Tuple[Dict, float]],
+        rows: List[int]
+    ) -> List[float]:
+        """Run the cross-encoder over selected candidates and cache the scores"""
+        # Prepare pairs for cross-encoder
+        pairs = [[query, documents[i][0]['content']] for i in rows]
+        with telemetry.span('rerank_score', pairs=len(pairs)):
+            if self.pair_batcher is not None:
+                scores = self.pair_batcher.submit(pairs)
+            else:
+                scores = self.predict(pairs)
+        telemetry.count('rerank_pairs_total', len(pairs))
+        for i, score in zip(rows, scores):
+            doc_id = documents[i][0].get('id')
+            if doc_id is not None:
+                self.score_cache.put((query_key, doc_id), score)
+        return scores
+    
+    def predict(self, pairs: List[List[str]]) -> List[float]:
+        """Cross-encoder scores for (query, passage) pairs"""
+        scores = self.model.predict(
+            pairs,
+            batch_size=config.RERANK_BATCH_SIZE,
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
+    
+    @staticmethod
+    def _stable(scored: List[float], latest: List[float], top_k: int) -> bool:
+        """Whether the current top-k leads the latest batch by the cascade margin
+
+        This is a heuristic, not a bound. Later candidates ranked lower in
+        fusion and are assumed to score no higher than the latest batch, but
+        cross-encoder logits are unbounded, so one can still outscore the
+        top-k. The cascade is therefore approximate and may change results;
+        benchmarks/run.py reports its recall against full reranking.
+        """
+        if len(scored) < top_k or not latest:
+            return False
+        kth_best = sorted(scored, reverse=True)[top_k - 1]
+        return kth_best - max(latest) >= config.RERANK_CASCADE_MARGIN
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters for the pair-score cache"""
+        return self.score_cache.stats()
\ No newline at end of file
@@ -1,9 +1,12 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Dict
 import numpy as np
-from rank_bm25 import BM25Okapi
 from embedding_manager import EmbeddingManager
 from vector_store import VectorStore
+from cache import LRUCache
 from config import config
+from telemetry import telemetry
 
 
 class HybridRetriever:
@@ -12,100 +15,166 @@ class HybridRetriever:
     def __init__(self, embedding_manager: EmbeddingManager, vector_store: VectorStore):
         self.embedding_manager = embedding_manager
         self.vector_store = vector_store
-        self.bm25 = None
+        self._synced_version = None
+        
+        # Repeated questions (re-asks, Streamlit reruns) skip the model and the scans
+        self.query_embedding_cache = LRUCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+        self.result_cache = LRUCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+        
+        # BM25 runs here while the calling thread embeds the query and searches FAISS
+        self._sparse_pool = ThreadPoolExecutor(
+            max_workers=config.RETRIEVE_WORKERS, thread_name_prefix='sparse'
+        )
+        
         self._init_bm25()
     
     def _init_bm25(self):
         """Initialize BM25 index"""
-        if not self.vector_store.documents:
-            return
-        
-        tokenized_corpus = [
-            doc['content']. lower().split()
-            for doc in self.vector_store.documents
-        ]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-        print("✅ BM25 index initialized")
+        self.refresh()
+        if len(self.vector_store.sparse_index):
+            print("✅ BM25 index initialized")
+    
+    def refresh(self):
+        """Drop cached results after the vector store changed"""
+        # The BM25 index is maintained and persisted by the vector store itself;
+        # results are only valid for the index version they were computed against
+        self.result_cache.clear()
+        self._synced_version = self.vector_store.version
+    
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalize case and whitespace so trivially different queries share cache entries"""
+        return ' '.join(query.lower().split())
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, reusing cached embeddings for repeated questions"""
+        normalized = self._normalize_query(query)
+        embedding = self.query_embedding_cache.get(normalized)
+        if embedding is None:
+            telemetry.count('cache_requests_total', cache='query_embeddings', result='miss')
+            with telemetry.span('embed_query'):
+                embedding = self.embedding_manager.embed_query(normalized)
+            self.query_embedding_cache.put(normalized, embedding)
+        else:
+            telemetry.count('cache_requests_total', cache='query_embeddings', result='hit')
+        return embedding
     
     def retrieve(self, query: str, top_k: int = None) -> List[Tuple[Dict, float]]:
         """Hybrid retrieval combining semantic and BM25 search"""
         if top_k is None:
             top_k = config.TOP_K_RETRIEVAL
         
-        # 1. Semantic search (dense)
-        query_embedding = self.embedding_manager.embed_query(query)
-        semantic_results = self.vector_store.search(query_embedding, k=top_k)
-        
-        # 2. BM25 search (sparse)
-        if self.bm25 is not None:
-            tokenized_query = query.lower().split()
-            bm25_scores = self.bm25.get_scores(tokenized_query)
-            
-            # Get top-k BM25 results
-            top_indices = np.argsort(bm25_scores)[::-1][:top_k]
-            bm25_results = [
-                (self.vector_store.documents[idx], bm25_scores[idx])
-                for idx in top_indices
-            ]
-        else:
-            bm25_results = []
+        if self.vector_store.version != self._synced_version:
+            self.refresh()
         
-        # 3. Combine scores using weighted fusion
-        combined = self._combine_results(
-            semantic_results,
-            bm25_results,
-            alpha=config.BM25_WEIGHT
+        cache_key = (
+            self._normalize_query(query),
+            top_k,
+            config.BM25_WEIGHT,
+            config.FUSION_METHOD,
+            config.RRF_K,
+            self.vector_store.version
         )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            telemetry.count('cache_requests_total', cache='results', result='hit')
+            return list(cached)
+        telemetry.count('cache_requests_total', cache='results', result='miss')
         
-        return combined[: top_k]
-    
-    def _combine_results(
-        self,
-        semantic_results: List[Tuple[Dict, float]],
-        bm25_results: List[Tuple[Dict, float]],
-        alpha: float = 0.3
-    ) -> List[Tuple[Dict, float]]:
-        """Combine semantic and BM25 scores"""
-        # Normalize scores
-        semantic_scores = self._normalize_scores([s for _, s in semantic_results])
-        bm25_scores = self._normalize_scores([s for _, s in bm25_results])
-        
-        # Create score dictionary
-        score_dict = {}
+        # Dense and sparse legs run concurrently; FAISS and NumPy release the GIL
+        if config.PARALLEL_RETRIEVAL:
+            context = contextvars.copy_context()
+            sparse_future = self._sparse_pool.submit(context.run, self._sparse_search, query, top_k)
+            dense_ids, dense_scores = self._dense_search(query, top_k)
+            sparse_ids, sparse_scores = sparse_future.result()
+        else:
+            dense_ids, dense_scores = self._dense_search(query, top_k)
+            sparse_ids, sparse_scores = self._sparse_search(query, top_k)
         
-        for (doc, _), norm_score in zip(semantic_results, semantic_scores):
-            doc_id = doc['metadata']['chunk_id']
-            score_dict[doc_id] = {
-                'doc':  doc,
-                'score': (1 - alpha) * norm_score
-            }
+        # Fuse over chunk ids, then fetch only the documents that made the cut
+        with telemetry.span('fusion', method=config.FUSION_METHOD):
+            ids, scores = self._fuse(
+                dense_ids, dense_scores,
+                sparse_ids, sparse_scores,
+                alpha=config.BM25_WEIGHT,
+                top_k=top_k
+            )
+            documents = self.vector_store.get_documents(ids.tolist())
+            results = [
+                (doc, score)
+                for doc, score in zip(documents, scores.tolist())
+                if doc is not None
+            ]
         
-        for (doc, _), norm_score in zip(bm25_results, bm25_scores):
-            doc_id = doc['metadata']['chunk_id']
-            if doc_id in score_dict: 
-                score_dict[doc_id]['score'] += alpha * norm_score
-            else: 
-                score_dict[doc_id] = {
-                    'doc': doc,
-                    'score': alpha * norm_score
-                }
+        self.result_cache.put(cache_key, results)
+        return list(results)
+    
+    def _dense_search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Semantic leg: (chunk ids, similarities) from FAISS, best first"""
+        query_embedding = self.embed_query(query)
+        with telemetry.span('dense_search', k=top_k):
+            scores, ids = self.vector_store.search_batch(query_embedding, k=top_k)
+        found = ids[0] >= 0
+        return ids[0][found], scores[0][found]
+    
+    def _sparse_search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 leg: (chunk ids, scores); only the postings of query terms are scored"""
+        with telemetry.attach(), telemetry.span('sparse_search', k=top_k):
+            return self.vector_store.sparse_index.search(query, k=top_k)
+    
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters for the query embedding and result caches"""
+        return {
+            'query_embeddings': self.query_embedding_cache.stats(),
+            'results': self.result_cache.stats()
+        }
+    
+    @classmethod
+    def _fuse(
+        cls,
+        dense_ids: np.ndarray,
+        dense_scores: np.ndarray,
+        sparse_ids: np.ndarray,
+        sparse_scores: np.ndarray,
+        alpha: float = 0.3,
+        top_k: int = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Fuse both legs into (chunk ids, scores), best first
+
+        "weighted" mixes min-max normalized scores, "rrf" sums reciprocal ranks
+        1 / (RRF_K + rank); either way BM25 gets weight alpha and the dense
+        leg 1 - alpha.
+        """
+        if config.FUSION_METHOD == 'rrf':
+            dense_part = 1.0 / (config.RRF_K + np.arange(1, len(dense_ids) + 1))
+            sparse_part = 1.0 / (config.RRF_K + np.arange(1, len(sparse_ids) + 1))
+        elif config.FUSION_METHOD == 'weighted':
+            dense_part = cls._normalize_scores(dense_scores)
+            sparse_part = cls._normalize_scores(sparse_scores)
+        else:
+            raise ValueError(f"Unsupported FUSION_METHOD: {config.FUSION_METHOD}")
         
-        # Sort by combined score
-        combined = [
-            (item['doc'], item['score'])
-            for item in score_dict.values()
-        ]
-        combined.sort(key=lambda x: x[1], reverse=True)
+        ids, inverse = np.unique(
+            np.concatenate([dense_ids, sparse_ids]).astype('int64'), return_inverse=True
+        )
+        weights = np.concatenate([(1 - alpha) * dense_part, alpha * sparse_part])
+        fused = np.bincount(inverse, weights=weights, minlength=len(ids))
         
-        return combined
+        order = np.argsort(-fused, kind='stable')[:top_k]
+        return ids[order], fused[order]
     
     @staticmethod
-    def _normalize_scores(scores: List[float]) -> List[float]:
+    def _normalize_scores(scores: np.ndarray) -> np.ndarray:
         """Normalize scores to [0, 1]"""
-        if not scores:
-            return []
-        min_score = min(scores)
-        max_score = max(scores)
-        if max_score == min_score: 
-            return [1.0] * len(scores)
-        return [(s - min_score) / (max_score - min_score) for s in scores]
\ No newline at end of file
+        scores = np.asarray(scores, dtype='float64')
+        if not len(scores):
+            return scores
+        min_score = scores.min()
+        max_score = scores.max()
+        if max_score == min_score:
+            return np.ones_like(scores)
+        return (scores - min_score) / (max_score - min_score)
+    
+    def close(self):
+        """Stop the sparse search workers"""
+        self._sparse_pool.shutdown(wait=False)
\ No newline at end of file
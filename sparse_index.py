@@ -0,0 +1,311 @@
+import os
+import math
+import pickle
+import shutil
+import numpy as np
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import config
+
+
+# Bump when the on-disk layout or tokenization changes so old indexes are rebuilt
+FORMAT_VERSION = 2
+
+# Arrays saved as .npy files and memory-mapped back on load
+ARRAYS = ('offsets', 'post_docs', 'post_tfs', 'doc_len', 'alive', 'ids')
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizer shared by indexing and querying"""
+    return text.lower().split()
+
+
+class BM25Index:
+    """Inverted-index BM25 that only touches the postings of query terms
+
+    Postings live in compact CSR arrays (offsets, rows, term frequencies)
+    plus small append-only buffers for documents added since the last
+    compaction. Documents are stored in dense rows; the sorted row -> doc id
+    array doubles as the id -> row index (a binary search), so arrays size
+    with the live corpus rather than with the largest id ever allocated.
+    Removed documents are masked out and their rows reclaimed on compaction,
+    and top-k selection uses MaxScore-style pruning: once the current k-th
+    best score beats the best any remaining term could add, remaining terms
+    only update existing candidates instead of introducing new ones.
+
+    IDF uses the non-negative Lucene form log(1 + (N - df + 0.5) / (df + 0.5)),
+    which keeps every term contribution positive and upper-boundable.
+    """
+    
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = config.BM25_K1 if k1 is None else k1
+        self.b = config.BM25_B if b is None else b
+        
+        self.vocab = {}  # term -> term id
+        self._df = []  # term id -> document frequency
+        
+        # Compacted postings, rows ascending within each term
+        self._offsets = np.zeros(1, dtype='int64')
+        self._post_docs = np.zeros(0, dtype='int64')
+        self._post_tfs = np.zeros(0, dtype='int32')
+        
+        # Postings added since the last compaction: term id -> (rows, tfs)
+        self._delta = {}
+        self._delta_size = 0
+        
+        # Per-document state indexed by row; doc ids ascend with rows
+        self._ids = np.zeros(0, dtype='int64')
+        self._doc_len = np.zeros(0, dtype='float32')
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0  # Rows in use, including removed documents
+        self._num_docs = 0
+        self._total_len = 0.0
+        self._num_dead = 0
+    
+    def __len__(self) -> int:
+        return self._num_docs
+    
+    def doc_ids(self) -> np.ndarray:
+        """Ids of all live documents"""
+        return self._ids[:self._size][self._alive[:self._size]]
+    
+    def _rows(self, doc_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the given doc ids that are indexed (live or removed)"""
+        doc_ids = np.asarray(list(doc_ids), dtype='int64')
+        ids = self._ids[:self._size]
+        rows = np.searchsorted(ids, doc_ids)
+        found = rows < len(ids)
+        found[found] = ids[rows[found]] == doc_ids[found]
+        return rows[found]
+    
+    def add(self, doc_id: int, tokens: List[str]):
+        """Index one document; doc ids must increase across calls"""
+        if self._size and doc_id <= self._ids[self._size - 1]:
+            raise ValueError(f"Document ids must increase: {doc_id}")
+        row = self._size
+        self._ensure_capacity(row + 1)
+        self._ids[row] = doc_id
+        self._size += 1
+        
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = len(self.vocab)
+                self.vocab[term] = term_id
+                self._df.append(0)
+            rows, tfs = self._delta.setdefault(term_id, (array('q'), array('i')))
+            rows.append(row)
+            tfs.append(tf)
+            self._df[term_id] += 1
+            self._delta_size += 1
+        
+        self._doc_len[row] = len(tokens)
+        self._alive[row] = True
+        self._num_docs += 1
+        self._total_len += len(tokens)
+        
+        if self._delta_size > max(10000, len(self._post_docs) // 4):
+            self.compact()
+    
+    def add_many(self, documents: Iterable[Tuple[int, str]]):
+        """Index (doc id, text) pairs"""
+        for doc_id, text in documents:
+            self.add(doc_id, tokenize(text))
+    
+    def remove(self, doc_ids: Iterable[int]):
+        """Drop documents; their postings are purged on the next compaction"""
+        for row in self._rows(doc_ids):
+            if self._alive[row]:
+                self._alive[row] = False
+                self._num_docs -= 1
+                self._total_len -= float(self._doc_len[row])
+                self._num_dead += 1
+        
+        if self._num_dead > max(1000, self._num_docs // 10):
+            self.compact()
+    
+    def compact(self):
+        """Merge buffered postings into the CSR arrays and reclaim rows of removed documents"""
+        alive = np.array(self._alive[:self._size])
+        # Live rows keep their order, so doc ids still ascend
+        new_row = np.cumsum(alive) - 1
+        
+        num_terms = len(self.vocab)
+        docs_parts, tfs_parts = [], []
+        for term_id in range(num_terms):
+            docs, tfs = self._postings(term_id)
+            keep = alive[docs]
+            docs_parts.append(new_row[docs[keep]])
+            tfs_parts.append(tfs[keep])
+        
+        counts = np.array([len(part) for part in docs_parts], dtype='int64')
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+        self._post_docs = np.concatenate(docs_parts) if docs_parts else np.zeros(0, dtype='int64')
+        self._post_tfs = np.concatenate(tfs_parts) if tfs_parts else np.zeros(0, dtype='int32')
+        self._df = counts.tolist()
+        self._delta = {}
+        self._delta_size = 0
+        self._num_dead = 0
+        
+        self._ids = self._ids[:self._size][alive]
+        self._doc_len = self._doc_len[:self._size][alive]
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._size = len(self._ids)
+    
+    def _ensure_capacity(self, size: int):
+        """Grow per-document arrays geometrically"""
+        if size <= len(self._alive):
+            return
+        capacity = max(size, 2 * len(self._alive), 1024)
+        self._ids = np.concatenate([self._ids, np.zeros(capacity - len(self._ids), dtype='int64')])
+        self._doc_len = np.concatenate([self._doc_len, np.zeros(capacity - len(self._doc_len), dtype='float32')])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+    
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows (ascending) and term frequencies for a term, including removed docs"""
+        if term_id < len(self._offsets) - 1:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs, tfs = self._post_docs[start:end], self._post_tfs[start:end]
+        else:
+            docs, tfs = self._post_docs[:0], self._post_tfs[:0]
+        
+        delta = self._delta.get(term_id)
+        if delta is None:
+            return docs, tfs
+        return (
+            np.concatenate([docs, np.frombuffer(delta[0], dtype='int64')]),
+            np.concatenate([tfs, np.frombuffer(delta[1], dtype='int32')])
+        )
+    
+    def _contributions(self, docs: np.ndarray, tfs: np.ndarray, idf: float, avgdl: float) -> np.ndarray:
+        """BM25 term contribution for each posting"""
+        tfs = tfs.astype('float32')
+        norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avgdl)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+    
+    def search(self, query: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc ids, scores) for a query, best first"""
+        empty = (np.zeros(0, dtype='int64'), np.zeros(0, dtype='float32'))
+        if self._num_docs == 0 or k <= 0:
+            return empty
+        
+        query_terms = Counter(
+            self.vocab[token] for token in tokenize(query) if token in self.vocab
+        )
+        if not query_terms:
+            return empty
+        
+        n = self._num_docs
+        avgdl = max(self._total_len / n, 1e-9)
+        terms = []
+        for term_id, qtf in query_terms.items():
+            docs, tfs = self._postings(term_id)
+            df = self._df[term_id]
+            if self._num_dead:
+                # Removed documents stay in the postings until compaction
+                df = int(self._alive[docs].sum())
+            if df == 0:
+                continue
+            idf = qtf * math.log(1 + (n - df + 0.5) / (df + 0.5))
+            # tf / (tf + norm) < 1, so a term adds at most idf * (k1 + 1)
+            terms.append((idf * (self.k1 + 1), idf, docs, tfs))
+        if not terms:
+            return empty
+        terms.sort(key=lambda term: term[0], reverse=True)
+        remaining = np.cumsum([term[0] for term in terms][::-1])[::-1]
+        
+        cand_rows = np.zeros(0, dtype='int64')
+        cand_scores = np.zeros(0, dtype='float32')
+        for i, (_, idf, docs, tfs) in enumerate(terms):
+            
+            if len(cand_rows) >= k and np.partition(cand_scores, -k)[-k] >= remaining[i]:
+                # No unseen document can reach the top k; only update candidates
+                pos = np.searchsorted(docs, cand_rows)
+                hit = pos < len(docs)
+                hit[hit] = docs[pos[hit]] == cand_rows[hit]
+                if hit.any():
+                    cand_scores[hit] += self._contributions(
+                        cand_rows[hit], tfs[pos[hit]], idf, avgdl
+                    )
+                continue
+            
+            live = self._alive[docs]
+            docs, tfs = docs[live], tfs[live]
+            scores = self._contributions(docs, tfs, idf, avgdl)
+            merged_rows, inverse = np.unique(np.concatenate([cand_rows, docs]), return_inverse=True)
+            cand_scores = np.bincount(
+                inverse, weights=np.concatenate([cand_scores, scores]), minlength=len(merged_rows)
+            ).astype('float32')
+            cand_rows = merged_rows
+        
+        if len(cand_rows) > k:
+            top = np.argpartition(cand_scores, -k)[-k:]
+            cand_rows, cand_scores = cand_rows[top], cand_scores[top]
+        order = np.argsort(-cand_scores, kind='stable')
+        return self._ids[cand_rows[order]], cand_scores[order]
+    
+    def save(self, path: str, version: str):
+        """Write the index to a directory, tagged with the vector store version it matches"""
+        self.compact()
+        
+        # Build the new directory next to the old one and swap it in whole
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, f"_{name}"))
+        with open(os.path.join(tmp_path, "index.pkl"), 'wb') as f:
+            pickle.dump({
+                'format': FORMAT_VERSION,
+                'version': version,
+                'k1': self.k1,
+                'b': self.b,
+                'terms': list(self.vocab),
+                'df': self._df,
+                'num_docs': self._num_docs,
+                'total_len': self._total_len
+            }, f)
+        
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    
+    @classmethod
+    def load(cls, path: str, version: str) -> Optional['BM25Index']:
+        """Memory-map a saved index, or return None if it is missing or stale"""
+        meta_path = os.path.join(path, "index.pkl")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'rb') as f:
+            state = pickle.load(f)
+        
+        index = cls()
+        if (
+            state.get('format') != FORMAT_VERSION
+            or state['version'] != version
+            or (state['k1'], state['b']) != (index.k1, index.b)
+        ):
+            return None
+        
+        # Postings are only ever replaced, never written in place, so they can stay
+        # read-only; per-document arrays are copy-on-write since add/remove update them
+        for name in ARRAYS:
+            mode = 'c' if name in ('doc_len', 'alive', 'ids') else 'r'
+            setattr(index, f"_{name}", np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode))
+        index.vocab = {term: term_id for term_id, term in enumerate(state['terms'])}
+        index._df = state['df']
+        index._num_docs = state['num_docs']
+        index._total_len = state['total_len']
+        index._size = len(index._ids)
+        return index
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'documents': self._num_docs,
+            'terms': len(self.vocab),
+            'postings': len(self._post_docs) + self._delta_size
+        }
\ No newline at end of file
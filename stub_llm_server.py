@@ -0,0 +1,123 @@
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-style /chat/completions endpoint with injectable latency and failures"""
+    
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is observable
+    
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        
+        with server.lock:
+            server.requests += 1
+            count = server.requests
+        
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            self._send_json(429, {'error': 'rate limited'}, {'Retry-After': str(server.retry_after)})
+            return
+        if server.fail_every and count % server.fail_every == 0:
+            self._send_json(503, {'error': 'unavailable'})
+            return
+        
+        time.sleep(server.latency)
+        question = payload.get('messages', [{}])[-1].get('content', '')
+        answer = f"Stub answer to: {question[-80:]}"
+        if payload.get('stream'):
+            self._send_stream(answer)
+            return
+        self._send_json(200, {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}}],
+            'model': payload.get('model', 'stub')
+        })
+    
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_stream(self, answer: str):
+        """Send the answer word by word as server-sent events"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        words = answer.split(' ')
+        events = [
+            {'choices': [{'index': 0, 'delta': {'content': word if i == 0 else f" {word}"}}]}
+            for i, word in enumerate(words)
+        ]
+        for i, event in enumerate(events):
+            if i:
+                time.sleep(self.server.token_latency)
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(
+    port: int = 0,
+    latency: float = 0.0,
+    rate_limit_every: int = 0,
+    fail_every: int = 0,
+    retry_after: float = 1.0,
+    token_latency: float = 0.02
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub on a background thread and return (server, api_base)
+
+    Every `rate_limit_every`-th request gets a 429 with Retry-After and every
+    `fail_every`-th a 503; 0 disables either. Streaming requests emit one
+    word every `token_latency` seconds. Call server.shutdown() to stop.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubLLMHandler)
+    server.latency = latency
+    server.rate_limit_every = rate_limit_every
+    server.fail_every = fail_every
+    server.retry_after = retry_after
+    server.token_latency = token_latency
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    # Point the app at it with GITHUB_API_BASE=http://127.0.0.1:<port>
+    parser = argparse.ArgumentParser(description="Local stub of the chat-completions API")
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Return 429 every N requests")
+    parser.add_argument('--fail-every', type=int, default=0, help="Return 503 every N requests")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds on 429")
+    parser.add_argument('--token-latency', type=float, default=0.02, help="Seconds between streamed words")
+    args = parser.parse_args()
+    
+    server, api_base = start_stub_server(
+        args.port, args.latency, args.rate_limit_every, args.fail_every, args.retry_after,
+        args.token_latency
+    )
+    print(f"Stub LLM API listening on {api_base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
\ No newline at end of file
@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from config import config
+
+
+# Histogram buckets: stage latencies in seconds, token counts in tokens
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# Since 3.12 cProfile runs on sys.monitoring: only one profiler can be active
+# per process, and it records every thread rather than only the one enabling it
+PROCESS_WIDE_CPROFILE = sys.version_info >= (3, 12)
+
+
+class Span:
+    """One timed stage of a request"""
+    
+    __slots__ = ('name', 'start', 'duration', 'attrs', 'error', 'depth')
+    
+    def __init__(self, name: str, start: float, depth: int, attrs: Dict):
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.attrs = attrs
+        self.error = None
+        self.depth = depth
+    
+    def to_dict(self, origin: float) -> Dict:
+        return {
+            'name': self.name,
+            'offset_ms': (self.start - origin) * 1000,
+            'duration_ms': None if self.duration is None else self.duration * 1000,
+            'depth': self.depth,
+            'attrs': self.attrs,
+            'error': self.error
+        }
+
+
+class Trace:
+    """All spans recorded while answering one request"""
+    
+    def __init__(self, name: str, attrs: Dict):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.timestamp = time.time()
+        self.duration = None
+        self.error = None
+        self.spans: List[Span] = []
+        self.profile = None  # Path of a dumped profile, for slow requests
+        self.profile_mode = None  # 'cprofile' or 'sample' while the request is profiled
+        self.threads = Counter()  # Ids of threads currently working on the request
+        self.profilers: List[cProfile.Profile] = []  # Finished per-thread cProfile runs
+        self._lock = threading.Lock()
+    
+    def active_threads(self) -> List[int]:
+        with self._lock:
+            return list(self.threads)
+    
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+    
+    def stage_totals(self) -> Dict[str, float]:
+        """Seconds per span name, summed over repeats"""
+        totals = {}
+        for span in self.spans:
+            if span.duration is not None:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+    
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.id,
+            'name': self.name,
+            'timestamp': self.timestamp,
+            'duration_ms': None if self.duration is None else self.duration * 1000,
+            'attrs': self.attrs,
+            'error': self.error,
+            'profile': self.profile,
+            'spans': [span.to_dict(self.start) for span in self.spans]
+        }
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, keyed by name and labels"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple], Dict] = {}
+    
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, buckets: Tuple = SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+                self.histograms[key] = histogram
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+    
+    def snapshot(self) -> Dict:
+        """Plain-dict copy of every metric"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'count': histogram['count'],
+                        'sum': histogram['sum'],
+                        'buckets': dict(zip(map(str, histogram['buckets']), histogram['counts']))
+                    }
+                    for (name, labels), histogram in self.histograms.items()
+                ]
+            }
+    
+    def render_prometheus(self, prefix: str = 'rag_') -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{prefix}{name}"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}{name}"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} histogram")
+                    seen.add(metric)
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{metric}_sum{_labels(labels)} {histogram['sum']:g}")
+                lines.append(f"{metric}_count{_labels(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+    
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+# Exporters receive every finished trace
+
+class Exporter:
+    """Base class for trace exporters"""
+    
+    def export(self, trace: Trace):
+        raise NotImplementedError
+
+
+class LogExporter(Exporter):
+    """One line per request with its slowest stages"""
+    
+    def __init__(self, min_ms: float = 0.0):
+        self.min_ms = min_ms
+    
+    def export(self, trace: Trace):
+        total_ms = trace.duration * 1000
+        if total_ms < self.min_ms:
+            return
+        stages = sorted(trace.stage_totals().items(), key=lambda item: item[1], reverse=True)
+        breakdown = ' · '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in stages[:8])
+        status = f" ❌ {trace.error}" if trace.error else ''
+        print(f"⏱️ {trace.name} {total_ms:.0f}ms [{trace.id}] {breakdown}{status}")
+
+
+class JSONExporter(Exporter):
+    """Append each trace as a JSON line"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class PrometheusFileExporter(Exporter):
+    """Rewrite a Prometheus textfile (node_exporter textfile collector) after each trace"""
+    
+    def __init__(self, path: str, registry: MetricsRegistry):
+        self.path = path
+        self.registry = registry
+        self._lock = threading.Lock()
+    
+    def export(self, trace: Trace):
+        text = self.registry.render_prometheus()
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, self.path)
+
+
+# Opt-in profiling of slow requests
+
+class StackSampler:
+    """Sample the Python stacks of a set of threads at a fixed interval
+
+    Stacks are kept as folded "outer;inner" strings with counts, the input
+    format of flame graph tools. Cheaper than cProfile and safe to run for
+    several requests at once.
+    """
+    
+    def __init__(self, threads: Callable[[], List[int]], interval: float):
+        self.threads = threads  # Ids of the threads to sample, asked for on every tick
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='stack-sampler')
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.threads():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+    
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Telemetry:
+    """Spans, counters and exporters for the question-answering path
+
+    trace() opens a request; span() times a stage inside it and also feeds
+    the rag_stage_seconds histogram, so stage latencies are available from
+    metrics even without a trace. The current trace follows contextvars, so
+    work submitted with contextvars.copy_context() (as RAGService does for
+    its thread pools) lands in the right trace.
+    """
+    
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.exporters: List[Exporter] = []
+        self._current = contextvars.ContextVar('telemetry_trace', default=None)
+        self._depth = contextvars.ContextVar('telemetry_depth', default=0)
+        self._profile_lock = threading.Lock()  # cProfile allows one active profiler per process
+    
+    def configure(self):
+        """Build exporters from config"""
+        self.exporters = []
+        for name in filter(None, (part.strip() for part in config.TELEMETRY_EXPORTERS.split(','))):
+            if name == 'log':
+                self.exporters.append(LogExporter(config.TELEMETRY_LOG_MIN_MS))
+            elif name == 'json':
+                self.exporters.append(JSONExporter(config.TELEMETRY_JSON_PATH))
+            elif name == 'prometheus':
+                self.exporters.append(PrometheusFileExporter(config.TELEMETRY_PROMETHEUS_PATH, self.registry))
+            else:
+                raise ValueError(f"Unknown telemetry exporter: {name}")
+    
+    def add_exporter(self, exporter: Exporter):
+        self.exporters.append(exporter)
+    
+    def current_trace(self) -> Optional[Trace]:
+        return self._current.get()
+    
+    @contextmanager
+    def trace(self, name: str, **attrs) -> Iterator[Trace]:
+        """Open a request trace; nested calls act as spans of the outer trace"""
+        if not config.TELEMETRY_ENABLED or self._current.get() is not None:
+            with self.span(name, **attrs):
+                yield self._current.get()
+            return
+        
+        trace = Trace(name, attrs)
+        trace_token = self._current.set(trace)
+        depth_token = self._depth.set(0)
+        profiler, sampler = self._start_profiling(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.duration = time.perf_counter() - trace.start
+            self._current.reset(trace_token)
+            self._depth.reset(depth_token)
+            self._stop_profiling(trace, profiler, sampler)
+            self.registry.observe('request_seconds', trace.duration, request=name)
+            if trace.error:
+                self.registry.count('errors_total', stage=name)
+            self._export(trace)
+    
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Optional[Span]]:
+        """Time a stage, recording it in the current trace and the stage histogram"""
+        if not config.TELEMETRY_ENABLED:
+            yield None
+            return
+        
+        depth = self._depth.get()
+        span = Span(name, time.perf_counter(), depth + 1, attrs)
+        depth_token = self._depth.set(depth + 1)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            self.registry.count('errors_total', stage=name)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            self._depth.reset(depth_token)
+            self.registry.observe('stage_seconds', span.duration, stage=name)
+            trace = self._current.get()
+            if trace is not None:
+                trace.add(span)
+    
+    def record(self, name: str, seconds: float, **attrs):
+        """Record a stage timed elsewhere (e.g. time to first token) as an ended span"""
+        if not config.TELEMETRY_ENABLED or seconds is None:
+            return
+        self.registry.observe('stage_seconds', seconds, stage=name)
+        trace = self._current.get()
+        if trace is not None:
+            span = Span(name, time.perf_counter() - seconds, self._depth.get() + 1, attrs)
+            span.duration = seconds
+            trace.add(span)
+    
+    def count(self, name: str, value: float = 1, **labels):
+        if config.TELEMETRY_ENABLED:
+            self.registry.count(name, value, **labels)
+    
+    def observe(self, name: str, value: float, buckets: Tuple = SECONDS_BUCKETS, **labels):
+        if config.TELEMETRY_ENABLED:
+            self.registry.observe(name, value, buckets, **labels)
+    
+    def render_prometheus(self) -> str:
+        return self.registry.render_prometheus()
+    
+    def _export(self, trace: Trace):
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                # Telemetry must never fail a request
+                print(f"⚠️ Telemetry exporter {type(exporter).__name__} failed: {e}")
+    
+    @contextmanager
+    def attach(self) -> Iterator[None]:
+        """Count the calling thread as working on the current trace while the block runs
+
+        Worker pools wrap their tasks in this, so slow-request profiles cover
+        the threads doing the work and not only the one that opened the trace.
+        """
+        trace = self._current.get()
+        if trace is None or trace.profile_mode is None:
+            yield
+            return
+        # A process-wide profiler already sees this thread
+        profiler = self._enter_thread(trace, profile=not PROCESS_WIDE_CPROFILE)
+        try:
+            yield
+        finally:
+            self._exit_thread(trace, profiler)
+    
+    @staticmethod
+    def _enter_thread(trace: Trace, profile: bool = True) -> Optional[cProfile.Profile]:
+        thread_id = threading.get_ident()
+        with trace._lock:
+            trace.threads[thread_id] += 1
+            nested = trace.threads[thread_id] > 1
+        if nested or not profile or trace.profile_mode != 'cprofile':
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler (or debugger) owns the hook; profiling must never fail a request
+            print(f"⚠️ cProfile unavailable for {trace.name}: {e}")
+            return None
+        return profiler
+    
+    @staticmethod
+    def _exit_thread(trace: Trace, profiler: Optional[cProfile.Profile]):
+        if profiler is not None:
+            profiler.disable()
+        thread_id = threading.get_ident()
+        with trace._lock:
+            if profiler is not None:
+                trace.profilers.append(profiler)
+            trace.threads[thread_id] -= 1
+            if not trace.threads[thread_id]:
+                del trace.threads[thread_id]
+    
+    def _start_profiling(self, trace: Trace) -> Tuple[Optional[cProfile.Profile], Optional[StackSampler]]:
+        mode = config.TELEMETRY_PROFILE
+        if mode == 'cprofile' and self._profile_lock.acquire(blocking=False):
+            trace.profile_mode = mode
+            return self._enter_thread(trace), None
+        if mode == 'sample':
+            trace.profile_mode = mode
+            self._enter_thread(trace)
+            sampler = StackSampler(trace.active_threads, config.TELEMETRY_SAMPLE_INTERVAL_MS / 1000)
+            sampler.start()
+            return None, sampler
+        return None, None
+    
+    def _stop_profiling(self, trace: Trace, profiler: Optional[cProfile.Profile], sampler: Optional[StackSampler]):
+        """Keep the profile only when the request was slow"""
+        mode = trace.profile_mode
+        if mode is None:
+            return
+        self._exit_thread(trace, profiler)
+        trace.profile_mode = None
+        if mode == 'cprofile':
+            self._profile_lock.release()
+        if sampler is not None:
+            sampler.stop()
+        if trace.duration * 1000 < config.TELEMETRY_SLOW_MS:
+            return
+        try:
+            self._dump_profile(trace, mode, sampler)
+        except Exception as e:
+            print(f"⚠️ Could not save the profile of {trace.name}: {e}")
+    
+    @staticmethod
+    def _dump_profile(trace: Trace, mode: str, sampler: Optional[StackSampler]):
+        os.makedirs(config.TELEMETRY_PROFILE_DIR, exist_ok=True)
+        if mode == 'cprofile':
+            trace.profile = os.path.join(config.TELEMETRY_PROFILE_DIR, f"{trace.name}-{trace.id}.prof")
+            # Threads still working on the request (e.g. an abandoned stream) are left out.
+            # A process-wide profiler also records requests that ran alongside this one.
+            with trace._lock:
+                profilers = list(trace.profilers)
+            stats = pstats.Stats(*profilers)
+            stats.dump_stats(trace.profile)
+            print(f"🐢 Slow {trace.name} ({trace.duration:.2f}s), cProfile top functions:")
+            stats.sort_stats('cumulative').print_stats(15)
+        else:
+            trace.profile = os.path.join(config.TELEMETRY_PROFILE_DIR, f"{trace.name}-{trace.id}.folded")
+            sampler.write(trace.profile)
+            print(f"🐢 Slow {trace.name} ({trace.duration:.2f}s), {sum(sampler.stacks.values())} stack samples in {trace.profile}")
+
+
+telemetry = Telemetry()
+telemetry.configure()
\ No newline at end of file
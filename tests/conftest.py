@@ -0,0 +1,68 @@
+import os
+import sys
+import hashlib
+import numpy as np
+import pytest
+
+# config.py refuses to load without a token; tests never reach the real API
+os.environ.setdefault('GITHUB_TOKEN', 'test-token')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words vectors standing in for the embedding model"""
+    
+    dim = 64
+    
+    def embed_documents(self, texts, flush=True):
+        vectors = np.zeros((len(texts), self.dim), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.sha1(word.encode('utf-8')).hexdigest(), 16) % self.dim] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+    
+    def embed_query(self, query):
+        return self.embed_documents([query])[0]
+    
+    def flush_cache(self):
+        pass
+
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder()
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    """Point the vector store at an empty temporary directory"""
+    path = tmp_path / 'vector_store'
+    path.mkdir()
+    monkeypatch.setattr(config, 'VECTOR_STORE_PATH', str(path))
+    return path
+
+
+@pytest.fixture
+def store(store_path):
+    from vector_store import VectorStore
+    return VectorStore()
+
+
+def make_docs(source, pages):
+    """Chunk dicts for {page: [chunk text, ...]}, in reading order"""
+    return [
+        {
+            'content': text,
+            'metadata': {
+                'filename': os.path.basename(source),
+                'page': page,
+                'chunk_index': chunk_index,
+                'source': source
+            }
+        }
+        for page, texts in sorted(pages.items())
+        for chunk_index, text in enumerate(texts)
+    ]
\ No newline at end of file
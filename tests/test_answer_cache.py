@@ -0,0 +1,73 @@
+import time
+import numpy as np
+import pytest
+from answer_cache import AnswerCache
+
+
+def unit(*values):
+    vector = np.array(values, dtype='float32')
+    return vector / np.linalg.norm(vector)
+
+
+SOURCES = [({'id': 3, 'content': 'cats sleep'}, 0.9), ({'id': 7, 'ids': [7, 8], 'content': 'a lot'}, 0.5)]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / 'answers.sqlite'), max_entries=10, ttl=3600, similarity=0.95)
+
+
+def test_exact_tier_matches_normalized_question(cache):
+    chunks = cache.chunk_set(SOURCES)
+    history = cache.history_hash([{'query': 'hi', 'answer': 'hello'}])
+    cache.put('Do cats sleep?', unit(1, 0, 0), chunks, history, 'v1', 'Yes.', SOURCES)
+    
+    result, tier = cache.get('  do CATS   sleep? ', None, chunks, history, 'v1')
+    assert tier == 'exact'
+    assert result == {'answer': 'Yes.', 'sources': SOURCES}
+    
+    # Same chunks in another order (or split differently) share the fingerprint
+    assert cache.chunk_set(list(reversed(SOURCES))) == chunks
+    
+    assert cache.get('Do cats sleep?', None, chunks, cache.history_hash([]), 'v1') is None
+    assert cache.get('Do cats sleep?', None, cache.chunk_set(SOURCES[:1]), history, 'v1') is None
+
+
+def test_semantic_tier_needs_close_embedding_and_same_scope(cache):
+    chunks = cache.chunk_set(SOURCES)
+    history = cache.history_hash([])
+    cache.put('Do cats sleep?', unit(1, 0, 0), chunks, history, 'v1', 'Yes.', SOURCES)
+    
+    result, tier = cache.get('Are cats sleepers?', unit(1, 0.1, 0), chunks, history, 'v1')
+    assert tier == 'semantic' and result['answer'] == 'Yes.'
+    assert cache.get('Are cats sleepers?', unit(1, 1, 0), chunks, history, 'v1') is None
+    assert cache.get('Are cats sleepers?', unit(1, 0.1, 0), cache.chunk_set(SOURCES[:1]), history, 'v1') is None
+    
+    stats = cache.stats()
+    assert (stats['exact_hits'], stats['semantic_hits'], stats['misses']) == (0, 1, 2)
+
+
+def test_new_index_version_drops_old_answers(cache):
+    chunks = cache.chunk_set(SOURCES)
+    history = cache.history_hash([])
+    cache.put('Do cats sleep?', unit(1, 0, 0), chunks, history, 'v1', 'Yes.', SOURCES)
+    
+    assert cache.get('Do cats sleep?', unit(1, 0, 0), chunks, history, 'v2') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_ttl_and_size_limits(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = AnswerCache(str(tmp_path / 'answers.sqlite'), max_entries=2, ttl=60, similarity=0.95)
+    history = cache.history_hash([])
+    for i in range(3):
+        now[0] += 1
+        cache.put(f"question {i}", None, 'chunks', history, 'v1', f"answer {i}", [])
+    
+    # The least recently used answer went first
+    assert cache.get('question 0', None, 'chunks', history, 'v1') is None
+    assert cache.get('question 1', None, 'chunks', history, 'v1')[0]['answer'] == 'answer 1'
+    
+    now[0] += 61
+    assert cache.get('question 2', None, 'chunks', history, 'v1') is None
\ No newline at end of file
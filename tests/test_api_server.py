@@ -0,0 +1,82 @@
+import asyncio
+import json
+import types
+import pytest
+
+pytest.importorskip('aiohttp')
+from aiohttp.test_utils import TestClient, TestServer
+from api_server import create_app
+from rag_service import EmptyIndexError, RAGService, ReadWriteLock
+
+
+class EmptyService:
+    """Service whose index holds nothing yet"""
+    
+    def __init__(self):
+        self.questions = []
+    
+    async def aanswer(self, query, history):
+        self.questions.append((query, history))
+        raise EmptyIndexError("No documents indexed yet; ingest files first")
+    
+    async def astream_answer(self, query, history):
+        self.questions.append((query, history))
+        raise EmptyIndexError("No documents indexed yet; ingest files first")
+    
+    def close(self):
+        pass
+
+
+def post(service, path, body):
+    """POST a raw body and return (status, text)"""
+    async def run():
+        async with TestClient(TestServer(create_app(service))) as client:
+            response = await client.post(path, data=body, headers={'Content-Type': 'application/json'})
+            return response.status, await response.text()
+    return asyncio.run(run())
+
+
+def test_question_before_indexing_is_a_conflict():
+    status, text = post(EmptyService(), '/query', json.dumps({'query': 'anything?'}))
+    assert status == 409
+    assert 'No documents indexed' in json.loads(text)['error']
+
+
+def test_stream_before_indexing_sends_an_error_event():
+    status, text = post(EmptyService(), '/stream', json.dumps({'query': 'anything?'}))
+    assert status == 409
+    assert text.startswith('event: error\ndata: ')
+    assert 'No documents indexed' in json.loads(text.split('data: ', 1)[1])['error']
+
+
+def test_search_on_an_empty_store_raises(store):
+    service = types.SimpleNamespace(vector_store=store, _index_lock=ReadWriteLock())
+    with pytest.raises(EmptyIndexError):
+        RAGService.search(service, 'anything?')
+
+
+@pytest.mark.parametrize('body', [
+    '[1, 2]',
+    'not json',
+    '{"query": 42}',
+    '{"query": ["a", "list"]}',
+    '{"query": "   "}',
+    '{"query": "ok", "history": "not a list"}',
+    '{"query": "ok", "history": ["query answer"]}',
+    '{"query": "ok", "history": [{"query": "q"}]}',
+    '{"query": "ok", "history": [{"query": "q", "answer": 7}]}'
+])
+@pytest.mark.parametrize('path', ['/query', '/stream'])
+def test_malformed_questions_are_rejected(path, body):
+    service = EmptyService()
+    status, text = post(service, path, body)
+    assert status == 400
+    assert json.loads(text)['error']
+    assert service.questions == []
+
+
+def test_well_formed_history_is_passed_through():
+    service = EmptyService()
+    body = {'query': ' why? ', 'history': [{'query': 'q', 'answer': 'a', 'tokens': 3}]}
+    post(service, '/query', json.dumps(body))
+    assert service.questions == [('why?', [{'query': 'q', 'answer': 'a'}])]
\ No newline at end of file
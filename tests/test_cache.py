@@ -0,0 +1,50 @@
+import time
+from cache import LRUCache
+from conftest import make_docs
+from retriever import HybridRetriever
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = LRUCache(max_size=4, ttl=10)
+    cache.put('a', 1)
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_results_are_recomputed_when_the_index_version_changes(store, embedder):
+    docs = make_docs('zoo.txt', {1: ['cats sleep all day', 'dogs bark at night']})
+    store.add_file('zoo.txt', 'hash', embedder.embed_documents([doc['content'] for doc in docs]), docs)
+    retriever = HybridRetriever(embedder, store)
+    try:
+        first = retriever.retrieve('owls hunt', top_k=3)
+        assert retriever.retrieve('  Owls   hunt ', top_k=3) == first
+        assert retriever.result_cache.hits == 1
+        
+        # Adding a file changes the version, so the cached results are not served
+        docs = make_docs('birds.txt', {1: ['owls hunt at night']})
+        store.add_file('birds.txt', 'hash', embedder.embed_documents([doc['content'] for doc in docs]), docs)
+        results = retriever.retrieve('owls hunt', top_k=3)
+        assert retriever.result_cache.hits == 1
+        assert results[0][0]['content'] == 'owls hunt at night'
+        
+        # The query embedding does not depend on the index and stays cached
+        assert retriever.query_embedding_cache.hits == 1
+    finally:
+        retriever._sparse_pool.shutdown()
\ No newline at end of file
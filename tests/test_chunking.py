@@ -0,0 +1,62 @@
+import random
+import re
+import pytest
+from utils import get_encoding, split_text_by_tokens, split_texts_by_tokens
+
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+
+
+def random_text(rng, num_words):
+    words = []
+    for i in range(num_words):
+        word = rng.choice(WORDS)
+        words.append(word + ('.' if rng.random() < 0.08 else ''))
+    return ' '.join(words)
+
+
+def reference_chunks(text, chunk_size, overlap):
+    """Decode each token window separately"""
+    encoding = get_encoding("cl100k_base")
+    tokens = encoding.encode_ordinary(text)
+    chunks = []
+    start = 0
+    while tokens:
+        end = min(start + chunk_size, len(tokens))
+        chunks.append(encoding.decode(tokens[start:end]))
+        if end >= len(tokens):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+@pytest.mark.parametrize('chunk_size,overlap', [(50, 0), (50, 10), (64, 63), (500, 50)])
+def test_split_matches_window_decoding(chunk_size, overlap):
+    rng = random.Random(chunk_size + overlap)
+    texts = [random_text(rng, rng.randint(0, 900)) for _ in range(20)]
+    
+    batched = split_texts_by_tokens(texts, chunk_size, overlap)
+    for text, chunks in zip(texts, batched):
+        assert chunks == reference_chunks(text, chunk_size, overlap)
+        assert split_text_by_tokens(text, chunk_size, overlap) == chunks
+
+
+def test_sentence_snap_ends_chunks_on_sentences():
+    rng = random.Random(3)
+    encoding = get_encoding("cl100k_base")
+    text = random_text(rng, 3000)
+    chunks = split_text_by_tokens(text, chunk_size=100, overlap=10, snap='sentence')
+    
+    assert chunks
+    for chunk in chunks[:-1]:
+        num_tokens = len(encoding.encode_ordinary(chunk))
+        assert num_tokens <= 100
+        # A boundary in the second half of the window is always taken
+        window_tail = chunk[len(encoding.decode(encoding.encode_ordinary(chunk)[:50])):]
+        if re.search(r'[.!?]\s', window_tail):
+            assert re.search(r'[.!?]\s?$', chunk)
+
+
+def test_unknown_snap_mode_is_rejected():
+    with pytest.raises(ValueError):
+        split_text_by_tokens("some text", snap='paragraph')
\ No newline at end of file
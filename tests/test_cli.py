@@ -0,0 +1,35 @@
+import io
+import json
+import asyncio
+from cli import answer_file
+
+
+class EchoService:
+    async def aanswer(self, query, history):
+        if query == 'boom':
+            raise RuntimeError("model exploded")
+        return {'answer': f"echo: {query}", 'sources': [], 'metrics': {}}
+
+
+def test_bad_lines_get_error_records_and_the_batch_continues(tmp_path):
+    questions = tmp_path / 'questions.jsonl'
+    questions.write_text('\n'.join([
+        json.dumps({'id': 'a', 'query': 'first'}),
+        '{"query": "cut off',
+        '',
+        json.dumps({'id': 'b'}),
+        json.dumps(['not', 'an', 'object']),
+        json.dumps({'query': 'boom'}),
+        json.dumps({'query': 'last'})
+    ]) + '\n', encoding='utf-8')
+    
+    output = io.StringIO()
+    failures = asyncio.run(answer_file(EchoService(), str(questions), output, concurrency=2))
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    
+    assert failures == 4
+    assert [record.get('answer') for record in records] == ['echo: first', None, None, None, None, 'echo: last']
+    assert records[1]['error'].startswith('line 2: invalid JSON')
+    assert records[2] == {'id': 'b', 'query': None, 'error': "line 4: 'query' must be a non-empty string"}
+    assert records[3]['error'] == 'line 5: expected a JSON object'
+    assert records[4]['error'] == 'RuntimeError: model exploded'
\ No newline at end of file
@@ -0,0 +1,103 @@
+import random
+import string
+import pytest
+from context_packer import (
+    OVERLAP_PROBE_CHARS, PASSAGE_OVERHEAD_TOKENS, _jaccard, _join_overlapping, _shingles, pack_context
+)
+from utils import count_tokens
+
+
+def reference_join(left, right):
+    """Try every overlap length, longest first"""
+    for size in range(min(len(left), len(right)), OVERLAP_PROBE_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+def random_letters(rng, length, alphabet=string.ascii_lowercase):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def make_doc(doc_id, content, page=1, source='a.txt'):
+    return {
+        'id': doc_id,
+        'content': content,
+        'metadata': {'filename': source, 'page': page, 'source': source}
+    }
+
+
+def test_join_matches_longest_overlap_search():
+    rng = random.Random(0)
+    for _ in range(5000):
+        # A tiny alphabet makes repeated and partial overlaps common
+        left = random_letters(rng, rng.randint(0, 40), 'ab ')
+        right = random_letters(rng, rng.randint(1, 40), 'ab ')
+        if rng.random() < 0.5:
+            right = left[rng.randint(0, len(left)):] + right
+        assert _join_overlapping(left, right) == reference_join(left, right)
+
+
+@pytest.mark.parametrize('overlap', [OVERLAP_PROBE_CHARS, 12, 40])
+def test_consecutive_chunks_rebuild_the_page(overlap):
+    rng = random.Random(overlap)
+    text = random_letters(rng, 2000, string.ascii_lowercase + ' ')
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + 100, len(text))
+        chunks.append(text[start:end])
+        if end == len(text):
+            break
+        start = end - overlap
+    
+    docs = [(make_doc(i, chunk), rng.random()) for i, chunk in enumerate(chunks)]
+    rng.shuffle(docs)
+    packed, _ = pack_context(docs, max_tokens=10 ** 6, dedup_threshold=1.01)
+    
+    assert len(packed) == 1
+    passage, score = packed[0]
+    assert passage['content'] == text
+    assert passage['ids'] == list(range(len(chunks)))
+    assert score == max(score for _, score in docs)
+
+
+def test_chunks_of_other_pages_and_files_stay_apart():
+    docs = [
+        (make_doc(1, 'first chunk of page one'), 0.5),
+        (make_doc(2, 'first chunk of page two', page=2), 0.9),
+        (make_doc(3, 'first chunk of another file', page=2, source='b.txt'), 0.1),
+        (make_doc(None, 'a chunk without an id'), 0.3)
+    ]
+    packed, _ = pack_context(docs, max_tokens=10 ** 6, dedup_threshold=1.01)
+    assert [doc['content'] for doc, _ in packed] == [
+        'first chunk of page two', 'first chunk of page one', 'a chunk without an id', 'first chunk of another file'
+    ]
+
+
+def test_packing_respects_budget_dedup_and_order():
+    rng = random.Random(1)
+    vocabulary = [random_letters(rng, 5) for _ in range(30)]
+    for _ in range(200):
+        docs = []
+        for i in range(rng.randint(0, 12)):
+            # Ids far apart, so nothing is merged
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 40))]
+            docs.append((make_doc(i * 10, ' '.join(words)), rng.random()))
+        max_tokens = rng.randint(0, 600)
+        threshold = rng.choice([0.3, 0.6, 0.85])
+        
+        packed, total_tokens = pack_context(docs, max_tokens=max_tokens, dedup_threshold=threshold)
+        
+        # Greedy reference: walk by score, keep what is new and still fits
+        kept, used = [], 0
+        for doc, score in sorted(docs, key=lambda item: item[1], reverse=True):
+            if any(_jaccard(_shingles(doc['content']), _shingles(other['content'])) >= threshold for other, _ in kept):
+                continue
+            cost = count_tokens(doc['content']) + PASSAGE_OVERHEAD_TOKENS
+            if used + cost <= max_tokens:
+                kept.append((doc, score))
+                used += cost
+        
+        assert [doc['id'] for doc, _ in packed] == [doc['id'] for doc, _ in kept]
+        assert sum(count_tokens(doc['content']) + PASSAGE_OVERHEAD_TOKENS for doc, _ in packed) <= max_tokens
\ No newline at end of file
@@ -0,0 +1,55 @@
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+
+def vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype('float32')
+
+
+def test_lookup_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'model-a', dim=8, max_entries=4)
+    cache.store(['alpha', 'beta'], np.stack([vector(1), vector(2)]))
+    
+    # Keys ignore whitespace differences
+    embeddings, missing = cache.lookup(['beta', 'gamma', ' alpha '])
+    assert missing == [1]
+    assert np.array_equal(embeddings[0], vector(2)) and np.array_equal(embeddings[2], vector(1))
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'model-a', dim=8, max_entries=2)
+    cache.store(['alpha', 'beta'], np.stack([vector(1), vector(2)]))
+    cache.lookup(['alpha'])
+    cache.store(['gamma'], vector(3)[None])
+    
+    _, missing = cache.lookup(['alpha', 'beta', 'gamma'])
+    assert missing == [1]
+
+
+def test_reused_slot_after_crash_is_a_miss(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'model-a', dim=8, max_entries=2)
+    cache.store(['alpha', 'beta'], np.stack([vector(1), vector(2)]))
+    cache.flush()
+    
+    # alpha's slot goes to gamma and reaches disk, but the key index is never flushed
+    cache.store(['gamma'], vector(3)[None])
+    cache._vectors.flush()
+    cache._digests.flush()
+    
+    reopened = EmbeddingCache(str(tmp_path), 'model-a', dim=8, max_entries=2)
+    embeddings, missing = reopened.lookup(['alpha', 'beta'])
+    assert missing == [0]
+    assert np.array_equal(embeddings[1], vector(2))
+    assert len(reopened) == 1
+    
+    # The freed slot is used again and the store stays consistent
+    reopened.store(['alpha'], vector(1)[None])
+    embeddings, missing = reopened.lookup(['alpha', 'beta'])
+    assert missing == []
+    assert np.array_equal(embeddings[0], vector(1))
+
+
+def test_models_do_not_share_vectors(tmp_path):
+    EmbeddingCache(str(tmp_path), 'model-a', dim=8, max_entries=2).store(['alpha'], vector(1)[None])
+    _, missing = EmbeddingCache(str(tmp_path), 'model-b', dim=8, max_entries=2).lookup(['alpha'])
+    assert missing == [0]
\ No newline at end of file
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from config import config
+from retriever import HybridRetriever
+
+
+def reference_fusion(dense, sparse, alpha, method, rrf_k=60):
+    """Dict-based fusion over (id, score) lists, best first"""
+    def normalize(scores):
+        if not scores:
+            return []
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [1.0] * len(scores)
+        return [(s - low) / (high - low) for s in scores]
+    
+    fused = {}
+    for weight, results in ((1 - alpha, dense), (alpha, sparse)):
+        if method == 'rrf':
+            parts = [1.0 / (rrf_k + rank) for rank in range(1, len(results) + 1)]
+        else:
+            parts = normalize([score for _, score in results])
+        for (doc_id, _), part in zip(results, parts):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * part
+    return fused
+
+
+def random_leg(rng, size, scale):
+    ids = rng.choice(200, size, replace=False)
+    scores = np.sort(rng.random(size) * scale)[::-1].astype('float32')
+    return ids, scores
+
+
+@pytest.fixture
+def fusion_method():
+    original = config.FUSION_METHOD
+    yield lambda method: setattr(config, 'FUSION_METHOD', method)
+    config.FUSION_METHOD = original
+
+
+@pytest.mark.parametrize('method', ['weighted', 'rrf'])
+def test_fuse_matches_reference(method, fusion_method):
+    fusion_method(method)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        dense_ids, dense_scores = random_leg(rng, int(rng.integers(0, 30)), 1.0)
+        sparse_ids, sparse_scores = random_leg(rng, int(rng.integers(0, 30)), 20.0)
+        alpha = float(rng.random())
+        top_k = int(rng.integers(1, 40))
+        
+        ids, scores = HybridRetriever._fuse(
+            dense_ids, dense_scores, sparse_ids, sparse_scores, alpha=alpha, top_k=top_k
+        )
+        expected = reference_fusion(
+            list(zip(dense_ids.tolist(), dense_scores.tolist())),
+            list(zip(sparse_ids.tolist(), sparse_scores.tolist())),
+            alpha, method, config.RRF_K
+        )
+        
+        assert len(set(ids.tolist())) == len(ids)
+        assert np.allclose(scores, sorted(expected.values(), reverse=True)[:top_k])
+        for doc_id, score in zip(ids.tolist(), scores.tolist()):
+            assert expected[doc_id] == pytest.approx(score)
+
+
+def test_fuse_rejects_unknown_method(fusion_method):
+    fusion_method('max')
+    with pytest.raises(ValueError):
+        HybridRetriever._fuse(np.array([1]), np.array([1.0]), np.array([2]), np.array([1.0]))
\ No newline at end of file
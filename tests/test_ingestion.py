@@ -0,0 +1,76 @@
+import random
+import pytest
+from config import config
+from document_processor import WORDS_PER_PAGE, DocumentProcessor
+from ingestion import IngestionPipeline
+from vector_store import VectorStore
+
+
+class FlakyEmbedder:
+    """Fails on the nth embedding call, like a crash part-way through a file"""
+    
+    def __init__(self, embedder, fail_on_call=None):
+        self.embedder = embedder
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+    
+    def embed_documents(self, texts, flush=True):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("embedding model crashed")
+        return self.embedder.embed_documents(texts)
+    
+    def flush_cache(self):
+        pass
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    """A TXT file of six pseudo-pages"""
+    monkeypatch.setattr(config, 'CHUNK_SIZE', 200)
+    monkeypatch.setattr(config, 'CHUNK_OVERLAP', 20)
+    monkeypatch.setattr(config, 'INGEST_WORKERS', 1)
+    rng = random.Random(0)
+    words = [f"{rng.choice(['cat', 'dog', 'owl', 'fox'])}{rng.randint(0, 999)}" for _ in range(6 * WORDS_PER_PAGE)]
+    path = tmp_path / 'book.txt'
+    path.write_text(' '.join(words), encoding='utf-8')
+    return str(path)
+
+
+def ingest(store, embedder, book):
+    pipeline = IngestionPipeline(DocumentProcessor(), embedder, store, batch_size=4)
+    return list(pipeline.ingest_files({book: 'hash-1'}))
+
+
+def indexed_chunks(store):
+    return [
+        (doc['metadata']['page'], doc['metadata']['chunk_index'], doc['content'])
+        for doc in store.chunks.iter_documents()
+    ]
+
+
+def test_interrupted_ingestion_resumes_after_committed_pages(store, embedder, book, tmp_path, monkeypatch):
+    [(_, committed, error)] = ingest(store, FlakyEmbedder(embedder, fail_on_call=3), book)
+    assert isinstance(error, RuntimeError)
+    assert committed == store.num_documents() > 0
+    assert not store.is_indexed(book, 'hash-1')
+    
+    # Reopen as a restarted process would and ingest the same file again
+    reopened = VectorStore()
+    assert reopened.load()
+    resumed_from = reopened.resume_page(book, 'hash-1')
+    assert resumed_from > 1
+    flaky = FlakyEmbedder(embedder)
+    [(_, added, error)] = ingest(reopened, flaky, book)
+    assert error is None
+    assert reopened.is_indexed(book, 'hash-1')
+    assert committed + added == reopened.num_documents()
+    
+    # Same chunks as an uninterrupted run, and earlier pages were not embedded again
+    monkeypatch.setattr(config, 'VECTOR_STORE_PATH', str(tmp_path / 'fresh'))
+    (tmp_path / 'fresh').mkdir()
+    fresh = VectorStore()
+    [(_, total, _)] = ingest(fresh, FlakyEmbedder(embedder), book)
+    assert indexed_chunks(reopened) == indexed_chunks(fresh)
+    assert added < total
+    assert min(page for page, _, _ in indexed_chunks(reopened)[committed:]) == resumed_from
\ No newline at end of file
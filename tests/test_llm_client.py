@@ -0,0 +1,59 @@
+import pytest
+from config import config
+from llm_client import LLMAPIError, LLMClient
+from stub_llm_server import start_stub_server
+
+
+PAYLOAD = {'messages': [{'role': 'user', 'content': 'ping'}], 'model': 'stub'}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(config, 'LLM_BACKOFF_BASE', 0.001)
+    monkeypatch.setattr(config, 'LLM_BACKOFF_MAX', 0.01)
+    servers = []
+    
+    def start(**kwargs):
+        server, api_base = start_stub_server(retry_after=0, token_latency=0, **kwargs)
+        servers.append(server)
+        return server, api_base
+    
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize('failures', [{'rate_limit_every': 2}, {'fail_every': 2}, {'rate_limit_every': 3, 'fail_every': 2}])
+def test_transient_failures_are_retried(stub, failures):
+    server, api_base = stub(**failures)
+    client = LLMClient(api_base, token='test', max_retries=3)
+    try:
+        for _ in range(6):
+            assert client.complete(PAYLOAD) == 'Stub answer to: ping'
+    finally:
+        client.close()
+    assert server.requests > 6
+
+
+def test_exhausted_retries_raise_with_status(stub):
+    server, api_base = stub(fail_every=1)
+    client = LLMClient(api_base, token='test', max_retries=2)
+    try:
+        with pytest.raises(LLMAPIError) as excinfo:
+            client.complete(PAYLOAD)
+    finally:
+        client.close()
+    assert excinfo.value.status_code == 503
+    assert server.requests == 3
+
+
+def test_stream_is_retried_until_it_opens(stub):
+    server, api_base = stub(rate_limit_every=2)
+    client = LLMClient(api_base, token='test', max_retries=1)
+    try:
+        assert ''.join(client.stream(PAYLOAD)) == 'Stub answer to: ping'
+        assert ''.join(client.stream(PAYLOAD)) == 'Stub answer to: ping'
+    finally:
+        client.close()
+    assert server.requests == 3
\ No newline at end of file
@@ -0,0 +1,35 @@
+import llm_handler
+from llm_handler import LLMHandler
+from utils import count_tokens
+
+
+def test_prompt_tokens_reuse_cached_counts(monkeypatch):
+    handler = LLMHandler()
+    history = [
+        {'query': f"question {i} about cats", 'answer': f"answer {i}: cats sleep a lot"}
+        for i in range(5)
+    ]
+    for item in history:
+        item['tokens'] = count_tokens(item['query'] + item['answer'])
+    docs = [
+        ({'id': i, 'content': f"chunk {i} says cats sleep sixteen hours",
+          'metadata': {'filename': 'cats.txt', 'page': i, 'source': 'cats.txt'}}, 1.0 - i / 10)
+        for i in range(3)
+    ]
+    
+    counted = []
+    
+    def counting(text, *args):
+        counted.append(text)
+        return count_tokens(text, *args)
+    
+    monkeypatch.setattr(llm_handler, 'count_tokens', counting)
+    observed = []
+    monkeypatch.setattr(llm_handler.telemetry, 'count', lambda name, value=1, **labels: observed.append((name, value)))
+    messages, packed = handler._prepare_messages('do cats sleep?', docs, history)
+    
+    # Only the question is tokenized here; history counts come from the items
+    assert counted == ['do cats sleep?']
+    prompt_tokens = dict(observed)['llm_prompt_tokens_total']
+    exact = sum(count_tokens(message['content']) for message in messages)
+    assert abs(prompt_tokens - exact) <= 0.2 * exact
\ No newline at end of file
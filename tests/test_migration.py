@@ -0,0 +1,186 @@
+import os
+import pickle
+import sqlite3
+import faiss
+import numpy as np
+import pytest
+import chunk_store
+from conftest import make_docs
+from vector_store import VectorStore
+
+
+PAGES = {
+    'a.txt': {1: ['cats sleep all day', 'cats purr when happy'], 2: ['dogs bark at strangers']},
+    'b.txt': {1: ['birds sing at dawn'], 3: ['fish swim in schools', 'owls hunt at night']}
+}
+
+# Chunk store schema before chunk_index replaced the "<page>_<index>" chunk_id string
+OLD_SCHEMA = """
+CREATE TABLE files (id INTEGER PRIMARY KEY, source TEXT UNIQUE NOT NULL, filename TEXT NOT NULL, hash TEXT);
+CREATE TABLE chunks (
+    id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL REFERENCES files(id),
+    page INTEGER NOT NULL, chunk_id TEXT NOT NULL
+);
+CREATE INDEX chunks_file ON chunks(file_id);
+CREATE TABLE chunk_text (id INTEGER PRIMARY KEY, content TEXT NOT NULL);
+CREATE TABLE chunk_vectors (id INTEGER PRIMARY KEY, embedding BLOB NOT NULL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def legacy_docs():
+    """Chunks as older builds stored them, with a "<page>_<index>" chunk_id"""
+    docs = []
+    for source, pages in PAGES.items():
+        for doc in make_docs(source, pages):
+            metadata = doc['metadata']
+            metadata['chunk_id'] = f"{metadata['page']}_{metadata.pop('chunk_index')}"
+            docs.append(doc)
+    return docs
+
+
+def assert_migrated(store, embedder, ids, docs):
+    """Every chunk is readable by its id and found again by both search legs"""
+    loaded = store.get_documents(ids)
+    for doc_id, doc, original in zip(ids, loaded, docs):
+        page, chunk_index = original['metadata']['chunk_id'].split('_')
+        assert doc['id'] == doc_id
+        assert doc['content'] == original['content']
+        assert doc['metadata']['source'] == original['metadata']['source']
+        assert doc['metadata']['page'] == int(page)
+        assert doc['metadata']['chunk_index'] == int(chunk_index)
+        assert doc['metadata']['chunk_id'] == doc_id
+        
+        (best, _), = store.search(embedder.embed_query(original['content']), k=1)
+        assert best['id'] == doc_id
+        sparse_ids, _ = store.sparse_index.search(original['content'], k=1)
+        assert sparse_ids[0] == doc_id
+
+
+def test_migrates_original_pickle_store(store_path, embedder):
+    docs = legacy_docs()
+    embeddings = embedder.embed_documents([doc['content'] for doc in docs])
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    faiss.write_index(index, str(store_path / 'faiss. index'))
+    with open(store_path / 'documents. pkl', 'wb') as f:
+        pickle.dump(docs, f)
+    
+    store = VectorStore()
+    assert store.load()
+    
+    # Rows become ids in their original order
+    assert store.metric == 'l2'
+    assert store.ids().tolist() == list(range(len(docs)))
+    assert_migrated(store, embedder, list(range(len(docs))), docs)
+    assert not os.path.exists(store_path / 'documents. pkl')
+    
+    # New chunks never reuse a migrated id
+    store.add_file('c.txt', 'hash-c', embeddings[:1], make_docs('c.txt', {1: ['new chunk']}))
+    assert store.ids().tolist()[-1] == len(docs)
+
+
+def test_migrates_manifest_pickle_store(store_path, embedder):
+    # Ids left with gaps by earlier removals
+    docs = legacy_docs()
+    ids = [3, 4, 5, 9, 12, 13]
+    for doc_id, doc in zip(ids, docs):
+        doc['id'] = doc_id
+    embeddings = embedder.embed_documents([doc['content'] for doc in docs])
+    np.save(store_path / 'embeddings.npy', embeddings)
+    with open(store_path / 'documents. pkl', 'wb') as f:
+        pickle.dump({
+            'documents': docs,
+            'manifest': {'a.txt': {'hash': 'hash-a', 'ids': ids[:3]}, 'b.txt': {'hash': 'hash-b', 'ids': ids[3:]}},
+            'next_id': 14,
+            'index_type': 'flat',
+            'built_type': 'flat',
+            'metric': 'ip'
+        }, f)
+    
+    store = VectorStore()
+    assert store.load()
+    
+    assert store.ids().tolist() == ids
+    assert store.is_indexed('a.txt', 'hash-a') and store.is_indexed('b.txt', 'hash-b')
+    assert_migrated(store, embedder, ids, docs)
+    
+    # A second open finds nothing left to migrate
+    reopened = VectorStore()
+    assert reopened.load()
+    assert reopened.ids().tolist() == ids and reopened.next_id == 14
+
+
+def write_chunk_id_store(store_path, embedder, docs):
+    """A SQLite store written before chunk_index existed, with its FAISS index"""
+    embeddings = embedder.embed_documents([doc['content'] for doc in docs])
+    conn = sqlite3.connect(store_path / 'chunks.sqlite')
+    conn.executescript(OLD_SCHEMA)
+    file_ids = {}
+    for doc_id, (doc, vector) in enumerate(zip(docs, embeddings)):
+        source = doc['metadata']['source']
+        if source not in file_ids:
+            file_ids[source] = conn.execute(
+                "INSERT INTO files (source, filename, hash) VALUES (?, ?, ?)", (source, source, f"hash-{source}")
+            ).lastrowid
+        conn.execute(
+            "INSERT INTO chunks (id, file_id, page, chunk_id) VALUES (?, ?, ?, ?)",
+            (doc_id, file_ids[source], doc['metadata']['page'], doc['metadata']['chunk_id'])
+        )
+        conn.execute("INSERT INTO chunk_text (id, content) VALUES (?, ?)", (doc_id, doc['content']))
+        conn.execute("INSERT INTO chunk_vectors (id, embedding) VALUES (?, ?)", (doc_id, vector.tobytes()))
+    for key, value in [('next_id', len(docs)), ('index_type', 'flat'), ('built_type', 'flat'),
+                       ('metric', 'ip'), ('version', 'old')]:
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    conn.commit()
+    conn.close()
+    
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(embeddings.shape[1]))
+    index.add_with_ids(embeddings, np.arange(len(docs), dtype='int64'))
+    faiss.write_index(index, str(store_path / 'faiss. index'))
+
+
+def chunk_columns(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(chunks)")]
+        count = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    finally:
+        conn.close()
+    return tables, columns, count
+
+
+def test_migrates_chunk_id_schema(store_path, embedder):
+    docs = legacy_docs()
+    write_chunk_id_store(store_path, embedder, docs)
+    
+    store = VectorStore()
+    assert store.load()
+    
+    tables, columns, count = chunk_columns(store_path / 'chunks.sqlite')
+    assert columns == ['id', 'file_id', 'page', 'chunk_index'] and count == len(docs)
+    assert 'chunks_v2' not in tables
+    assert_migrated(store, embedder, list(range(len(docs))), docs)
+
+
+def test_failed_chunk_id_migration_rolls_back(store_path, embedder, monkeypatch):
+    docs = legacy_docs()
+    write_chunk_id_store(store_path, embedder, docs)
+    
+    # Fail after the new table is filled and the old one dropped
+    migration = chunk_store.MIGRATE_CHUNK_INDEX
+    failing = migration.replace('COMMIT;', 'INSERT INTO no_such_table VALUES (1);\nCOMMIT;')
+    monkeypatch.setattr(chunk_store, 'MIGRATE_CHUNK_INDEX', failing)
+    with pytest.raises(sqlite3.OperationalError):
+        VectorStore()
+    
+    tables, columns, count = chunk_columns(store_path / 'chunks.sqlite')
+    assert 'chunks_v2' not in tables
+    assert 'chunk_id' in columns and count == len(docs)
+    
+    # The untouched store migrates on the next open
+    monkeypatch.setattr(chunk_store, 'MIGRATE_CHUNK_INDEX', migration)
+    store = VectorStore()
+    assert store.load()
+    assert_migrated(store, embedder, list(range(len(docs))), docs)
\ No newline at end of file
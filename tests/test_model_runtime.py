@@ -0,0 +1,53 @@
+import threading
+import pytest
+from model_runtime import MicroBatcher
+
+
+def test_concurrent_callers_get_their_own_results():
+    batches = []
+    
+    def double(items):
+        batches.append(len(items))
+        return [item * 2 for item in items]
+    
+    batcher = MicroBatcher(double, max_batch=64, window=0.05)
+    start = threading.Barrier(16)
+    results = {}
+    
+    def caller(n):
+        items = [n * 100 + i for i in range(n % 5 + 1)]
+        start.wait()
+        results[n] = (items, batcher.submit(items))
+    
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    for items, output in results.values():
+        assert output == [item * 2 for item in items]
+    assert len(results) == 16
+    # Callers arriving together share forward passes
+    assert len(batches) < 16
+    assert sum(batches) == batcher.stats()['items'] == sum(len(items) for items, _ in results.values())
+
+
+def test_batch_size_is_capped_and_errors_reach_every_caller():
+    def fail(items):
+        raise RuntimeError("model crashed")
+    
+    batcher = MicroBatcher(fail, max_batch=4, window=0.01)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.submit([1, 2])
+    
+    sizes = []
+    batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, max_batch=4, window=0.05)
+    threads = [threading.Thread(target=batcher.submit, args=([i, i],)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A batch stops collecting once it holds max_batch items
+    assert max(sizes) <= 4 and sum(sizes) == 12
+    assert batcher.submit([]) == []
\ No newline at end of file
@@ -0,0 +1,51 @@
+from config import config
+from reranker import Reranker
+
+
+class CountingCrossEncoder:
+    """Scores a pair by shared words and records every pair it sees"""
+    
+    def __init__(self):
+        self.pairs = []
+    
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs.extend(pairs)
+        return [len(set(query.split()) & set(passage.split())) for query, passage in pairs]
+
+
+def candidates(n):
+    return [({'id': i, 'content': ' '.join(f"w{j}" for j in range(i % 7 + 1))}, 1.0 - i / n) for i in range(n)]
+
+
+def test_scores_are_cached_per_query_and_chunk(monkeypatch):
+    monkeypatch.setattr(config, 'RERANK_CASCADE', False)
+    model = CountingCrossEncoder()
+    reranker = Reranker(model)
+    docs = candidates(20)
+    
+    first = reranker.rerank('w0 w1 w2', docs, top_k=5)
+    assert len(model.pairs) == 20
+    expected = sorted(
+        ((doc['id'], float(len({'w0', 'w1', 'w2'} & set(doc['content'].split())))) for doc, _ in docs),
+        key=lambda item: item[1], reverse=True
+    )[:5]
+    assert [(doc['id'], score) for doc, score in first] == expected
+    
+    # Same question up to case and spacing: nothing is scored again
+    assert reranker.rerank(' W0  w1 W2', docs, top_k=5) == first
+    assert len(model.pairs) == 20
+    
+    # A new chunk in the candidates is the only pair scored
+    reranker.rerank('w0 w1 w2', docs + [({'id': 99, 'content': 'w0'}, 0.0)], top_k=5)
+    assert len(model.pairs) == 21
+
+
+def test_cascade_with_a_large_margin_scores_everything(monkeypatch):
+    monkeypatch.setattr(config, 'RERANK_CASCADE', True)
+    monkeypatch.setattr(config, 'RERANK_CASCADE_MARGIN', 100.0)
+    monkeypatch.setattr(config, 'RERANK_BATCH_SIZE', 4)
+    docs = candidates(20)
+    
+    cascade = Reranker(CountingCrossEncoder()).rerank('w0 w3 w5', docs, top_k=5)
+    monkeypatch.setattr(config, 'RERANK_CASCADE', False)
+    assert cascade == Reranker(CountingCrossEncoder()).rerank('w0 w3 w5', docs, top_k=5)
\ No newline at end of file
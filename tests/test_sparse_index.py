@@ -0,0 +1,106 @@
+import math
+import random
+import numpy as np
+import pytest
+from sparse_index import BM25Index, tokenize
+
+
+VOCAB = [f"w{i}" for i in range(60)]
+
+
+def brute_force_scores(docs, query, k1=1.5, b=0.75):
+    """Score every document against every query term"""
+    n = len(docs)
+    avgdl = sum(len(tokens) for tokens in docs.values()) / n
+    query_tf = {}
+    for term in tokenize(query):
+        query_tf[term] = query_tf.get(term, 0) + 1
+    
+    scores = {}
+    for term, qtf in query_tf.items():
+        df = sum(1 for tokens in docs.values() if term in tokens)
+        if not df:
+            continue
+        idf = qtf * math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for doc_id, tokens in docs.items():
+            tf = tokens.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(tokens) / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def random_doc(rng):
+    # Skewed vocabularies give both rare and common terms
+    return [rng.choice(VOCAB[:rng.randint(5, 60)]) for _ in range(rng.randint(1, 30))]
+
+
+def assert_matches(index, docs, query, k):
+    ids, scores = index.search(query, k)
+    expected = brute_force_scores(docs, query)
+    best = sorted(expected.values(), reverse=True)[:k]
+    
+    assert len(ids) == len(best)
+    assert np.allclose(scores, best, rtol=1e-4)
+    for doc_id, score in zip(ids.tolist(), scores.tolist()):
+        assert expected[doc_id] == pytest.approx(score, rel=1e-4)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_search_matches_brute_force(seed):
+    rng = random.Random(seed)
+    index = BM25Index(k1=1.5, b=0.75)
+    docs = {}
+    for doc_id in range(400):
+        docs[doc_id] = random_doc(rng)
+        index.add(doc_id, docs[doc_id])
+    
+    for _ in range(100):
+        query = ' '.join(rng.choice(VOCAB) for _ in range(rng.randint(1, 6)))
+        assert_matches(index, docs, query, rng.randint(1, 20))
+
+
+def test_search_after_removals_compaction_and_reload(tmp_path):
+    rng = random.Random(7)
+    index = BM25Index(k1=1.5, b=0.75)
+    docs = {}
+    next_id = 0
+    for step in range(3000):
+        if rng.random() < 0.8 or not docs:
+            docs[next_id] = random_doc(rng)
+            index.add(next_id, docs[next_id])
+            # Gaps in the ids, as after removed files
+            next_id += rng.randint(1, 5)
+        else:
+            removed = rng.sample(sorted(docs), min(len(docs), rng.randint(1, 5)))
+            index.remove(removed)
+            for doc_id in removed:
+                del docs[doc_id]
+        
+        if step % 500 == 499:
+            index.save(str(tmp_path / 'sparse'), 'v1')
+            index = BM25Index.load(str(tmp_path / 'sparse'), 'v1')
+        if step % 50 == 0 and docs:
+            query = ' '.join(rng.choice(VOCAB) for _ in range(rng.randint(1, 5)))
+            assert_matches(index, docs, query, rng.randint(1, 15))
+    
+    assert sorted(index.doc_ids().tolist()) == sorted(docs)
+    index.compact()
+    # Rows are reclaimed: arrays track the live documents, not the largest id
+    assert len(index._ids) == len(docs)
+
+
+def test_load_rejects_other_version(tmp_path):
+    index = BM25Index()
+    index.add_many([(0, "alpha beta"), (1, "beta gamma")])
+    index.save(str(tmp_path / 'sparse'), 'v1')
+    
+    assert BM25Index.load(str(tmp_path / 'sparse'), 'v2') is None
+    assert len(BM25Index.load(str(tmp_path / 'sparse'), 'v1')) == 2
+
+
+def test_ids_must_increase():
+    index = BM25Index()
+    index.add(5, ['a'])
+    with pytest.raises(ValueError):
+        index.add(5, ['b'])
\ No newline at end of file
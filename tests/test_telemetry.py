@@ -0,0 +1,56 @@
+import os
+import cProfile
+import pstats
+import pytest
+from conftest import make_docs
+from config import config
+from retriever import HybridRetriever
+from telemetry import telemetry
+
+
+@pytest.fixture
+def retriever(store, embedder, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PARALLEL_RETRIEVAL', True)
+    monkeypatch.setattr(config, 'TELEMETRY_SLOW_MS', 0.0)
+    monkeypatch.setattr(config, 'TELEMETRY_PROFILE_DIR', str(tmp_path / 'profiles'))
+    docs = make_docs('zoo.txt', {1: ['cats sleep all day', 'dogs bark at night'], 2: ['birds sing at dawn']})
+    store.add_file('zoo.txt', 'hash', embedder.embed_documents([doc['content'] for doc in docs]), docs)
+    retriever = HybridRetriever(embedder, store)
+    yield retriever
+    retriever._sparse_pool.shutdown()
+
+
+@pytest.mark.parametrize('mode', ['cprofile', 'sample'])
+def test_traced_query_is_profiled(retriever, monkeypatch, mode):
+    monkeypatch.setattr(config, 'TELEMETRY_PROFILE', mode)
+    with telemetry.trace('answer') as trace:
+        results = retriever.retrieve('do dogs bark', top_k=2)
+    
+    assert results[0][0]['content'] == 'dogs bark at night'
+    assert trace.error is None
+    assert {'sparse_search', 'dense_search', 'fusion'} <= set(trace.stage_totals())
+    if mode == 'cprofile':
+        # BM25 runs on a pool thread, which the profile must cover
+        functions = {(os.path.basename(path), name) for path, _, name in pstats.Stats(trace.profile).stats}
+        assert ('sparse_index.py', 'search') in functions
+    else:
+        with open(trace.profile, encoding='utf-8') as f:
+            assert all(line.rsplit(' ', 1)[1].strip().isdigit() for line in f)
+
+
+def test_profiler_errors_never_fail_a_request(retriever, monkeypatch):
+    # What Python 3.12+ raises when a second cProfile profiler is enabled
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+    
+    monkeypatch.setattr(config, 'TELEMETRY_PROFILE', 'cprofile')
+    monkeypatch.setattr(cProfile.Profile, 'enable', enable)
+    with telemetry.trace('answer') as trace:
+        results = retriever.retrieve('birds at dawn', top_k=2)
+    
+    assert results[0][0]['content'] == 'birds sing at dawn'
+    assert trace.error is None
+    
+    # The next profiled request can still take the profiler
+    assert telemetry._profile_lock.acquire(blocking=False)
+    telemetry._profile_lock.release()
\ No newline at end of file
@@ -1,15 +1,45 @@
 import re
+import hashlib
 import tiktoken
-from typing import List
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Optional
 
 
-def count_tokens(text: str, model:  str = "gpt-4") -> int:
-    """Count tokens in text"""
+# Where a chunk may end when snapping to boundaries. Chunking runs on
+# clean_text() output, which folds all whitespace, so only sentence ends survive
+BOUNDARY_PATTERNS = {
+    'sentence': re.compile(r'[.!?]["\')\]]*(\s+)')
+}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Load a tokenizer once per process"""
+    return tiktoken.get_encoding(name)
+
+
+@lru_cache(maxsize=None)
+def get_model_encoding(model: str) -> tiktoken.Encoding:
+    """Tokenizer for a model name, falling back to cl100k_base"""
     try:
-        encoding = tiktoken. encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+        return get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model:  str = "gpt-4") -> int:
+    """Count tokens in text"""
+    return len(get_model_encoding(model).encode_ordinary(text))
+
+
+def compute_file_hash(file_path: str) -> str:
+    """Hash file contents to detect unchanged uploads"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 def clean_text(text: str) -> str:
@@ -24,22 +54,78 @@ def clean_text(text: str) -> str:
 def split_text_by_tokens(
     text: str,
     chunk_size: int = 500,
-    overlap: int = 50
+    overlap: int = 50,
+    snap: Optional[str] = None
 ) -> List[str]:
     """Split text into chunks by token count with overlap"""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)
+    return split_texts_by_tokens([text], chunk_size, overlap, snap)[0]
+
+
+def split_texts_by_tokens(
+    texts: List[str],
+    chunk_size: int = 500,
+    overlap: int = 50,
+    snap: Optional[str] = None
+) -> List[List[str]]:
+    """Split many texts into token chunks, tokenizing them in one batch
+
+    Chunks are sliced out of the text by token character offsets rather than
+    decoded window by window. With snap='sentence', a chunk ends at the
+    last sentence boundary in its second half when there is one,
+    using the same tokenization.
+    """
+    if snap is not None and snap not in BOUNDARY_PATTERNS:
+        raise ValueError(f"Unsupported snap mode: {snap}")
+    
+    encoding = get_encoding("cl100k_base")
+    if len(texts) > 1:
+        token_lists = encoding.encode_ordinary_batch(texts)
+    else:
+        token_lists = [encoding.encode_ordinary(text) for text in texts]
+    
+    return [
+        _split_tokens(encoding, tokens, chunk_size, overlap, snap)
+        for tokens in token_lists
+    ]
+
+
+def _split_tokens(
+    encoding: tiktoken.Encoding,
+    tokens: List[int],
+    chunk_size: int,
+    overlap: int,
+    snap: Optional[str]
+) -> List[str]:
+    """Cut one tokenized text into overlapping windows"""
+    if not tokens:
+        return []
+    
+    # One decode per text; offsets[i] is where token i starts in the text
+    text, offsets = encoding.decode_with_offsets(tokens)
+    offsets.append(len(text))
+    num_tokens = len(tokens)
+    
+    breaks = []  # Token indices a chunk may end before
+    if snap is not None:
+        positions = set()
+        for match in BOUNDARY_PATTERNS[snap].finditer(text):
+            # Tokens usually carry the leading whitespace, so either edge works
+            positions.update((match.start(1), match.end(1)))
+        breaks = [i for i in range(1, num_tokens) if offsets[i] in positions]
     
     chunks = []
     start = 0
+    while True:
+        end = min(start + chunk_size, num_tokens)
+        if breaks and end < num_tokens:
+            i = bisect_right(breaks, end) - 1
+            if i >= 0 and breaks[i] > start + chunk_size // 2:
+                end = breaks[i]
+        chunks.append(text[offsets[start]:offsets[end]])
+        if end >= num_tokens:
+            break
+        start = max(end - overlap, start + 1)
     
-    while start < len(tokens):
-        end = start + chunk_size
-        chunk_tokens = tokens[start:end]
-        chunk_text = encoding.decode(chunk_tokens)
-        chunks.append(chunk_text)
-        start = end - overlap
-        
     return chunks
 
 
@@ -55,6 +141,14 @@ def format_sources(sources: List[dict]) -> str:
     return "\n\n".join(formatted)
 
 
+def memory_item_tokens(item: dict) -> int:
+    """Token count of a chat-history entry, computed once and cached on the entry"""
+    tokens = item.get('tokens')
+    if tokens is None:
+        tokens = item['tokens'] = count_tokens(item['query'] + item['answer'])
+    return tokens
+
+
 def truncate_memory(memory:  List[dict], max_tokens:  int) -> List[dict]:
     """Truncate memory to fit within token limit"""
     truncated = []
@@ -62,10 +156,11 @@ def truncate_memory(memory:  List[dict], max_tokens:  int) -> List[dict]:
     
     # Add from most recent to oldest
     for item in reversed(memory):
-        item_tokens = count_tokens(item['query'] + item['answer'])
+        item_tokens = memory_item_tokens(item)
         if total_tokens + item_tokens > max_tokens:
             break
-        truncated.insert(0, item)
+        truncated.append(item)
         total_tokens += item_tokens
     
+    truncated.reverse()
     return truncated
\ No newline at end of file
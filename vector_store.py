@@ -1,72 +1,528 @@
 import os
+import shutil
+import time
+import uuid
 import pickle
 import faiss
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+from chunk_store import ChunkStore
+from sparse_index import BM25Index
 from config import config
 
 
+# Index types that need a k-means/PQ training pass before vectors can be added
+TRAINED_INDEX_TYPES = ('ivf_flat', 'ivf_pq')
+INDEX_TYPES = ('flat', 'hnsw') + TRAINED_INDEX_TYPES
+METRICS = {'ip': faiss.METRIC_INNER_PRODUCT, 'l2': faiss.METRIC_L2}
+
+
 class VectorStore:
-    """FAISS-based vector store for efficient similarity search"""
+    """FAISS-based vector store for efficient similarity search
+
+    FAISS holds the vectors for search; chunk text, metadata, raw vectors and
+    the file manifest live in a SQLite ChunkStore and are fetched by id only
+    when needed. FAISS ids are the chunk store primary keys, and the BM25
+    sparse index is kept in step with them and saved alongside the FAISS index.
+    """
     
     def __init__(self):
         self.index = None
-        self.documents = []
+        self.index_type = config.FAISS_INDEX_TYPE  # Requested type, persisted with the index
+        self.built_type = None  # Type actually built (flat until a trained type has enough data)
+        self.metric = config.FAISS_METRIC  # 'ip' (cosine on normalized embeddings) or 'l2'
+        self.version = uuid.uuid4().hex  # Changes whenever the indexed contents change
         self.index_path = os.path.join(config. VECTOR_STORE_PATH, "faiss. index")
+        self.db_path = os.path.join(config.VECTOR_STORE_PATH, "chunks.sqlite")
+        self.sparse_path = os.path.join(config.VECTOR_STORE_PATH, "sparse_index")
+        
+        # Pre-SQLite stores, migrated on load
         self.docs_path = os.path.join(config.VECTOR_STORE_PATH, "documents. pkl")
+        self.embeddings_path = os.path.join(config.VECTOR_STORE_PATH, "embeddings.npy")
+        
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS_INDEX_TYPE: {self.index_type}")
+        if self.metric not in METRICS:
+            raise ValueError(f"Unsupported FAISS_METRIC: {self.metric}")
+        
+        self.chunks = ChunkStore(self.db_path)
+        self.sparse_index = BM25Index()
+        self.next_id = int(self.chunks.get_meta('next_id', 0))
     
     def create_index(self, embeddings: np.ndarray, documents: List[Dict]):
-        """Create FAISS index from embeddings"""
-        dimension = embeddings.shape[1]
+        """Create FAISS index from embeddings, replacing everything indexed before"""
+        self._reset()
         
-        # Use IndexFlatL2 for exact search
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings. astype('float32'))
-        self.documents = documents
+        sources = {}
+        for row, doc in enumerate(documents):
+            sources.setdefault(doc['metadata']['source'], []).append(row)
+        for source, rows in sources.items():
+            self.add_file(source, None, embeddings[rows], [documents[row] for row in rows])
         
         print(f"✅ Created FAISS index with {len(documents)} documents")
     
+    def is_indexed(self, source: str, file_hash: str) -> bool:
+        """Check whether a file is already indexed with identical content"""
+        return file_hash is not None and self.chunks.file_hash(source) == file_hash
+    
+    def indexed_files(self) -> List[str]:
+        """List the sources currently in the index"""
+        return self.chunks.sources()
+    
+    def num_documents(self) -> int:
+        """Number of indexed chunks"""
+        return self.chunks.count()
+    
+    def ids(self) -> np.ndarray:
+        """Ids of all indexed chunks"""
+        return self.chunks.ids()
+    
+    def add_file(
+        self,
+        source: str,
+        file_hash: str,
+        embeddings: np.ndarray,
+        documents: List[Dict]
+    ) -> List[int]:
+        """Add the chunks of one file to the index and return their ids"""
+        if self.chunks.has_file(source):
+            raise ValueError(f"File already indexed: {source}")
+        
+        filename = documents[0]['metadata']['filename'] if documents else os.path.basename(source)
+        self.chunks.add_file(source, filename, file_hash)
+        return self.append_chunks(source, embeddings, documents)
+    
+    def begin_file(self, source: str, filename: str, file_hash: str):
+        """Register a file whose chunks will arrive in batches via append_chunks()
+
+        The file stays unindexed (no content hash) until finish_file(), so an
+        interrupted ingestion is re-run and can pick up from resume_page().
+        """
+        if self.chunks.has_file(source):
+            raise ValueError(f"File already indexed: {source}")
+        self.chunks.add_file(source, filename, None)
+        self.chunks.set_meta(f"ingest:{source}", file_hash)
+    
+    def resume_page(self, source: str, file_hash: str) -> Optional[int]:
+        """Page to continue an interrupted ingestion of identical content from, if any"""
+        if file_hash is None or self.chunks.get_meta(f"ingest:{source}") != file_hash:
+            return None
+        if not self.chunks.has_file(source) or self.chunks.file_hash(source) is not None:
+            return None
+        # Batches are committed on page boundaries, so the last stored page is complete
+        last_page = self.chunks.max_page(source)
+        return 1 if last_page is None else last_page + 1
+    
+    def finish_file(self, source: str, file_hash: str):
+        """Mark a file registered with begin_file() as fully indexed"""
+        self.chunks.set_file_hash(source, file_hash)
+        self.chunks.delete_meta(f"ingest:{source}")
+    
+    def checkpoint(self):
+        """Make chunks added so far durable without rewriting the FAISS index
+
+        The new version is committed with the chunks, so on load a FAISS or
+        BM25 index saved for an older version is rebuilt from the stored
+        vectors and text, even when the chunk count happens to match.
+        """
+        self.chunks.set_meta('version', self.version)
+        self.chunks.commit()
+    
+    def append_chunks(self, source: str, embeddings: np.ndarray, documents: List[Dict]) -> List[int]:
+        """Add chunks to a registered file and return their ids"""
+        file_id = self.chunks.file_id(source)
+        if file_id is None:
+            raise ValueError(f"File not registered: {source}")
+        
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        ids = self._allocate_ids(len(documents))
+        for doc_id, doc in zip(ids, documents):
+            doc['id'] = doc_id
+            doc['metadata']['chunk_id'] = doc_id
+        self.chunks.add_chunks(file_id, ids, documents, embeddings)
+        self.sparse_index.add_many((doc['id'], doc['content']) for doc in documents)
+        
+        if ids:
+            if self._needs_rebuild():
+                self._rebuild()
+            else:
+                self.index.add_with_ids(embeddings, np.array(ids, dtype='int64'))
+        
+        self._bump_version()
+        return ids
+    
+    def _allocate_ids(self, count: int) -> List[int]:
+        """Reserve corpus-wide chunk ids
+
+        Ids are never reused, so FAISS, the BM25 id -> row index, the rerank
+        score cache and answer sources can all key on them. The counter is
+        persisted with the chunks and committed with them.
+        """
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        self.chunks.set_meta('next_id', self.next_id)
+        return ids
+    
+    def remove_file(self, source: str) -> int:
+        """Remove all chunks of a file from the index in place"""
+        if not self.chunks.has_file(source):
+            return 0
+        
+        ids = self.chunks.remove_file(source)
+        self.chunks.delete_meta(f"ingest:{source}")
+        self.sparse_index.remove(ids)
+        if ids and self.index is not None:
+            try:
+                self.index.remove_ids(np.array(ids, dtype='int64'))
+            except RuntimeError:
+                # HNSW graphs do not support deletion; rebuild from the kept vectors
+                self._rebuild()
+        self._bump_version()
+        return len(ids)
+    
+    def replace_file(
+        self,
+        source: str,
+        file_hash: str,
+        embeddings: np.ndarray,
+        documents: List[Dict]
+    ) -> List[int]:
+        """Swap the chunks of an edited file for freshly embedded ones"""
+        self.remove_file(source)
+        return self.add_file(source, file_hash, embeddings, documents)
+    
+    def _min_train_size(self, index_type: str) -> int:
+        """Vectors needed before a trained index type gives usable clusters"""
+        if index_type == 'ivf_flat':
+            return 39 * config.FAISS_NLIST
+        if index_type == 'ivf_pq':
+            return 39 * max(config.FAISS_NLIST, 2 ** config.FAISS_PQ_NBITS)
+        return 0
+    
+    def _target_type(self) -> str:
+        """Index type to build for the current number of vectors"""
+        if self.num_documents() < self._min_train_size(self.index_type):
+            return 'flat'
+        return self.index_type
+    
+    def _needs_rebuild(self) -> bool:
+        """Whether the index is missing or a placeholder that can now be trained"""
+        return self.index is None or self.built_type != self._target_type()
+    
+    def _rebuild(self):
+        """Rebuild the FAISS index from the stored vectors, training it if needed"""
+        ids, embeddings = self.chunks.vectors()
+        if embeddings is None:
+            self.index = None
+            self.built_type = None
+            return
+        built_type = self._target_type()
+        
+        self.index = self._new_index(built_type, embeddings.shape[1])
+        if not self.index.is_trained:
+            print(f"Training {built_type} index on up to {config.FAISS_TRAIN_SAMPLE} vectors...")
+            self.index.train(self._training_sample(embeddings))
+        self.index.add_with_ids(embeddings, ids)
+        
+        self.built_type = built_type
+        self._apply_search_params()
+        print(f"✅ Built {built_type} FAISS index with {len(ids)} documents")
+    
+    def _rebuild_sparse(self):
+        """Rebuild the BM25 index from the chunk text in the store"""
+        self.sparse_index = BM25Index()
+        self.sparse_index.add_many(
+            (doc['id'], doc['content']) for doc in self.chunks.iter_documents()
+        )
+    
+    def rebuild_index(self, index_type: str, metric: str = None):
+        """Switch an existing store to another index type or metric"""
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}")
+        if metric is not None and metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.index_type = index_type
+        self.metric = metric or self.metric
+        self._rebuild()
+        self._bump_version()
+    
+    def _new_index(self, index_type: str, dimension: int):
+        """Create an empty ID-mapped index of the given type"""
+        # IVF lists store ids natively; Flat and HNSW need an id map for add_with_ids/remove_ids
+        if index_type == 'flat':
+            description = "IDMap2,Flat"
+        elif index_type == 'hnsw':
+            description = f"IDMap2,HNSW{config.FAISS_HNSW_M}"
+        elif index_type == 'ivf_flat':
+            description = f"IVF{config.FAISS_NLIST},Flat"
+        elif index_type == 'ivf_pq':
+            description = f"IVF{config.FAISS_NLIST},PQ{config.FAISS_PQ_M}x{config.FAISS_PQ_NBITS}"
+        else:
+            raise ValueError(f"Unsupported index type: {index_type}")
+        
+        index = faiss.index_factory(dimension, description, METRICS[self.metric])
+        if index_type == 'hnsw':
+            faiss.downcast_index(index.index).hnsw.efConstruction = config.FAISS_EF_CONSTRUCTION
+        return index
+    
+    @staticmethod
+    def _training_sample(embeddings: np.ndarray) -> np.ndarray:
+        """Random sample of stored vectors for IVF/PQ training"""
+        n = len(embeddings)
+        if n <= config.FAISS_TRAIN_SAMPLE:
+            return embeddings
+        rows = np.random.default_rng(0).choice(n, config.FAISS_TRAIN_SAMPLE, replace=False)
+        return embeddings[np.sort(rows)]
+    
+    def _apply_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Set query-time knobs (IVF nprobe, HNSW efSearch) on the index"""
+        if self.index is None:
+            return
+        if self.built_type in TRAINED_INDEX_TYPES:
+            faiss.extract_index_ivf(self.index).nprobe = nprobe or config.FAISS_NPROBE
+        elif self.built_type == 'hnsw':
+            faiss.downcast_index(self.index.index).hnsw.efSearch = ef_search or config.FAISS_EF_SEARCH
+    
     def save(self):
-        """Save index and documents to disk"""
+        """Save index and commit chunks to disk"""
         if self.index is not None:
-            faiss.write_index(self. index, self.index_path)
-            with open(self.docs_path, 'wb') as f:
-                pickle.dump(self.documents, f)
-            print("✅ Vector store saved")
+            # Write to a temp file first so a crash never leaves a truncated index
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(self. index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+        elif os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        
+        self.chunks.set_meta('index_type', self.index_type)
+        self.chunks.set_meta('built_type', self.built_type or '')
+        self.chunks.set_meta('metric', self.metric)
+        self.chunks.set_meta('version', self.version)
+        self.chunks.set_meta('faiss_version', self.version)
+        self.chunks.commit()
+        self.sparse_index.save(self.sparse_path, self.version)
+        print("✅ Vector store saved")
     
     def load(self) -> bool:
-        """Load index and documents from disk"""
-        if os. path.exists(self.index_path) and os.path.exists(self.docs_path):
+        """Load index from disk; chunks stay in the chunk store until requested"""
+        if os.path.exists(self.docs_path) and self.num_documents() == 0:
+            self._migrate_pickle()
+        
+        count = self.num_documents()
+        if count == 0:
+            return False
+        
+        self.index_type = self.chunks.get_meta('index_type', self.index_type)
+        self.built_type = self.chunks.get_meta('built_type') or None
+        self.metric = self.chunks.get_meta('metric', self.metric)
+        self.version = self.chunks.get_meta('version', self.version)
+        self.next_id = int(self.chunks.get_meta('next_id', self.next_id))
+        
+        if (self.index_type, self.metric) != (config.FAISS_INDEX_TYPE, config.FAISS_METRIC):
+            print(
+                f"⚠️ Saved index uses '{self.index_type}'/'{self.metric}', config asks for "
+                f"'{config.FAISS_INDEX_TYPE}'/'{config.FAISS_METRIC}'; call rebuild_index() to switch"
+            )
+        
+        sparse_index = BM25Index.load(self.sparse_path, self.version)
+        if sparse_index is None or len(sparse_index) != count:
+            # Saved by an older build, or out of step with the committed chunks
+            print("⚠️ Sparse index is missing or stale, rebuilding")
+            self._rebuild_sparse()
+        else:
+            self.sparse_index = sparse_index
+        
+        if os. path.exists(self.index_path):
             self.index = faiss.read_index(self.index_path)
-            with open(self.docs_path, 'rb') as f:
-                self.documents = pickle.load(f)
-            print(f"✅ Loaded vector store with {len(self.documents)} documents")
-            return True
-        return False
+        faiss_version = self.chunks.get_meta('faiss_version', self.version)
+        if self.index is None or self.index.ntotal != count or faiss_version != self.version:
+            # Index missing or out of step with the committed chunks; rebuild from stored vectors
+            print("⚠️ FAISS index does not match the chunk store, rebuilding")
+            self._rebuild()
+            self._bump_version()
+        self._apply_search_params()
+        
+        print(f"✅ Loaded vector store with {count} documents")
+        return True
+    
+    def _migrate_pickle(self):
+        """Import a pickled documents list from an older store into the chunk store"""
+        with open(self.docs_path, 'rb') as f:
+            state = pickle.load(f)
+        
+        if isinstance(state, list):
+            # Original format: plain IndexFlatL2 with row-ordered documents
+            index = faiss.read_index(self.index_path)
+            embeddings = index.reconstruct_n(0, index.ntotal)
+            documents = state
+            for doc_id, doc in enumerate(documents):
+                doc['id'] = doc_id
+            hashes = {}
+            self.metric = 'l2'
+            self.index_type = 'flat'
+        else:
+            embeddings = np.load(self.embeddings_path)
+            documents = state['documents']
+            hashes = {source: entry['hash'] for source, entry in state['manifest'].items()}
+            self.metric = state['metric']
+            self.index_type = state['index_type']
+        
+        for doc in documents:
+            # Older chunks carry a "<page>_<index>" chunk_id; ids become the chunk ids
+            metadata = doc['metadata']
+            metadata.setdefault('chunk_index', int(str(metadata.get('chunk_id', 0)).rsplit('_', 1)[-1]))
+            metadata['chunk_id'] = doc['id']
+        
+        rows_by_source = {}
+        for row, doc in enumerate(documents):
+            rows_by_source.setdefault(doc['metadata']['source'], []).append(row)
+        for source, rows in rows_by_source.items():
+            file_docs = [documents[row] for row in rows]
+            file_id = self.chunks.add_file(source, file_docs[0]['metadata']['filename'], hashes.get(source))
+            self.chunks.add_chunks(file_id, [doc['id'] for doc in file_docs], file_docs, embeddings[rows])
+        
+        self.next_id = max((doc['id'] for doc in documents), default=-1) + 1
+        self.chunks.set_meta('next_id', self.next_id)
+        self._rebuild()
+        self._rebuild_sparse()
+        self.save()
+        
+        for path in (self.docs_path, self.embeddings_path):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"✅ Migrated {len(documents)} documents to the chunk store")
+    
+    def _bump_version(self):
+        """Mark the index as changed so caches keyed on the version go stale"""
+        self.version = uuid.uuid4().hex
     
     def search(self, query_embedding: np.ndarray, k: int = 10) -> List[Tuple[Dict, float]]:
         """Search for similar documents"""
+        scores, ids = self.search_batch(query_embedding, k)
+        documents = self.get_documents(ids[0])
+        return [
+            (doc, score)
+            for doc, score in zip(documents, scores[0].tolist())
+            if doc is not None
+        ]
+    
+    def search_batch(self, queries: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Search many queries in one FAISS call
+
+        Returns (scores, ids) arrays of shape (n_queries, k), higher scores being
+        more similar; missing results have id -1. Use get_documents() to resolve
+        only the ids that survive later filtering.
+        """
         if self.index is None:
             raise ValueError("Index not initialized")
         
-        query_embedding = query_embedding.astype('float32').reshape(1, -1)
-        distances, indices = self.index.search(query_embedding, k)
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        distances, ids = self.index.search(queries, k)
         
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.documents):
-                # Convert L2 distance to similarity score
-                similarity = 1 / (1 + distance)
-                results.append((self.documents[idx], similarity))
+        if self.metric == 'l2':
+            # Convert L2 distance to similarity score
+            return 1 / (1 + distances), ids
+        return distances, ids
+    
+    def get_documents(self, ids) -> List[Dict]:
+        """Fetch documents by FAISS id (None for ids not in the store)"""
+        return self.chunks.get(ids)
+    
+    def recall_report(
+        self,
+        k: int = 10,
+        num_queries: int = 200,
+        sweep: List[int] = None
+    ) -> List[Dict[str, float]]:
+        """Measure recall@k and latency of the current index against an exact Flat scan
+
+        `sweep` lists nprobe (IVF) or efSearch (HNSW) values to try; queries are
+        stored vectors with a little noise so they are not exact hits.
+        """
+        if self.index is None:
+            raise ValueError("Index not initialized")
+        
+        ids, embeddings = self.chunks.vectors()
+        rng = np.random.default_rng(0)
+        rows = rng.choice(len(embeddings), min(num_queries, len(embeddings)), replace=False)
+        queries = embeddings[rows] + rng.normal(0, 0.01, (len(rows), embeddings.shape[1]))
+        queries = queries.astype('float32')
+        
+        # Exact baseline over the same vectors and ids
+        exact = self._new_index('flat', embeddings.shape[1])
+        exact.add_with_ids(embeddings, ids)
+        flat_ms, exact_ids = self._time_search(exact, queries, k)
+        
+        if sweep is None:
+            if self.built_type in TRAINED_INDEX_TYPES:
+                sweep = [1, 4, 16, 64, 256]
+            elif self.built_type == 'hnsw':
+                sweep = [16, 32, 64, 128, 256]
+            else:
+                sweep = [None]
         
-        return results
+        report = []
+        for value in sweep:
+            self._apply_search_params(nprobe=value, ef_search=value)
+            ann_ms, ann_ids = self._time_search(self.index, queries, k)
+            hits = sum(
+                len(set(a[a >= 0]) & set(e[e >= 0]))
+                for a, e in zip(ann_ids, exact_ids)
+            )
+            report.append({
+                'index_type': self.built_type,
+                'param': value,
+                'recall': hits / (len(queries) * k),
+                'latency_ms': ann_ms,
+                'flat_latency_ms': flat_ms,
+                'speedup': flat_ms / ann_ms if ann_ms else float('inf')
+            })
+        
+        # Back to the configured knobs
+        self._apply_search_params()
+        return report
+    
+    @staticmethod
+    def _time_search(index, queries: np.ndarray, k: int) -> Tuple[float, np.ndarray]:
+        """Mean single-query latency in milliseconds plus the returned ids"""
+        results = []
+        start = time.perf_counter()
+        for query in queries:
+            _, ids = index.search(query.reshape(1, -1), k)
+            results.append(ids[0])
+        elapsed = time.perf_counter() - start
+        return elapsed * 1000 / len(queries), np.array(results)
+    
+    def _reset(self):
+        """Drop the index and every stored chunk"""
+        self.index = None
+        self.built_type = None
+        self.sparse_index = BM25Index()
+        self.chunks.clear()
+        # Ids keep counting up so an id never refers to two different chunks
+        self.chunks.set_meta('next_id', self.next_id)
+        self.chunks.commit()
     
     def clear(self):
         """Clear the index"""
-        self.index = None
-        self. documents = []
-        if os.path.exists(self. index_path):
-            os.remove(self.index_path)
-        if os.path.exists(self.docs_path):
-            os.remove(self.docs_path)
-        print("✅ Vector store cleared")
\ No newline at end of file
+        self._reset()
+        self._bump_version()
+        for path in (self.index_path, self.docs_path, self.embeddings_path):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self.sparse_path, ignore_errors=True)
+        print("✅ Vector store cleared")
+
+
+if __name__ == "__main__":
+    # Recall-vs-latency report for the saved index
+    store = VectorStore()
+    if not store.load():
+        raise SystemExit("No saved vector store found")
+    print(f"{'type':<10}{'param':>8}{'recall':>10}{'ms/query':>12}{'flat ms':>10}{'speedup':>10}")
+    for row in store.recall_report():
+        print(
+            f"{row['index_type']:<10}{str(row['param']):>8}{row['recall']:>10.3f}"
+            f"{row['latency_ms']:>12.3f}{row['flat_latency_ms']:>10.3f}{row['speedup']:>10.1f}"
+        )
\ No newline at end of file